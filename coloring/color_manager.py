@@ -153,6 +153,10 @@ class ColorManager:
         """指定されたカラーパック内のすべてのカラーマップ名のリストを返します。"""
         return list(self.color_packs.get(pack_name, {}).keys())
 
+    def has_color_map(self, pack_name: str, map_name: str) -> bool:
+        """指定されたカラーパックに指定された名前のカラーマップがあるかどうかを返します (名前のリストを作らずに辞書で確認します)。"""
+        return map_name in self.color_packs.get(pack_name, {})
+
     def get_color_map_data(self, pack_name: str, map_name: str) -> list[tuple] | None:
         """指定されたカラーパックとマップ名に対応するカラーデータのリスト (RGB/RGBAタプルのリスト) を返します。"""
         return self.color_packs.get(pack_name, {}).get(map_name)
@@ -3,6 +3,7 @@ import traceback # この行が存在しない場合に追加
 from pathlib import Path # Path を追加
 from export.image_exporter import ImageExporter # ExporterSignals は ImageExporter 内部で使用されるシグナルです
 from models.fractal_engine import FractalEngine # FractalEngineモデルのインポート (型ヒント用)
+from models.common_params import CommonParams
 from .fractal_renderer import FractalRenderer
 from PyQt6.QtCore import QObject, pyqtSignal, QThreadPool, pyqtSlot, QRunnable # QRunnable を追加
 from logger.custom_logger import CustomLogger
@@ -56,6 +57,8 @@ class FractalController(QObject):
         self.logger = CustomLogger()  # ロガー
         self.is_rendering = False  # レンダリング中フラグ
         self.preview_downscale_factor = 0.5  # プレビュー解像度の縮小率
+        self.progressive_render_scale = 2  # 完全再計算時に先に描画する粗い画像の縮小率 (1 で段階的レンダリングなし)
+        self._last_render_was_preview = False  # 直前のレンダリングがプレビューだったか (その直後は粗い画像を省く)
         self.current_exporter: ImageExporter | None = None  # 現在のエクスポート処理
         self.thread_pool = QThreadPool.globalInstance()  # スレッドプール
         self.current_renderer_task = None  # 現在のレンダリングタスク
@@ -203,6 +206,15 @@ class FractalController(QObject):
         self.main_window = main_window
         self.update_status_display()
 
+    def shutdown(self):
+        """
+        アプリケーション終了時 (またはコントローラとエンジンを破棄する前) の後処理を行います。
+        進行中のレンダリングの結果を破棄し、エンジンのスレッドプールを終了します。
+        """
+        if self.current_renderer_task is not None:
+            self.current_renderer_task.cancel()
+        self.fractal_engine.shutdown()
+
     # --- フラクタル共通パラメータ処理 ---
     def update_common_fractal_parameters(self, max_iterations: int, escape_radius: float | None = None, source: str | None = None):
         """
@@ -217,14 +229,13 @@ class FractalController(QObject):
         """
         if self.fractal_engine:
             current_params = self.fractal_engine.get_common_parameters()
-            if current_params:
-                self.fractal_engine.set_common_parameters(
-                    center_real=current_params.get('center_real'),
-                    center_imag=current_params.get('center_imag'),
-                    width=current_params.get('width'),
-                    max_iterations=max_iterations,
-                    escape_radius=escape_radius if escape_radius is not None else current_params.get('escape_radius')
-                )
+            self.fractal_engine.set_common_parameters(
+                center_real=current_params.center_real,
+                center_imag=current_params.center_imag,
+                width=current_params.width,
+                max_iterations=max_iterations,
+                escape_radius=escape_radius if escape_radius is not None else current_params.escape_radius
+            )
             self.fractal_engine.last_fractal_data_cache = None
         self.update_status_display()
 
@@ -236,7 +247,7 @@ class FractalController(QObject):
             dict: 中心の座標、幅、最大反復回数などを含む共通パラメータの辞書。
                   エンジンが未設定の場合は空の辞書を返します。
         """
-        return self.fractal_engine.get_common_parameters() if self.fractal_engine else {}
+        return self.fractal_engine.get_common_parameters().as_dict() if self.fractal_engine else {}
 
     def get_current_engine_parameters(self):
         """
@@ -246,7 +257,7 @@ class FractalController(QObject):
         Returns:
             dict: エンジンパラメータの辞書。エンジンが未設定の場合は空の辞書を返します。
         """
-        return self.fractal_engine.get_common_parameters() if self.fractal_engine else {}
+        return self.fractal_engine.get_common_parameters().as_dict() if self.fractal_engine else {}
 
     # --- フラクタルプラグイン管理 ---
     def get_available_fractal_plugin_names_from_engine(self) -> list[str]:
@@ -591,22 +602,23 @@ class FractalController(QObject):
                                              False の場合、既存のフラクタルデータを使用して再カラーリングのみを行います。Defaults to True.
             is_preview (bool, optional): True の場合、プレビュー品質 (低解像度) でレンダリングします。Defaults to False.
         """
-        # 発信元のパス部分を相対パスに変換して出力
-        stack_str = traceback.format_stack()[-2].strip()
-        import re
-        m = re.search(r'File "([^"]+)", line (\d+), in ([^\s]+)', stack_str)
-        if m:
-            abs_path, lineno, func = m.groups()
-            try:
-                from logger.custom_logger import CustomLogger
-                prj = getattr(CustomLogger, '_project_root_path', None)
-                rel_path = str(Path(abs_path).relative_to(prj)) if prj and Path(abs_path).is_absolute() else abs_path
-            except Exception:
-                rel_path = abs_path
-            display_str = f"{rel_path}:{lineno}:{func}"
-        else:
-            display_str = stack_str
-        logger.log(f"発信元: {display_str}", level="DEBUG")
+        # 発信元のパス部分を相対パスに変換して出力 (スタックの取得は重いため、DEBUG が出力される場合のみ)
+        if logger.is_enabled_for("DEBUG"):
+            stack_str = traceback.format_stack()[-2].strip()
+            import re
+            m = re.search(r'File "([^"]+)", line (\d+), in ([^\s]+)', stack_str)
+            if m:
+                abs_path, lineno, func = m.groups()
+                try:
+                    from logger.custom_logger import CustomLogger
+                    prj = getattr(CustomLogger, '_project_root_path', None)
+                    rel_path = str(Path(abs_path).relative_to(prj)) if prj and Path(abs_path).is_absolute() else abs_path
+                except Exception:
+                    rel_path = abs_path
+                display_str = f"{rel_path}:{lineno}:{func}"
+            else:
+                display_str = stack_str
+            logger.log(f"発信元: {display_str}", level="DEBUG")
 
         if not self.fractal_engine:
             self.status_updated.emit("エラー: フラクタルエンジン未設定")
@@ -619,7 +631,8 @@ class FractalController(QObject):
                 # 新しいタスクがすぐに始まることで古いタスクの結果を事実上無視する。
                 # もしFractalRendererに停止フラグがあれば、ここでセットできる。
                 logger.log("プレビュー要求のため、進行中のレンダリングを置き換えます。", level="DEBUG")
-                # self.current_renderer_task.cancel() # FractalRendererにcancel()が実装されていれば
+                if self.current_renderer_task is not None:
+                    self.current_renderer_task.cancel() # 古いタスクの結果が新しい画像を上書きしないようにする
             else:
                 # 新しい高品質要求が来たが、既にレンダリング中の場合
                 logger.log("以前の描画処理がまだ実行中。新しいタスクは開始されません。", level="WARNING")
@@ -653,14 +666,22 @@ class FractalController(QObject):
         self.fractal_engine.update_image_size(render_width, render_height)
         self.last_render_width, self.last_render_height = render_width, render_height
 
+        # 完全再計算の高品質レンダリングでは、先に粗い画像を表示する (操作直後でプレビューが表示済みの場合は省く)
+        progressive_scale = 1
+        if full_recompute and not is_preview and not self._last_render_was_preview:
+            progressive_scale = self.progressive_render_scale
+        self._last_render_was_preview = is_preview
+
         self.current_renderer_task = FractalRenderer(
             fractal_engine=self.fractal_engine,
             image_width_px=render_width,
             image_height_px=render_height,
             full_recompute=full_recompute,
-            active_coloring_target_type=self.active_coloring_target_type
+            active_coloring_target_type=self.active_coloring_target_type,
+            progressive_scale=progressive_scale
         )
         self.current_renderer_task.signals.rendering_started.connect(self._on_renderer_started)
+        self.current_renderer_task.signals.preview_ready.connect(self._on_renderer_preview_ready)
         self.current_renderer_task.signals.rendering_finished.connect(self._on_renderer_finished)
         self.current_renderer_task.signals.rendering_failed.connect(self._on_renderer_failed)
 
@@ -673,14 +694,36 @@ class FractalController(QObject):
         レンダリング状態を更新し、関連するシグナルを発行します。
         """
         self.logger.log("信号受信", level="DEBUG")
+        if self._is_stale_renderer_signal():
+            # 置き換えられたタスクの遅れて届いた開始通知で、現在のレンダリングの状態を上書きしない
+            return
         self.is_rendering = True
         self.logger.log(f"self.is_rendering を設定した直後: {self.is_rendering}", level="DEBUG")
         self.rendering_task_started.emit()
         self.rendering_state_changed.emit(True)
         self.logger.log("self.rendering_state_changed を発行した直後後: emit(True)", level="DEBUG")
 
+    def _is_stale_renderer_signal(self) -> bool:
+        """受信中のシグナルが、新しいレンダリングに置き換えられた古いタスクからのものかを返します。"""
+        sender = self.sender()
+        current_task = self.current_renderer_task
+        return sender is not None and (current_task is None or sender is not current_task.signals)
+
+    @pyqtSlot(object)
+    def _on_renderer_preview_ready(self, colored_image):
+        """
+        段階的レンダリングの粗い画像を受信したときに呼び出されるスロット。
+        表示側が画面サイズに拡大して表示し、本来の解像度の画像は rendering_finished で届きます。
+        """
+        if self._is_stale_renderer_signal():
+            return
+        self.image_rendered.emit(colored_image)
+
     @pyqtSlot(object, float, float)
     def _on_renderer_finished(self, colored_image, compute_time_ms, coloring_time_ms):
+        if self._is_stale_renderer_signal():
+            self.logger.log("置き換えられたレンダリングの結果を破棄します。", level="DEBUG")
+            return
         self.last_compute_time_ms = compute_time_ms
         self.last_coloring_time_ms = coloring_time_ms
         self.image_rendered.emit(colored_image)
@@ -693,6 +736,9 @@ class FractalController(QObject):
 
     @pyqtSlot(str)
     def _on_renderer_failed(self, error_message):
+        if self._is_stale_renderer_signal():
+            self.logger.log(f"置き換えられたレンダリングの失敗を無視します: {error_message}", level="DEBUG")
+            return
         self.logger.log(f"レンダータスク失敗: {error_message}", level="ERROR")
         self.current_renderer_task = None
         self.is_rendering = False  # ← 先にFalseにする
@@ -749,13 +795,13 @@ class FractalController(QObject):
         """
         if self.fractal_engine:
             current_params = self.fractal_engine.get_common_parameters()
-            new_center_real = current_params['center_real'] - dr
-            new_center_imag = current_params['center_imag'] - di
+            new_center_real = current_params.center_real - dr
+            new_center_imag = current_params.center_imag - di
             self.fractal_engine.set_common_parameters(
                 center_real=new_center_real,
                 center_imag=new_center_imag,
-                width=current_params['width'],
-                max_iterations=current_params['max_iterations']
+                width=current_params.width,
+                max_iterations=current_params.max_iterations
             )
             # パン操作ではフラクタル計算はスキップ(full_recompute=False)
             self.trigger_render(full_recompute=False, is_preview=is_preview)
@@ -777,7 +823,7 @@ class FractalController(QObject):
         """
         if self.fractal_engine:
             current_params = self.fractal_engine.get_common_parameters()
-            aspect_ratio = current_params['height'] / current_params['width'] if current_params['width'] != 0 else 1.0
+            aspect_ratio = current_params.height / current_params.width if current_params.width != 0 else 1.0
             new_h = new_w * aspect_ratio
 
             # 新しい中心座標を計算
@@ -788,7 +834,7 @@ class FractalController(QObject):
                 center_real=new_center_real,
                 center_imag=new_center_imag,
                 width=new_w,
-                max_iterations=current_params['max_iterations']
+                max_iterations=current_params.max_iterations
             )
             # ズームではフラクタルデータの再計算が必須
             self.trigger_render(full_recompute=True, is_preview=is_preview)
@@ -865,7 +911,7 @@ class FractalController(QObject):
         """
         if not self.fractal_engine: return
         cp = self.fractal_engine.get_common_parameters()
-        current_iters = cp.get('max_iterations', 100) if iters is None else iters
+        current_iters = cp.max_iterations if iters is None else iters
         self.fractal_engine.set_common_parameters(
             center_real=cr,
             center_imag=ci,
@@ -943,7 +989,7 @@ if __name__ == '__main__':
 
             self.color_manager=type('MCM',(),{'get_color_map_data':lambda pn,mn:[(0,0,0)]})()
 
-        def get_common_parameters(self): return {'width':self.width,'center_real':self.center_real,'center_imag':self.center_imag,'max_iterations':self.max_iterations,'height':self.height,'escape_radius':self.escape_radius}
+        def get_common_parameters(self): return CommonParams(self.center_real, self.center_imag, self.width, self.height, self.max_iterations, self.escape_radius)
         def set_common_parameters(self, center_real=None, center_imag=None, width=None, max_iterations=None, escape_radius=None):
             if center_real is not None: self.center_real = center_real
             if center_imag is not None: self.center_imag = center_imag
@@ -1014,10 +1060,11 @@ if __name__ == '__main__':
 
         class Signals(QObject): # モックシグナルの内部クラス
             rendering_started = pyqtSignal()
+            preview_ready = pyqtSignal(object)
             rendering_finished = pyqtSignal(object, float, float)
             rendering_failed = pyqtSignal(str)
 
-        def __init__(self, fractal_engine, image_width_px, image_height_px, full_recompute, active_coloring_target_type): # active_coloring_target_type を追加
+        def __init__(self, fractal_engine, image_width_px, image_height_px, full_recompute, active_coloring_target_type, progressive_scale=1): # active_coloring_target_type を追加
             QRunnable.__init__(self) # QRunnable を初期化
             QObject.__init__(self)   # QObject を初期化
             self.signals = MockFractalRenderer.Signals()
@@ -1026,8 +1073,11 @@ if __name__ == '__main__':
             self.image_height_px = image_height_px
             self.full_recompute = full_recompute
             self.active_coloring_target_type = active_coloring_target_type # これを保存
+            self.progressive_scale = progressive_scale
             logger.log(f"MockFractalRenderer が target_type: {active_coloring_target_type} でインスタンス化されました", level="DEBUG")
 
+        def cancel(self): pass
+
         def run(self): # モックのrunメソッド
             self.signals.rendering_started.emit()
             # 何らかの処理とデータをシミュレート
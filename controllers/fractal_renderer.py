@@ -13,6 +13,7 @@ class FractalRendererSignals(QObject):
     レンダリング処理の進行状況や結果、エラー発生時などを通知します。
     """
     rendering_started = pyqtSignal()  # レンダリング処理開始時に通知
+    preview_ready = pyqtSignal(object)  # 段階的レンダリングの低解像度画像が完成したときに通知（画像データ）
     rendering_finished = pyqtSignal(object, float, float)  # レンダリング完了時（画像データ, 計算時間, カラーリング時間）
     rendering_failed = pyqtSignal(str)  # レンダリング失敗時（エラーメッセージ）
 
@@ -32,16 +33,21 @@ class FractalRenderer(QRunnable):
     QRunnableを継承し、FractalEngineを用いてフラクタル計算・カラーリングを行い、
     結果をシグナルで通知します。
     """
-    def __init__(self, fractal_engine: FractalEngine, image_width_px: int, image_height_px: int, full_recompute: bool, active_coloring_target_type: str):
+    def __init__(self, fractal_engine: FractalEngine, image_width_px: int, image_height_px: int, full_recompute: bool, active_coloring_target_type: str,
+                 progressive_scale: int = 1):
         """
         FractalRenderer を初期化します。
 
+        progressive_scale が2以上で完全再計算の場合は、まず 1/progressive_scale の解像度で描画して
+        preview_ready で通知し、その後に本来の解像度で描画します (表示側が拡大するので、先に粗い画像を見せられる)。
+
         Args:
             fractal_engine (FractalEngine): フラクタル計算エンジン。
             image_width_px (int): レンダリングする画像の幅 (ピクセル単位)。
             image_height_px (int): レンダリングする画像の高さ (ピクセル単位)。
             full_recompute (bool): フラクタルデータを完全に再計算するかどうか。
             active_coloring_target_type (str): 現在アクティブなカラーリングターゲットタイプ（'divergent' または 'non_divergent'）。
+            progressive_scale (int, optional): 段階的レンダリングの縮小率。1 の場合は段階的レンダリングを行いません。Defaults to 1.
         """
         super().__init__()
         self.fractal_engine = fractal_engine  # フラクタル計算エンジン
@@ -49,8 +55,18 @@ class FractalRenderer(QRunnable):
         self.image_height_px = image_height_px  # 画像高さ（ピクセル）
         self.full_recompute = full_recompute  # 完全再計算フラグ
         self.active_coloring_target_type = active_coloring_target_type  # カラーリングターゲット
+        self.progressive_scale = max(1, int(progressive_scale))  # 段階的レンダリングの縮小率
         self.signals = FractalRendererSignals()  # シグナル管理
         self.logger = CustomLogger()  # ロガー
+        self._cancelled = False  # 新しいレンダリングに置き換えられたか
+
+    def cancel(self):
+        """
+        このレンダリングを中止します。実行中の計算は最後まで行いますが、以降のカラーリング・段階と結果の通知は行わず、
+        まだ始まっていない段階はエンジンの状態 (画像サイズ・キャッシュ) を変更しません。
+        (新しいレンダリング要求で置き換えられたタスクの古い画像やデータが、新しいタスクのものを上書きしないようにする)
+        """
+        self._cancelled = True
 
     def run(self):
         """
@@ -62,69 +78,32 @@ class FractalRenderer(QRunnable):
         self.logger.log("レンダリング開始", level="INFO")
 
         try:
-            # 画像サイズ・アスペクト比をエンジンに反映
-            self.fractal_engine.image_width_px = self.image_width_px
-            self.fractal_engine.image_height_px = self.image_height_px
-            self.fractal_engine.update_aspect_ratio()
-
-            compute_time_ms = 0.0
-            start_t = time.perf_counter()
-            # フラクタルデータ計算
-            fractal_data = self.fractal_engine.compute_current_fractal()
-            compute_time_ms = (time.perf_counter() - start_t) * 1000
-
-            if fractal_data is None:
-                self.logger.log("FractalRenderer: 計算に失敗したか、Noneが返されました。", level="ERROR")
-                self.signals.rendering_failed.emit("計算失敗 (データなし)")
-                return
-
-            is_diverged_mask = fractal_data.get('is_diverged')
-            if is_diverged_mask is None:
-                self.logger.log("FractalRenderer: 'is_diverged' マスクがfractal_data内で見つかりません。", level="ERROR")
-                self.signals.rendering_failed.emit("計算データエラー (is_divergedマスクなし)")
-                return
-
-            if not isinstance(is_diverged_mask, np.ndarray):
-                self.logger.log(f"FractalRenderer: 'is_diverged' マスクがNumPy配列ではありません。型: {type(is_diverged_mask)}", level="ERROR")
-                self.signals.rendering_failed.emit("計算データ型エラー (is_divergedマスク不正)")
-                return
-
-            coloring_time_start = time.perf_counter()
-
-            # 発散・非発散領域ごとにカラーリング
-            colored_image_divergent = self.fractal_engine.apply_coloring(
-                target_type='divergent', fractal_data_override=fractal_data
-            )
-            colored_image_non_divergent = self.fractal_engine.apply_coloring(
-                target_type='non_divergent', fractal_data_override=fractal_data
-            )
-
-            coloring_time_ms = (time.perf_counter() - coloring_time_start) * 1000
-
-            if colored_image_divergent is None or colored_image_non_divergent is None:
-                self.logger.log("FractalRenderer: 一方または両方のカラーリング結果がNoneです。", level="ERROR")
-                self.signals.rendering_failed.emit("カラーリング失敗 (片方または両方の結果がNone)")
+            preview_width = self.image_width_px // self.progressive_scale
+            preview_height = self.image_height_px // self.progressive_scale
+            if self.full_recompute and self.progressive_scale > 1 and preview_width > 0 and preview_height > 0:
+                # 段階的レンダリング: 粗い画像を先に通知する (失敗しても本来の解像度の描画は続ける)
+                with self.fractal_engine.render_lock:
+                    preview = self._render_frame(preview_width, preview_height, full_recompute=True, report_failure=False)
+                if self._cancelled:
+                    self.logger.log("新しいレンダリングに置き換えられたため、段階的レンダリングを中止します。", level="DEBUG")
+                    return
+                if preview is not None:
+                    try:
+                        self.signals.preview_ready.emit(preview[0])
+                    except RuntimeError as e_emit_preview:
+                        self.logger.log(f"段階的レンダリングのプレビュー発行中にエラーが発生しました: {e_emit_preview}", level="ERROR")
+
+            # エンジンのバッファプールとキャッシュは共有されるため、置き換えられたタスクとフレーム単位で交互に実行する
+            with self.fractal_engine.render_lock:
+                rendered = self._render_frame(self.image_width_px, self.image_height_px, self.full_recompute)
+            if rendered is None:
                 return
-
-            # RGBA画像であることを確認
-            if colored_image_divergent.shape[-1] != 4 or colored_image_non_divergent.shape[-1] != 4:
-                self.logger.log("FractalRenderer: カラーリング結果がRGBAではありません。", level="ERROR")
-                self.signals.rendering_failed.emit("カラーリング結果フォーマットエラー")
+            if self._cancelled:
+                self.logger.log("新しいレンダリングに置き換えられたため、結果を破棄します。", level="DEBUG")
                 return
-
-            # is_diverged_mask の形状をRGBA画像に合わせる (H, W) -> (H, W, 1)
-            is_diverged_mask_rgba = is_diverged_mask[..., np.newaxis]
-
-            # 発散領域・非発散領域を合成して最終画像を生成
-            final_image = np.where(
-                is_diverged_mask_rgba,
-                colored_image_divergent,
-                colored_image_non_divergent
-            )
-
-            self.logger.log(f"レンダリング完了。計算時間: {compute_time_ms:.1f}ms, 着色時間: {coloring_time_ms:.1f}ms", level="INFO")
+            final_image, compute_time_ms, coloring_time_ms = rendered
             try:
-                self.signals.rendering_finished.emit(final_image.astype(np.uint8), compute_time_ms, coloring_time_ms)
+                self.signals.rendering_finished.emit(final_image, compute_time_ms, coloring_time_ms)
             except RuntimeError as e_emit_finished:
                 self.logger.log(f"レンダリング完了の発行中にエラーが発生しました: {e_emit_finished}", level="ERROR")
 
@@ -134,3 +113,100 @@ class FractalRenderer(QRunnable):
                 self.signals.rendering_failed.emit(f"レンダリング中にエラーが発生しました: {e_outer}")
             except RuntimeError as e_emit_failed_outer:
                 self.logger.log(f"レンダリング失敗の発行中にエラーが発生しました: {e_emit_failed_outer}", level="ERROR")
+
+    def _render_frame(self, image_width_px: int, image_height_px: int, full_recompute: bool, report_failure: bool = True):
+        """
+        指定した解像度で1枚描画 (計算・カラーリング・合成) します。
+        エンジンの `render_lock` を保持した状態で呼び出してください (合成画像は新しい配列なので、解放後も使えます)。
+
+        Args:
+            image_width_px (int): 画像の幅 (ピクセル単位)。
+            image_height_px (int): 画像の高さ (ピクセル単位)。
+            full_recompute (bool): フラクタルデータを完全に再計算するかどうか。
+            report_failure (bool, optional): 失敗時に rendering_failed を発行するかどうか。Defaults to True.
+
+        Returns:
+            tuple | None: (合成画像 (uint8 RGBA), 計算時間ms, 着色時間ms)。失敗時または中止された場合は None。
+        """
+        if self._cancelled: # 置き換えられたタスクは、新しいタスクが使うエンジンの状態に触れない
+            return None
+        # 画像サイズ・アスペクト比をエンジンに反映
+        self.fractal_engine.image_width_px = image_width_px
+        self.fractal_engine.image_height_px = image_height_px
+        self.fractal_engine.update_aspect_ratio()
+
+        compute_time_ms = 0.0
+        # 再カラーリングのみの場合は、同じ画像サイズで計算済みのフラクタルデータを再利用する
+        # (表示領域やフラクタルのパラメータが変わるとエンジン側でキャッシュが破棄される)
+        fractal_data = None
+        if not full_recompute:
+            cached_data = self.fractal_engine.last_fractal_data_cache
+            cached_iterations = cached_data.get('iterations') if cached_data else None
+            if cached_iterations is not None and cached_iterations.shape == (image_height_px, image_width_px):
+                fractal_data = cached_data
+        if fractal_data is None:
+            start_t = time.perf_counter()
+            # フラクタルデータ計算
+            fractal_data = self.fractal_engine.compute_current_fractal()
+            compute_time_ms = (time.perf_counter() - start_t) * 1000
+            if self._cancelled:
+                # 計算中に置き換えられた場合、古い要求の結果をキャッシュに残さない (再カラーリングのみの新しいタスクが使わないように)
+                self.fractal_engine.last_fractal_data_cache = None
+                return None
+
+        if fractal_data is None:
+            self.logger.log("FractalRenderer: 計算に失敗したか、Noneが返されました。", level="ERROR")
+            return self._report_failure("計算失敗 (データなし)", report_failure)
+
+        is_diverged_mask = fractal_data.get('is_diverged')
+        if is_diverged_mask is None:
+            self.logger.log("FractalRenderer: 'is_diverged' マスクがfractal_data内で見つかりません。", level="ERROR")
+            return self._report_failure("計算データエラー (is_divergedマスクなし)", report_failure)
+
+        if not isinstance(is_diverged_mask, np.ndarray):
+            self.logger.log(f"FractalRenderer: 'is_diverged' マスクがNumPy配列ではありません。型: {type(is_diverged_mask)}", level="ERROR")
+            return self._report_failure("計算データ型エラー (is_divergedマスク不正)", report_failure)
+
+        if self._cancelled: # 置き換えられたタスクはカラーリングを行わない
+            return None
+
+        coloring_time_start = time.perf_counter()
+
+        # 発散・非発散領域ごとにカラーリング
+        colored_image_divergent = self.fractal_engine.apply_coloring(
+            target_type='divergent', fractal_data_override=fractal_data
+        )
+        colored_image_non_divergent = self.fractal_engine.apply_coloring(
+            target_type='non_divergent', fractal_data_override=fractal_data
+        )
+
+        coloring_time_ms = (time.perf_counter() - coloring_time_start) * 1000
+
+        if colored_image_divergent is None or colored_image_non_divergent is None:
+            self.logger.log("FractalRenderer: 一方または両方のカラーリング結果がNoneです。", level="ERROR")
+            return self._report_failure("カラーリング失敗 (片方または両方の結果がNone)", report_failure)
+
+        # RGBA画像であることを確認
+        if colored_image_divergent.shape[-1] != 4 or colored_image_non_divergent.shape[-1] != 4:
+            self.logger.log("FractalRenderer: カラーリング結果がRGBAではありません。", level="ERROR")
+            return self._report_failure("カラーリング結果フォーマットエラー", report_failure)
+
+        # is_diverged_mask の形状をRGBA画像に合わせる (H, W) -> (H, W, 1)
+        is_diverged_mask_rgba = is_diverged_mask[..., np.newaxis]
+
+        # 発散領域・非発散領域を合成して最終画像を生成
+        final_image = np.where(
+            is_diverged_mask_rgba,
+            colored_image_divergent,
+            colored_image_non_divergent
+        )
+
+        self.logger.log(f"レンダリング完了 ({image_width_px}x{image_height_px})。計算時間: {compute_time_ms:.1f}ms, 着色時間: {coloring_time_ms:.1f}ms", level="INFO")
+        # np.where の結果は新しい配列で、両方の入力が uint8 なら型変換のコピーは不要
+        return final_image.astype(np.uint8, copy=False), compute_time_ms, coloring_time_ms
+
+    def _report_failure(self, message: str, report_failure: bool):
+        """report_failure が True なら rendering_failed を発行し、常に None を返します。"""
+        if report_failure:
+            self.signals.rendering_failed.emit(message)
+        return None
@@ -151,6 +151,17 @@ class CustomLogger:
         """プロジェクトのルートパスを設定します。ログ出力時のパス表示に使用されます。"""
         cls._project_root_path = project_root.resolve() if project_root else None
 
+    def is_enabled_for(self, level: str) -> bool:
+        """
+        指定されたレベルのメッセージが出力されるかどうかを返します。
+        メッセージの組み立て (f文字列、配列の文字列化、スタックの取得など) が重い DEBUG ログは、
+        これで確認してから log を呼び出してください。
+        """
+        if getattr(CustomLogger, '_initializing', False) or not getattr(CustomLogger, '_is_enabled', True):
+            return False
+        level_int = CustomLogger.LOG_LEVELS.get(level.upper(), CustomLogger.LOG_LEVELS["INFO"])
+        return level_int >= getattr(CustomLogger, '_current_level_int', CustomLogger.LOG_LEVELS["INFO"])
+
     def log(self, message: str, level: str = "INFO", exc_info: object = None) -> None: # 新しいシグネチャ
         """指定されたレベルでログメッセージを記録します。"""
         # 初期化中のロギング呼び出しをチェック (循環依存を避けるため)
@@ -157,7 +157,7 @@ def connect_signals(fractal_controller: FractalController, main_window: MainWind
 
 def register_exit_handlers(app: QApplication, settings_manager: SettingsManager, fractal_controller: FractalController) -> None:
     """
-    アプリケーション終了時に設定保存やNumbaキャッシュクリアなどの後処理を登録します。
+    アプリケーション終了時に設定保存・エンジンのスレッドプールの終了・Numbaキャッシュクリアなどの後処理を登録します。
 
     Args:
         app (QApplication): アプリケーションインスタンス
@@ -176,6 +176,7 @@ def register_exit_handlers(app: QApplication, settings_manager: SettingsManager,
         settings_manager.set_setting("presets", current_presets, auto_save=False)
         settings_manager.save_settings()
     app.aboutToQuit.connect(save_settings_on_exit)
+    app.aboutToQuit.connect(fractal_controller.shutdown) # 設定の保存後に、エンジンのスレッドプールを終了する
     app.aboutToQuit.connect(lambda: clear_numba_cache_on_exit(settings_manager, logger))
 
 
@@ -1,5 +1,6 @@
 # modelsパッケージをインポートする際にFractalEngineを利用可能にする
 from .fractal_engine import FractalEngine
+from .common_params import CommonParams
 
 # エクスポートされるものを明示したい場合は __all__ を定義することもできます
-__all__ = ['FractalEngine']
+__all__ = ['FractalEngine', 'CommonParams']
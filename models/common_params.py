@@ -0,0 +1,29 @@
+from dataclasses import dataclass, replace
+from typing import Any, Dict
+
+
+@dataclass(slots=True, frozen=True)
+class CommonParams:
+    """
+    フラクタル計算の共通パラメータ (表示領域と反復の設定) を表す不変のデータクラス。
+
+    フィールドは属性として参照します (辞書のキー検索より速い)。不変かつハッシュ可能なので、
+    そのままキャッシュのキーに使えます。プラグインへは従来どおり as_dict() の辞書を渡します。
+    """
+    center_real: float
+    center_imag: float
+    width: float
+    height: float
+    max_iterations: int
+    escape_radius: float
+
+    def as_dict(self) -> Dict[str, Any]:
+        """従来の共通パラメータ辞書 ('center_real', 'center_imag', 'width', 'height', 'max_iterations', 'escape_radius') に変換"""
+        # dataclasses.asdict は値を再帰的に deepcopy するため遅い。フィールドはすべて数値なので直接組み立てる
+        return {'center_real': self.center_real, 'center_imag': self.center_imag,
+                'width': self.width, 'height': self.height,
+                'max_iterations': self.max_iterations, 'escape_radius': self.escape_radius}
+
+    def replace(self, **changes) -> 'CommonParams':
+        """指定したフィールドだけを置き換えた新しいインスタンスを返す"""
+        return replace(self, **changes)
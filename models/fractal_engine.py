@@ -1,11 +1,16 @@
+import os
+import threading
 import numpy as np
-import traceback
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Literal
 
 from plugins.plugin_manager import PluginManager
 from plugins.base_fractal_plugin import FractalPlugin
 from plugins.base_coloring_plugin import ColoringAlgorithmPlugin
+from models.common_params import CommonParams
+from plugins._fractal_kernels import warmup_kernels, init_parallel_runtime, clear_grid_axes_cache, is_gpu_available, box_downsample, BufferPool, SIMD_LEVEL, BLOCK_BYTES
 from coloring.color_manager import ColorManager
 from logger.custom_logger import CustomLogger
 
@@ -14,6 +19,21 @@ if TYPE_CHECKING:
 
 logger = CustomLogger()
 
+
+def _readonly_lut(rgb_rows: np.ndarray) -> np.ndarray:
+    """(N, 3) の色から、アルファ255で埋めた読み取り専用の (N, 4) uint8 LUT を作ります。"""
+    lut = np.full((len(rgb_rows), 4), 255, dtype=np.uint8)
+    lut[:, :3] = rgb_rows
+    lut.setflags(write=False)
+    return lut
+
+
+# カラーマップが選択されていない場合にプラグインへ渡す空の LUT (プラグインはグレースケールにフォールバックする)
+_EMPTY_LUT = _readonly_lut(np.empty((0, 3), dtype=np.uint8))
+# 高解像度出力でカラーマップが見つからない場合に使う16段階のグレースケール LUT
+_GRAYSCALE_FALLBACK_LUT = _readonly_lut(np.repeat(np.arange(0, 256, 16, dtype=np.uint8)[:, np.newaxis], 3, axis=1))
+
+
 class FractalEngine:
     """
     フラクタル画像の計算、カラーリング、および関連パラメータ管理を行うコアエンジン。
@@ -23,6 +43,14 @@ class FractalEngine:
     各種パラメータやプラグインの管理、カラーマップの適用、
     設定の保存・復元など、アプリの中核的な役割を担います。
     """
+    # precision_mode='auto' で単精度を選ぶ、1ピクセルあたりの複素平面上の幅の下限
+    F32_MIN_PIXEL_WIDTH = 1e-6
+    # 高解像度出力で「計算→カラーリング→縮小」をまとめて行うタイルの一辺 (スーパーサンプリング後の画素数)。
+    # 出力画素数ではこれを AA係数で割った値になり、AA係数によらずタイルの中間配列の大きさがほぼ一定に保たれる
+    OUTPUT_TILE_SS_SIZE = 512
+    # 出力タイルの一辺の下限 (出力画素数)。タイルが細かくなりすぎてタイルごとの固定コストが目立つのを防ぐ
+    OUTPUT_TILE_MIN_SIZE = 64
+
     def __init__(self, project_root_path: Path, image_width_px=800, image_height_px=600,
                  settings_manager: 'SettingsManager | None' = None, fractal_plugin_folder="plugins/fractals",  # project_root_pathからの相対パス
                  coloring_plugin_folder="plugins/coloring", # 同上
@@ -46,6 +74,7 @@ class FractalEngine:
         self.center_imag = 0.0   # 複素平面上の中心（虚部）
         self.width = 3.0         # 複素平面上の表示幅
         self.escape_radius = 2.0 # 発散判定の半径
+        self.precision_mode: Literal['auto', 'f32', 'f64'] = 'auto'  # 反復計算精度 (プレビューと高解像度出力の両方に適用)
 
         self.image_width_px = image_width_px if image_width_px > 0 else 800  # 画像幅
         self.image_height_px = image_height_px if image_height_px > 0 else 600  # 画像高さ
@@ -76,6 +105,25 @@ class FractalEngine:
         self.current_color_map_name_non_divergent: str | None = None  # 非発散部カラーマップ名
 
         self.last_fractal_data_cache: dict | None = None  # 直近の計算結果キャッシュ
+        self._coloring_result_cache: dict[str, tuple[dict, tuple, np.ndarray]] = {}  # target_type -> (フラクタルデータ, 状態キー, カラーリング結果)
+        self._interior_skipped = False  # last_fractal_data_cache が内部ピクセルの反復を省略して計算されたか
+        self._frame_buffer_pool = BufferPool()  # compute_current_fractal の結果配列をフレーム間で再利用するプール
+        self._coloring_buffer_pool = BufferPool()  # apply_coloring (last_fractal_data_cache の色付け) の出力をフレーム間で再利用するプール
+        # 上の2つのプール (スレッド間で共有できない) とキャッシュを使う1フレーム分の計算・カラーリング・合成を直列化するロック。
+        # レンダリングタスクは置き換えられた古いタスクと同時に走ることがあるため、フレームの間これを保持する
+        self.render_lock = threading.Lock()
+        self._error_image_cache: dict[tuple[int, int], np.ndarray] = {}  # (高さ, 幅) -> カラーリング失敗時の赤い画像
+        self._cmap_cache: dict[tuple[str, str], np.ndarray] = {}  # (パック名, マップ名) -> (N, 4) uint8 LUT
+        self._tile_pool_workers = os.cpu_count() or 1
+        self._tile_pool = ThreadPoolExecutor(max_workers=self._tile_pool_workers, thread_name_prefix="fractal-tile")  # 高解像度出力のタイル並列処理用
+        init_parallel_runtime()  # 並列カーネルのスレッド層はメインスレッドで初期化する (バックグラウンドのウォームアップより前に)
+        self._warmup_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fractal-warmup")  # JITカーネルのウォームアップ用 (UIスレッドを止めない)
+        self._warmed_up_plugins: set = set()  # warmup を依頼済みのプラグイン
+        self._batch_depth = 0  # batch_update の入れ子の深さ (0 より大きい間はアスペクト比の再計算とキャッシュの無効化を遅らせる)
+        self._batch_aspect_dirty = False  # バッチ中にアスペクト比の再計算が要求されたか
+        self._batch_data_dirty = False  # バッチ中にフラクタルデータのキャッシュの無効化が要求されたか
+        self._last_warmup: Future | None = None  # 最後に依頼したウォームアップ (ワーカー1つのため、これの完了で全て完了)
+        self._cuda_ok: bool = False  # CUDA が利用可能か (初期化の最後に確認)
 
         # 設定のロードを試みる
         if self.settings_manager:
@@ -91,63 +139,104 @@ class FractalEngine:
         # デフォルトプラグインとカラーマップの初期化 (まだ設定されていない場合)
         self._initialize_default_plugins_and_map()
 
+        self._cuda_ok = is_gpu_available()
+        self.logger.log(f"フラクタルカーネル: SIMD={SIMD_LEVEL}, ブロック幅={BLOCK_BYTES}バイト, CUDA={'利用可能' if self._cuda_ok else '利用不可'}", level="DEBUG")
+        # 共有カーネルのJITコンパイル (2回目以降の起動ではディスクキャッシュの読込) をバックグラウンドで済ませ、初回描画の待ちを避ける
+        self._last_warmup = self._warmup_pool.submit(self._run_warmup, "共有カーネル", warmup_kernels)
+
+    def _run_warmup(self, label: str, warmup) -> None:
+        """ウォームアップ用スレッドで warmup を実行します。失敗しても描画時に改めてコンパイルされるため、警告のみ記録します。"""
+        try:
+            warmup()
+        except Exception as e:
+            self.logger.log(f"{label} のウォームアップに失敗しました: {e}", level="WARNING")
+
+    def _warmup_plugin(self, plugin: FractalPlugin | ColoringAlgorithmPlugin) -> None:
+        """
+        プラグインの warmup (JITコンパイル・キャッシュ読込) を、最初にアクティブにしたときに1回だけバックグラウンドで実行します。
+        ウォームアップ中に描画が始まった場合、そのカーネルはコンパイルの完了を待ってから実行されます。
+        """
+        if plugin in self._warmed_up_plugins:
+            return
+        self._warmed_up_plugins.add(plugin)
+        self._last_warmup = self._warmup_pool.submit(self._run_warmup, plugin.name, plugin.warmup)
+
+    def _wait_for_warmup(self) -> None:
+        """
+        実行中のウォームアップの完了を待ちます。計算・カラーリングの前に呼び出します。
+        Numba の workqueue スレッド層は複数スレッドからの並列カーネルの同時実行に対応しないため、
+        ウォームアップと描画の並列カーネルが重ならないようにします (ウォームアップ済みなら待ちは発生しません)。
+        """
+        last_warmup = self._last_warmup
+        if last_warmup is not None and not last_warmup.cancelled(): # shutdown で取り消された場合は待たない
+            last_warmup.result() # _run_warmup は例外を送出しない
+
+    def shutdown(self) -> None:
+        """
+        エンジンが持つスレッドプール (出力タイル用・ウォームアップ用) を終了します。
+        実行中の処理の完了は待たず、未着手の処理は取り消します。エンジンを破棄・置き換える前に呼び出してください
+        (呼び出し後は高解像度出力とプラグインのウォームアップを使用できません)。
+        """
+        self._tile_pool.shutdown(wait=False, cancel_futures=True)
+        self._warmup_pool.shutdown(wait=False, cancel_futures=True)
+        self.logger.log("フラクタルエンジンのスレッドプールを終了しました。", level="DEBUG")
+
     def _initialize_default_plugins_and_map(self):
         """
         利用可能なプラグインとカラーマップから、デフォルトのものを選択して初期設定します。
         Mandelbrotやスムーズカラーなど、一般的なものが優先的に選択されます。
         DivergentとNon-Divergentの両方のカラーリングコンテキストを初期化します。
         """
+        # 利用可能なプラグイン名・カラーパック名は一度だけ取得して各分岐で使い回す
+        fractal_names = self.get_available_fractal_plugin_names()
+        div_names = self.get_available_coloring_plugin_names(target_type='divergent')
+        nondiv_names = self.get_available_coloring_plugin_names(target_type='non_divergent')
+        available_color_packs = self.get_available_color_pack_names()
+
         # フラクタルプラグイン
         if self.current_fractal_plugin is None:
-            available_fractal_plugins = self.get_available_fractal_plugin_names()
-            if available_fractal_plugins:
+            if fractal_names:
                 default_fractal = "Mandelbrot"
-                if default_fractal in available_fractal_plugins: self.set_active_fractal_plugin(default_fractal)
-                else: self.set_active_fractal_plugin(available_fractal_plugins[0])
+                if default_fractal in fractal_names: self.set_active_fractal_plugin(default_fractal)
+                else: self.set_active_fractal_plugin(fractal_names[0])
             else: self.logger.log("フラクタルプラグインが見つかりません。フラクタル機能のデフォルト設定をスキップします。", level="WARNING")
 
         # 発散部カラーリングプラグイン
         if self.current_coloring_plugin_divergent is None:
-            available_div_plugins = self.get_available_coloring_plugin_names(target_type='divergent')
-            if available_div_plugins:
+            if div_names:
                 default_div_coloring = "スムーズカラー"
-                if default_div_coloring in available_div_plugins:
+                if default_div_coloring in div_names:
                     self.set_active_coloring_plugin(default_div_coloring, target_type='divergent')
                 else:
-                    self.set_active_coloring_plugin(available_div_plugins[0], target_type='divergent')
+                    self.set_active_coloring_plugin(div_names[0], target_type='divergent')
             else:
                 self.logger.log("発散部カラーリングプラグインが見つかりません。発散部カラーリングのデフォルト設定をスキップします。", level="WARNING")
 
         # 非発散部カラーリングプラグイン
         if self.current_coloring_plugin_non_divergent is None:
-            available_nondiv_plugins = self.get_available_coloring_plugin_names(target_type='non_divergent')
-            if available_nondiv_plugins:
+            if nondiv_names:
                 default_nondiv_coloring = "複素ポテンシャル"
-                if default_nondiv_coloring in available_nondiv_plugins:
+                if default_nondiv_coloring in nondiv_names:
                     self.set_active_coloring_plugin(default_nondiv_coloring, target_type='non_divergent')
                 else:
-                    self.set_active_coloring_plugin(available_nondiv_plugins[0], target_type='non_divergent')
+                    self.set_active_coloring_plugin(nondiv_names[0], target_type='non_divergent')
             else:
                 self.logger.log("非発散部カラーリングプラグインが見つかりません。非発散部カラーリングのデフォルト設定をスキップします。", level="WARNING")
 
-        # デフォルトカラーマップ
-        available_color_packs = self.get_available_color_pack_names()
+        # デフォルトカラーマップ (両ターゲットで同じパックを使うため、マップ名の取得も一度だけ行う)
+        default_pack = None
+        default_maps: list[str] = []
+        if available_color_packs:
+            default_pack = "デフォルト" if "デフォルト" in available_color_packs else available_color_packs[0]
+            default_maps = self.get_available_color_map_names_in_pack(default_pack)
 
         if self.current_color_pack_name_divergent is None or self.current_color_map_name_divergent is None:
-            if available_color_packs:
-                pack_to_try = "デフォルト"
-                if pack_to_try not in available_color_packs: pack_to_try = available_color_packs[0]
-                maps_in_pack = self.get_available_color_map_names_in_pack(pack_to_try)
-                if maps_in_pack:
-                    self.set_active_color_map(pack_to_try, maps_in_pack[0], target_type='divergent')
+            if default_maps:
+                self.set_active_color_map(default_pack, default_maps[0], target_type='divergent')
 
         if self.current_color_pack_name_non_divergent is None or self.current_color_map_name_non_divergent is None:
-            if available_color_packs:
-                pack_to_try = "デフォルト"
-                if pack_to_try not in available_color_packs: pack_to_try = available_color_packs[0]
-                maps_in_pack = self.get_available_color_map_names_in_pack(pack_to_try)
-                if maps_in_pack:
-                    self.set_active_color_map(pack_to_try, maps_in_pack[0], target_type='non_divergent')
+            if default_maps:
+                self.set_active_color_map(default_pack, default_maps[0], target_type='non_divergent')
 
         if not available_color_packs and \
            (self.current_color_pack_name_divergent is None or self.current_color_map_name_divergent is None or \
@@ -164,7 +253,7 @@ class FractalEngine:
         """
         self.image_width_px = image_width_px if image_width_px > 0 else self.image_width_px
         self.image_height_px = image_height_px if image_height_px > 0 else self.image_height_px
-        self.update_aspect_ratio()
+        self._refresh_aspect_ratio()
 
     def update_aspect_ratio(self):
         """
@@ -175,6 +264,45 @@ class FractalEngine:
             self.height = (self.width * self.image_height_px) / self.image_width_px
         else: self.height = self.width
 
+    @contextmanager
+    def batch_update(self):
+        """
+        複数の設定変更をまとめて適用するためのコンテキストです (入れ子にできます)。
+        ブロック内のセッターはアスペクト比の再計算とフラクタルデータのキャッシュの無効化を行わずに記録だけし、
+        最も外側のブロックを抜けるときに必要なものを1回だけ行います。ブロック内では 'height' が古い値のままの場合があります。
+
+        使用例:
+            with engine.batch_update():
+                engine.set_active_fractal_plugin("Julia")
+                engine.set_fractal_plugin_parameters({'c_real': -0.8})
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                if self._batch_aspect_dirty:
+                    self._batch_aspect_dirty = False
+                    self.update_aspect_ratio()
+                if self._batch_data_dirty:
+                    self._batch_data_dirty = False
+                    self.last_fractal_data_cache = None
+
+    def _refresh_aspect_ratio(self):
+        """アスペクト比を再計算します (batch_update 中は抜けるまで遅らせます)。"""
+        if self._batch_depth > 0:
+            self._batch_aspect_dirty = True
+        else:
+            self.update_aspect_ratio()
+
+    def _invalidate_fractal_data(self):
+        """フラクタルデータのキャッシュを無効化します (batch_update 中は抜けるまで遅らせます)。"""
+        if self._batch_depth > 0:
+            self._batch_data_dirty = True
+        else:
+            self.last_fractal_data_cache = None
+
     def set_common_parameters(self, center_real, center_imag, width, max_iterations, escape_radius=None):
         """
         フラクタル計算の共通パラメータを設定します。
@@ -188,21 +316,19 @@ class FractalEngine:
         """
         self.center_real=center_real; self.center_imag=center_imag; self.width=width; self.max_iterations=max_iterations
         if escape_radius is not None: self.escape_radius = escape_radius
-        self.update_aspect_ratio()
-        self.last_fractal_data_cache = None # キャッシュを無効化
+        self._refresh_aspect_ratio()
+        self._invalidate_fractal_data() # キャッシュを無効化
 
-    def get_common_parameters(self) -> dict:
+    def get_common_parameters(self) -> CommonParams:
         """
         現在のフラクタル計算の共通パラメータを取得します。
 
         Returns:
-            dict: 以下のキーを含む辞書:
-                  'center_real', 'center_imag', 'width', 'height',
-                  'max_iterations', 'escape_radius'
+            CommonParams: center_real, center_imag, width, height, max_iterations, escape_radius を持つ不変のデータクラス。
+                          従来の辞書が必要な場合は as_dict() を使用します (プラグインへは辞書で渡します)。
         """
-        return {'center_real': self.center_real, 'center_imag': self.center_imag,
-                'width': self.width, 'height': self.height,
-                'max_iterations': self.max_iterations, 'escape_radius': self.escape_radius}
+        return CommonParams(self.center_real, self.center_imag, self.width, self.height,
+                            self.max_iterations, self.escape_radius)
 
     def set_active_fractal_plugin(self, plugin_name: str) -> bool:
         """指定された名前のフラクタルプラグインをアクティブにします。
@@ -218,16 +344,17 @@ class FractalEngine:
         plugin = self.plugin_manager.get_fractal_plugin(plugin_name)
         if plugin:
             self.current_fractal_plugin = plugin
+            self._warmup_plugin(plugin)
             defaults = plugin.get_default_view_parameters()
             self.center_real = defaults.get('center_real', self.center_real)
             self.center_imag = defaults.get('center_imag', self.center_imag)
             self.width = defaults.get('width', self.width)
             self.max_iterations = defaults.get('max_iterations', self.max_iterations)
-            self.update_aspect_ratio()
+            self._refresh_aspect_ratio()
             self.current_fractal_plugin_parameters.clear()
             for p_def in plugin.get_parameters_definition():
                 self.current_fractal_plugin_parameters[p_def['name']] = p_def['default']
-            self.last_fractal_data_cache = None
+            self._invalidate_fractal_data()
             return True
         return False
 
@@ -257,7 +384,22 @@ class FractalEngine:
         """
         if self.current_fractal_plugin and name in self.current_fractal_plugin_parameters:
             self.current_fractal_plugin_parameters[name] = value
-            self.last_fractal_data_cache = None
+            self._invalidate_fractal_data()
+
+    def set_fractal_plugin_parameters(self, params: dict):
+        """
+        現在アクティブなフラクタルプラグインのパラメータ値をまとめて設定します。
+        定義済みのパラメータのみを1回の更新で反映し、キャッシュの無効化も1回だけ行います。
+
+        Args:
+            params (dict): パラメータ名と値の辞書。未定義の名前は無視されます。
+        """
+        if not self.current_fractal_plugin:
+            return
+        known = {name: value for name, value in params.items() if name in self.current_fractal_plugin_parameters}
+        if known:
+            self.current_fractal_plugin_parameters.update(known)
+            self._invalidate_fractal_data()
 
     def get_fractal_plugin_parameters(self) -> dict:
         """
@@ -283,13 +425,17 @@ class FractalEngine:
 
         if target_type == 'divergent':
             self.current_coloring_plugin_divergent = plugin
+            self._warmup_plugin(plugin)
             self.current_coloring_plugin_parameters_divergent.clear()
             for p_def in plugin.get_parameters_definition():
                 self.current_coloring_plugin_parameters_divergent[p_def['name']] = p_def['default']
             self.logger.log(f"'{plugin_name}' に設定", level="INFO")
             return True
         elif target_type == 'non_divergent':
+            if self._interior_skipped and plugin.needs_interior_z:
+                self._invalidate_fractal_data() # 内部の最後のZを省略した計算結果は、このプラグインでは色付けできない
             self.current_coloring_plugin_non_divergent = plugin
+            self._warmup_plugin(plugin)
             self.current_coloring_plugin_parameters_non_divergent.clear()
             for p_def in plugin.get_parameters_definition():
                 self.current_coloring_plugin_parameters_non_divergent[p_def['name']] = p_def['default']
@@ -343,6 +489,30 @@ class FractalEngine:
         else:
             self.logger.log(f"パラメータ '{name}' をターゲットタイプ '{target_type}' に設定できませんでした。", level="WARNING")
 
+    def set_coloring_plugin_parameters(self, params: dict, target_type: str):
+        """
+        指定されたターゲットタイプのアクティブなカラーリングプラグインのパラメータ値をまとめて設定します。
+        定義済みのパラメータのみを1回の更新で反映し、設定できなかった名前は1回の警告にまとめます。
+        """
+        if target_type == 'divergent':
+            params_dict = self.current_coloring_plugin_parameters_divergent
+            plugin = self.current_coloring_plugin_divergent
+        elif target_type == 'non_divergent':
+            params_dict = self.current_coloring_plugin_parameters_non_divergent
+            plugin = self.current_coloring_plugin_non_divergent
+        else:
+            params_dict = None
+            plugin = None
+
+        if not plugin or params_dict is None:
+            self.logger.log(f"パラメータ {list(params)} をターゲットタイプ '{target_type}' に設定できませんでした。", level="WARNING")
+            return
+        known = {name: value for name, value in params.items() if name in params_dict}
+        params_dict.update(known)
+        unknown = [name for name in params if name not in known]
+        if unknown:
+            self.logger.log(f"パラメータ {unknown} をターゲットタイプ '{target_type}' に設定できませんでした。", level="WARNING")
+
     def get_coloring_plugin_parameters(self, target_type: str) -> dict:
         if target_type == 'divergent':
             return self.current_coloring_plugin_parameters_divergent.copy()
@@ -387,6 +557,34 @@ class FractalEngine:
         """
         return self.color_manager.get_color_maps_in_pack(pack_name)
 
+    def _get_lut(self, pack_name: str | None, map_name: str | None) -> np.ndarray | None:
+        """
+        指定されたカラーマップを (N, 4) の uint8 LUT として返します。
+        LUT は (パック名, マップ名) ごとに一度だけ構築してキャッシュし、カラーリングのたびに
+        タプルのリストから配列を作り直すコストを避けます。RGBのみのマップはアルファ255で埋めます。
+
+        Args:
+            pack_name (str | None): カラーパック名。
+            map_name (str | None): カラーマップ名。
+        Returns:
+            np.ndarray | None: (N, 4) uint8 の LUT。マップが見つからない場合はNone。
+        """
+        if not pack_name or not map_name:
+            return None
+        key = (pack_name, map_name)
+        lut = self._cmap_cache.get(key)
+        if lut is None:
+            map_data = self.color_manager.get_color_map_data(pack_name, map_name)
+            if not map_data:
+                return None
+            lut = np.full((len(map_data), 4), 255, dtype=np.uint8)
+            for i, color in enumerate(map_data):
+                channels = min(len(color), 4)
+                lut[i, :channels] = color[:channels]
+            lut.setflags(write=False) # 共有キャッシュのため読み取り専用にする
+            self._cmap_cache[key] = lut
+        return lut
+
     def get_current_color_map_selection(self, target_type: str) -> tuple[str | None, str | None]: # target_type を追加
         """
         指定されたターゲットタイプで現在選択されているカラーパック名とカラーマップ名をタプルで返します。
@@ -402,24 +600,118 @@ class FractalEngine:
         """
         現在アクティブなフラクタルプラグインとパラメータを使用してフラクタルデータを計算します。
         計算結果は内部キャッシュ (`last_fractal_data_cache`) にも保存されます。
+        CUDA が利用可能な場合、対応するプラグイン (Mandelbrot / Julia) はGPUで計算します (失敗時はCPUにフォールバック)。
+        CPUでの反復計算の精度は precision_mode に従います ('auto' では浅いズームで単精度)。
+        非発散部のカラーリングプラグインが集合内部の最後のZを使わない場合は、内部と確定できるピクセルの反復を省略します。
+        結果の配列はフレーム間で再利用するバッファプールの作業領域に書き込まれるため、前回の結果は呼び出し時点で破棄されます
+        (前回の配列を保持し続ける場合は、呼び出し前にコピーしてください)。
+        別スレッドの描画と同時に呼ばないよう、結果を使い終わるまで `render_lock` を保持して呼び出してください。
 
         Returns:
-            dict | None: 計算されたフラクタルデータ (通常 'iterations', 'last_values' を含む辞書)。
+            dict | None: 計算されたフラクタルデータ (通常 'iterations', 'last_z_real', 'last_z_imag' を含む辞書)。
+                         'iterations' は C連続の int32 に正規化され、'last_re' / 'last_im' (float32) が追加されます。
                          計算に失敗した場合はNone。
         """
+        self._wait_for_warmup()
         if not self.current_fractal_plugin: return None
-        common_params = self.get_common_parameters()
+        common_params = self.get_common_parameters().as_dict()
+        common_params['use_gpu'] = self._cuda_ok
+        common_params['precision'] = self._resolve_precision(self.width, self.image_width_px)
+        interior_plugin = self.current_coloring_plugin_non_divergent
+        common_params['skip_interior'] = not (interior_plugin and interior_plugin.needs_interior_z)
+        self._interior_skipped = common_params['skip_interior']
+        # 前回の結果はプールの作業領域を参照しているため、上書きする前にキャッシュから外す (古いカラーリング結果も捨てる)
+        self.last_fractal_data_cache = None
+        self._coloring_result_cache.clear()
+        common_params['buffer_pool'] = self._frame_buffer_pool
+        fused_coloring = self._fused_coloring_spec()
+        if fused_coloring is not None:
+            common_params['fused_coloring'] = fused_coloring
         try:
-            self.last_fractal_data_cache = self.current_fractal_plugin.compute_fractal(
+            fractal_data = self.current_fractal_plugin.compute_fractal(
                 common_params, self.current_fractal_plugin_parameters,
                 self.image_width_px, self.image_height_px
             )
+            fused_rgba = fractal_data.pop('fused_rgba', None) if fractal_data else None
+            self.last_fractal_data_cache = self._pack_fractal_data_soa(fractal_data, self._frame_buffer_pool)
+            if fused_rgba is not None:
+                self._store_fused_coloring(fused_rgba)
             return self.last_fractal_data_cache
         except Exception as e:
             self.logger.log(f"計算中のエラー: {e}", level="ERROR")
             self.last_fractal_data_cache = None
+            self._coloring_result_cache.clear()
+            return None
+
+    def _fused_coloring_spec(self) -> tuple | None:
+        """
+        発散部のカラーリングプラグインがフラクタル計算と同じパスでの色付け (get_fused_coloring) に対応していれば、
+        その指定を返します。GPUで計算する場合は融合しません (None)。
+        """
+        plugin = self.current_coloring_plugin_divergent
+        if plugin is None or self._cuda_ok:
+            return None
+        pack_name, map_name = self.get_current_color_map_selection('divergent')
+        try:
+            return plugin.get_fused_coloring(self.current_coloring_plugin_parameters_divergent, self._get_lut(pack_name, map_name))
+        except Exception as e:
+            self.logger.log(f"融合カラーリングの準備に失敗したため、通常のカラーリングを使います: {e}", level="WARNING")
             return None
 
+    def _store_fused_coloring(self, fused_rgba: np.ndarray) -> None:
+        """
+        フラクタル計算と同時に色付けされた発散部の画像を、last_fractal_data_cache に対する
+        apply_coloring('divergent') の結果としてキャッシュします (キーは apply_coloring と同じ)。
+        """
+        height_px, width_px = fused_rgba.shape[:2]
+        pack_name, map_name = self.get_current_color_map_selection('divergent')
+        cache_key = self._coloring_cache_key(self.current_coloring_plugin_divergent, self.current_coloring_plugin_parameters_divergent,
+                                             pack_name, map_name, self.get_common_parameters().replace(width=width_px, height=height_px))
+        if cache_key is not None:
+            self._coloring_result_cache['divergent'] = (self.last_fractal_data_cache, cache_key, fused_rgba)
+
+    @staticmethod
+    def _pack_fractal_data_soa(fractal_data: dict | None, buffer_pool: BufferPool | None = None) -> dict | None:
+        """
+        プラグインの計算結果を、カラーリング側が前提とできるメモリレイアウトに揃えます。
+
+        - 'iterations' は C連続の int32 配列に正規化します。
+        - 最後のZから C連続の float32 の実部/虚部プレーン 'last_re' / 'last_im' を作ります。
+          元データは 'last_z_real' / 'last_z_imag' (float64, SoA) を優先し、
+          ない場合は互換性のため 'last_zn_values' (複素数, AoS) の実部/虚部を使います。
+
+        プラグインごとに dtype やメモリ順序が異なっても、カラーリング時に暗黙のコピーが発生しないようにするためのものです。
+
+        Args:
+            fractal_data (dict | None): フラクタルプラグインの compute_fractal が返した辞書。
+            buffer_pool (BufferPool | None): 指定された場合、'last_re' / 'last_im' をこのプールの作業領域に書き込みます。
+        Returns:
+            dict | None: 正規化済みの辞書 (入力と同じオブジェクト)。入力がNoneの場合はNone。
+        """
+        if not fractal_data:
+            return fractal_data
+        iterations = fractal_data.get('iterations')
+        if iterations is not None:
+            fractal_data['iterations'] = np.ascontiguousarray(iterations, dtype=np.int32)
+        if 'last_re' in fractal_data:
+            return fractal_data
+        z_real = fractal_data.get('last_z_real')
+        z_imag = fractal_data.get('last_z_imag')
+        if z_real is None or z_imag is None:
+            last_zn_values = fractal_data.get('last_zn_values')
+            if last_zn_values is None:
+                return fractal_data
+            z_real, z_imag = last_zn_values.real, last_zn_values.imag
+        if buffer_pool is None:
+            fractal_data['last_re'] = np.ascontiguousarray(z_real, dtype=np.float32)
+            fractal_data['last_im'] = np.ascontiguousarray(z_imag, dtype=np.float32)
+        else:
+            fractal_data['last_re'] = buffer_pool.get('last_re', z_real.shape, np.float32)
+            fractal_data['last_im'] = buffer_pool.get('last_im', z_imag.shape, np.float32)
+            np.copyto(fractal_data['last_re'], z_real, casting='same_kind')
+            np.copyto(fractal_data['last_im'], z_imag, casting='same_kind')
+        return fractal_data
+
     def apply_coloring(self, target_type: str, fractal_data_override: dict | None = None) -> np.ndarray | None:
         """
         指定されたフラクタルデータ（またはキャッシュされたデータ）に、
@@ -433,7 +725,15 @@ class FractalEngine:
         Returns:
             np.ndarray | None: RGBA形式 (高さ x 幅 x 4) のカラーリングされた画像データ (uint8)。
                                カラーリングに失敗した場合はNone、またはエラーを示す赤い画像。
+
+        `last_fractal_data_cache` をカラーリングする場合、結果はターゲットタイプごとにキャッシュされ、
+        プラグイン・パラメータ・カラーマップ・共通パラメータが前回と同じなら同じ配列をそのまま返します。
+        このときプラグインには共通パラメータの 'buffer_pool' としてエンジンのプールが渡され、出力はその作業領域になることがあります。
+        返された配列は共有され、次に同じターゲットタイプを別の状態でカラーリングしたときに上書きされることがあるため、
+        呼び出し側で変更したり保持し続けたりしないでください。
+        compute_current_fractal と同様に、`render_lock` を保持して呼び出してください。
         """
+        self._wait_for_warmup()
         data_to_color = fractal_data_override if fractal_data_override is not None else self.last_fractal_data_cache
 
         active_plugin = self.get_active_coloring_plugin(target_type)
@@ -446,36 +746,75 @@ class FractalEngine:
             self.logger.log(f"apply_coloring ({target_type}) 中止: プラグイン ({active_plugin is not None}) またはデータ ({data_to_color is not None}) がありません。", level="WARNING")
             return None
 
-        # 共通パラメータを構築
-        common_params = self.get_common_parameters()
-        # common_params の 'height' と 'width' を、これから処理する画像のピクセル寸法で上書きする
+        # 共通パラメータを構築 ('height' と 'width' は、これから処理する画像のピクセル寸法で上書きする)
         iterations_array = data_to_color.get('iterations')
         if iterations_array is not None and iterations_array.ndim == 2:
             height_px, width_px = iterations_array.shape
-            common_params['height'] = height_px
-            common_params['width'] = width_px
         else:
             self.logger.log("apply_coloring: iterations_array が見つからないか、無効な形状です。デフォルトの画像サイズを使用します。", level="WARNING")
-            common_params['height'] = self.image_height_px
-            common_params['width'] = self.image_width_px
+            height_px, width_px = self.image_height_px, self.image_width_px
+        pixel_common_params = self.get_common_parameters().replace(width=width_px, height=height_px)
+        common_params = pixel_common_params.as_dict()
+
+        cache_key = None
+        if data_to_color is self.last_fractal_data_cache:
+            cache_key = self._coloring_cache_key(active_plugin, plugin_params, pack_name, map_name, pixel_common_params)
+            cached = self._coloring_result_cache.get(target_type)
+            if cache_key is not None and cached is not None and cached[0] is data_to_color and cached[1] == cache_key:
+                self.logger.log(f"apply_coloring ({target_type}): 前回のカラーリング結果を再利用します。", level="DEBUG")
+                return cached[2]
+            if cache_key is not None:
+                # 結果はキャッシュが保持する前回の結果と置き換わるため、出力の作業領域を使い回せる
+                common_params['buffer_pool'] = self._coloring_buffer_pool
 
         try:
-            color_map_data = self.color_manager.get_color_map_data(pack_name, map_name) if pack_name and map_name else []
-            self.logger.log(f"apply_coloring: color_map_dataの長さ={len(color_map_data)} (先頭3色={color_map_data[:3] if color_map_data else 'なし'})", level="DEBUG")
-            return active_plugin.apply_coloring(
+            color_map_data = self._get_lut(pack_name, map_name)
+            if color_map_data is None:
+                color_map_data = _EMPTY_LUT
+            if self.logger.is_enabled_for("DEBUG"): # 毎フレーム通るため、LUT の文字列化は DEBUG 出力時のみ
+                self.logger.log(f"apply_coloring: color_map_dataの長さ={len(color_map_data)} (先頭3色={color_map_data[:3].tolist() if len(color_map_data) else 'なし'})", level="DEBUG")
+            colored_image = active_plugin.apply_coloring(
                 fractal_data=data_to_color,
                 common_fractal_params=common_params,
                 algorithm_params=plugin_params,
                 color_map_data=color_map_data
             )
+            if cache_key is not None and colored_image is not None:
+                self._coloring_result_cache[target_type] = (data_to_color, cache_key, colored_image)
+            return colored_image
         except Exception as e:
+            # 失敗が繰り返されても (リサイズ中など) 重くならないよう、トレースバックの整形は DEBUG レベルでのみ行う
             self.logger.log(f"カラーリングプラグイン '{active_plugin.name}' の実行中にエラーが発生しました: {e}", level="ERROR")
-            self.logger.log("トレースバック (直近の呼び出し):", level="ERROR")
-            traceback.print_exc()
-            h = common_params.get('height', self.image_height_px)
-            w = common_params.get('width', self.image_width_px)
-            err_img = np.full((h if h > 0 else 1, w if w > 0 else 1, 4), [255, 0, 0, 255], dtype=np.uint8)
-            return err_img
+            self.logger.log("トレースバック (直近の呼び出し):", level="DEBUG", exc_info=True)
+            if cache_key is not None:
+                self._coloring_result_cache.pop(target_type, None) # 前回の結果の作業領域が書きかけの可能性がある
+            return self._error_image(height_px, width_px)
+
+    def _error_image(self, height_px: int, width_px: int) -> np.ndarray:
+        """
+        カラーリング失敗時に返す赤一色の RGBA 画像を返します。
+        形状ごとに一度だけ生成して使い回すため、返す配列は読み取り専用です。
+        """
+        shape = (height_px if height_px > 0 else 1, width_px if width_px > 0 else 1)
+        err_img = self._error_image_cache.get(shape)
+        if err_img is None:
+            err_img = np.full((*shape, 4), [255, 0, 0, 255], dtype=np.uint8)
+            err_img.flags.writeable = False
+            self._error_image_cache[shape] = err_img
+        return err_img
+
+    @staticmethod
+    def _coloring_cache_key(plugin: ColoringAlgorithmPlugin, plugin_params: dict, pack_name: str | None, map_name: str | None, common_params: CommonParams) -> tuple | None:
+        """
+        apply_coloring の結果を左右する状態をまとめたキーを返します (CommonParams は不変なのでそのままキーに含める)。
+        パラメータにハッシュ化できない値が含まれる場合は None (キャッシュしない) を返します。
+        """
+        key = (plugin, tuple(sorted(plugin_params.items())), pack_name, map_name, common_params)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
 
     def _get_antialiasing_factor(self, antialiasing_level_str: str) -> int:
         """
@@ -491,11 +830,11 @@ class FractalEngine:
         if antialiasing_level_str == "4x4 SSAA": return 4
         return 1
 
-    def _prepare_output_parameters(self, output_width: int, output_height: int, common_params_override: dict, fractal_plugin_name_override: str | None, fractal_plugin_params_override: dict | None, coloring_algo_name_override: str | None, coloring_algo_params_override: dict | None, color_pack_name_override: str | None, color_map_name_override: str | None, antialiasing_level: str) -> tuple[dict, FractalPlugin, dict, ColoringAlgorithmPlugin, dict, list, int, int, int]:
+    def _prepare_output_parameters(self, output_width: int, output_height: int, common_params_override: dict, fractal_plugin_name_override: str | None, fractal_plugin_params_override: dict | None, coloring_algo_name_override: str | None, coloring_algo_params_override: dict | None, color_pack_name_override: str | None, color_map_name_override: str | None, antialiasing_level: str) -> tuple[dict, FractalPlugin, dict, ColoringAlgorithmPlugin, dict, np.ndarray, int, int, int]:
         """
         出力画像生成のための全パラメータを準備し、必要なインスタンスやデータを返す。
         """
-        final_common_params = self.get_common_parameters()
+        final_common_params = self.get_common_parameters().as_dict()
         final_common_params.update(common_params_override)
         active_fractal_plugin = self.plugin_manager.get_fractal_plugin(fractal_plugin_name_override) if fractal_plugin_name_override else self.current_fractal_plugin
         if not active_fractal_plugin:
@@ -528,9 +867,9 @@ class FractalEngine:
         current_pack_name_for_target, current_map_name_for_target = self.get_current_color_map_selection(active_target_type_for_output)
         pack_name = color_pack_name_override if color_pack_name_override else current_pack_name_for_target
         map_name = color_map_name_override if color_map_name_override else current_map_name_for_target
-        final_color_map_data = self.color_manager.get_color_map_data(pack_name, map_name) if pack_name and map_name else []
-        if not final_color_map_data:
-            final_color_map_data = [(i,i,i) for i in range(0,256,16)]
+        final_color_map_data = self._get_lut(pack_name, map_name)
+        if final_color_map_data is None:
+            final_color_map_data = _GRAYSCALE_FALLBACK_LUT
         aa_factor = self._get_antialiasing_factor(antialiasing_level)
         ss_width = output_width * aa_factor
         ss_height = output_height * aa_factor
@@ -540,12 +879,12 @@ class FractalEngine:
 
     def _compute_fractal_for_output(self, plugin: FractalPlugin, params: dict, common_params: dict, width: int, height: int) -> dict | None:
         try:
-            return plugin.compute_fractal(common_params, params, width, height)
+            return self._pack_fractal_data_soa(plugin.compute_fractal(common_params, params, width, height))
         except Exception as e:
             self.logger.log(f"スーパーサンプリングされたフラクタル計算に失敗: {e}", level="ERROR")
             return None
 
-    def _apply_coloring_for_output(self, plugin: ColoringAlgorithmPlugin, params: dict, common_params: dict, fractal_data: dict, color_map_data: list) -> np.ndarray | None:
+    def _apply_coloring_for_output(self, plugin: ColoringAlgorithmPlugin, params: dict, common_params: dict, fractal_data: dict, color_map_data: np.ndarray) -> np.ndarray | None:
         try:
             common_params_for_coloring = common_params.copy()
             common_params_for_coloring['image_width_px'] = common_params['width']
@@ -555,20 +894,106 @@ class FractalEngine:
             self.logger.log(f"スーパーサンプリングされたカラーリングに失敗: {e}", level="ERROR")
             return None
 
-    def _downsample_image(self, image: np.ndarray, output_width: int, output_height: int, aa_factor: int) -> np.ndarray:
+    def _iter_output_tiles(self, output_width: int, output_height: int, aa_factor: int, tiling: bool):
+        """
+        出力画像をタイルに分割し、(x, y, 幅, 高さ) を順に返します。
+        タイルの一辺は OUTPUT_TILE_SS_SIZE // aa_factor 出力画素 (下限 OUTPUT_TILE_MIN_SIZE) です。
+        tiling が False の場合は画像全体を1枚のタイルとして返します。
+        """
+        if not tiling:
+            yield 0, 0, output_width, output_height
+            return
+        tile_size = max(self.OUTPUT_TILE_MIN_SIZE, self.OUTPUT_TILE_SS_SIZE // max(1, aa_factor))
+        for tile_y in range(0, output_height, tile_size):
+            for tile_x in range(0, output_width, tile_size):
+                yield tile_x, tile_y, min(tile_size, output_width - tile_x), min(tile_size, output_height - tile_y)
+
+    @staticmethod
+    def _tile_common_params(common_params: dict, tile_x: int, tile_y: int, tile_width: int, tile_height: int,
+                            output_width: int, output_height: int) -> dict:
+        """
+        出力画像全体の共通パラメータから、指定タイルが覆う複素平面上の領域の共通パラメータを作成します。
+        タイル内の画素の座標は、画像全体を一度に計算した場合と同じ格子上に並びます。
+        """
+        pixel_width = common_params['width'] / output_width
+        pixel_height = common_params['height'] / output_height
+        min_x = common_params['center_real'] - common_params['width'] / 2.0
+        min_y = common_params['center_imag'] - common_params['height'] / 2.0
+        tile_params = common_params.copy()
+        tile_params['width'] = tile_width * pixel_width
+        tile_params['height'] = tile_height * pixel_height
+        tile_params['center_real'] = min_x + (tile_x + tile_width / 2.0) * pixel_width
+        tile_params['center_imag'] = min_y + (tile_y + tile_height / 2.0) * pixel_height
+        return tile_params
+
+    def _downsample_image(self, image: np.ndarray, output_width: int, output_height: int, aa_factor: int,
+                          out: np.ndarray | None = None, parallel: bool = True) -> np.ndarray:
+        """
+        スーパーサンプリングされた画像を aa_factor x aa_factor ブロックの平均 (切り捨て) で縮小します。
+
+        縮小は共有カーネルの box_downsample で行い、ブロックの和を整数のまま集計します
+        (float への変換と縮約用の一時配列を作りません)。parallel が False の場合は行を逐次処理します。
+        aa_factor が1の場合はコピーせずにそのまま返します。
+        out を指定した場合は縮小結果をそこへ書き込み、out を返します。
+        """
         if aa_factor > 1:
             try:
                 if image.shape[2] != 4:
                     self.logger.log(f"カラーリングから4チャンネルを期待しましたが、{image.shape[2]} を取得しました", level="ERROR")
                     return image
-                reshaped = image.reshape(output_height, aa_factor, output_width, aa_factor, 4)
-                return reshaped.mean(axis=(1, 3)).astype(np.uint8)
+                if image.shape[0] != output_height * aa_factor or image.shape[1] != output_width * aa_factor:
+                    raise ValueError("入力画像の形状が出力サイズとAA係数に一致しません")
+                downsampled = out if out is not None else np.empty((output_height, output_width, 4), dtype=np.uint8)
+                return box_downsample(np.ascontiguousarray(image, dtype=np.uint8), aa_factor, downsampled, parallel=parallel)
             except ValueError as e:
                 self.logger.log(f"ダウンサンプリングリシェイプ中のエラー: {e}。入力: {image.shape}, ターゲット: {output_height}x{output_width}, AA: {aa_factor}", level="ERROR")
                 return image
+        elif out is not None:
+            out[...] = image
+            return out
         else:
             return image
 
+    def _resolve_precision(self, complex_width: float, width_px: int) -> str:
+        """
+        反復計算の精度 ('f32' / 'f64') を決定します。
+
+        precision_mode が 'auto' の場合、計算する格子 (高解像度出力ではスーパーサンプリング後) の
+        1ピクセルあたりの複素平面上の幅が F32_MIN_PIXEL_WIDTH より大きい (浅いズーム) ときのみ単精度を選択します。
+        """
+        if self.precision_mode in ('f32', 'f64'):
+            return self.precision_mode
+        pixel_width = complex_width / width_px if width_px > 0 else 0.0
+        return 'f32' if pixel_width > self.F32_MIN_PIXEL_WIDTH else 'f64'
+
+    def _render_output_tile(self, tile: tuple[int, int, int, int], fractal_plugin: FractalPlugin, fractal_params: dict,
+                            coloring_plugin: ColoringAlgorithmPlugin, coloring_params: dict, color_map_data: np.ndarray,
+                            common_params: dict, output_width: int, output_height: int, aa_factor: int,
+                            output_image: np.ndarray, parallel_kernels: bool) -> bool:
+        """
+        1枚の出力タイルについて計算→カラーリング→縮小を行い、output_image の対応範囲へ書き込みます。
+
+        Args:
+            tile (tuple[int, int, int, int]): タイルの (x, y, 幅, 高さ) (出力画素単位)。
+            parallel_kernels (bool): フラクタルカーネルの行並列 (prange) を使うかどうか。
+                タイル自体をスレッドで並列処理する場合は False にして、スレッドの入れ子を避けます。
+        Returns:
+            bool: 成功した場合はTrue。
+        """
+        tile_x, tile_y, tile_width, tile_height = tile
+        tile_common_params = self._tile_common_params(common_params, tile_x, tile_y, tile_width, tile_height, output_width, output_height)
+        tile_common_params['parallel_kernels'] = parallel_kernels
+        tile_common_params['reuse_buffers'] = True # タイルの中間結果は縮小後に捨てるため、スレッドごとの作業バッファを使い回す
+        fractal_data_ss = self._compute_fractal_for_output(fractal_plugin, fractal_params, tile_common_params, tile_width * aa_factor, tile_height * aa_factor)
+        if fractal_data_ss is None:
+            return False
+        colored_image_ss_rgba = self._apply_coloring_for_output(coloring_plugin, coloring_params, tile_common_params, fractal_data_ss, color_map_data)
+        if colored_image_ss_rgba is None:
+            return False
+        tile_out = output_image[tile_y:tile_y + tile_height, tile_x:tile_x + tile_width]
+        return self._downsample_image(colored_image_ss_rgba, tile_width, tile_height, aa_factor, out=tile_out,
+                                      parallel=parallel_kernels) is tile_out
+
     def generate_image_for_output(self, output_width: int, output_height: int,
                                   common_params_override: dict,
                                   fractal_plugin_name_override: str | None = None,
@@ -577,24 +1002,51 @@ class FractalEngine:
                                   coloring_algo_params_override: dict | None = None,
                                   color_pack_name_override: str | None = None,
                                   color_map_name_override: str | None = None,
-                                  antialiasing_level: str = "なし"
+                                  antialiasing_level: str = "なし",
+                                  use_gpu: bool | None = None
                                   ) -> np.ndarray | None:
+        """
+        指定サイズの高解像度画像を、必要に応じてスーパーサンプリングして生成します。
+
+        Args:
+            use_gpu (bool | None): Trueの場合、対応するフラクタルプラグイン (Mandelbrot / Julia) は
+                CUDA が利用可能であればGPUで反復計算を行います。利用できない場合はCPUで計算します。
+                None (デフォルト) の場合は、エンジン初期化時に CUDA が利用可能と判定されていればGPUを使用します。
+
+        反復計算の精度は precision_mode に従います ('auto' ではズームの深さから f32 / f64 を自動選択)。
+        Returns:
+            np.ndarray | None: RGBA形式 (高さ x 幅 x 4) の画像データ (uint8)。失敗した場合はNone。
+        """
+        self._wait_for_warmup()
         self.logger.log(f"高解像度出力開始 - ターゲット: {output_width}x{output_height}, AA: {antialiasing_level}", level="INFO")
         try:
             (final_common_params, active_fractal_plugin, final_fractal_plugin_params, active_coloring_plugin, final_coloring_algo_params, final_color_map_data, aa_factor, ss_width, ss_height) = self._prepare_output_parameters(
                 output_width, output_height, common_params_override, fractal_plugin_name_override, fractal_plugin_params_override, coloring_algo_name_override, coloring_algo_params_override, color_pack_name_override, color_map_name_override, antialiasing_level)
-            self.logger.log(f"  - スーパーサンプリング解像度: {ss_width}x{ss_height} (AA係数: {aa_factor})", level="DEBUG")
-            self.logger.log(f"  - フラクタルプラグイン: {active_fractal_plugin.name}, パラメータ: {final_fractal_plugin_params}", level="DEBUG")
-            self.logger.log(f"  - カラーリングプラグイン: {active_coloring_plugin.name}, パラメータ: {final_coloring_algo_params}", level="DEBUG")
-            self.logger.log(f"  - カラーマップ: {color_pack_name_override}/{color_map_name_override}", level="DEBUG")
-            self.logger.log(f"  - 計算用共通パラメータ: 中心=({final_common_params['center_real']:.4f},{final_common_params['center_imag']:.4f}), 幅={final_common_params['width']:.3e}, 高さ(複素)={final_common_params['height']:.3e]}, 反復={final_common_params['max_iterations']}", level="DEBUG")
-            fractal_data_ss = self._compute_fractal_for_output(active_fractal_plugin, final_fractal_plugin_params, final_common_params, ss_width, ss_height)
-            if fractal_data_ss is None:
-                return None
-            colored_image_ss_rgba = self._apply_coloring_for_output(active_coloring_plugin, final_coloring_algo_params, final_common_params, fractal_data_ss, final_color_map_data)
-            if colored_image_ss_rgba is None:
+            if use_gpu is None:
+                use_gpu = self._cuda_ok
+            final_common_params['use_gpu'] = use_gpu
+            final_common_params['precision'] = self._resolve_precision(final_common_params['width'], ss_width)
+            # 出力は1つのカラーリングプラグインで画像全体を塗るため、そのプラグインが内部の最後のZを使わなければ内部の反復を省略する
+            final_common_params['skip_interior'] = not active_coloring_plugin.needs_interior_z
+            if self.logger.is_enabled_for("DEBUG"): # パラメータ辞書の文字列化は DEBUG 出力時のみ
+                self.logger.log(f"  - スーパーサンプリング解像度: {ss_width}x{ss_height} (AA係数: {aa_factor}, GPU: {use_gpu}, 精度: {final_common_params['precision']})", level="DEBUG")
+                self.logger.log(f"  - フラクタルプラグイン: {active_fractal_plugin.name}, パラメータ: {final_fractal_plugin_params}", level="DEBUG")
+                self.logger.log(f"  - カラーリングプラグイン: {active_coloring_plugin.name}, パラメータ: {final_coloring_algo_params}", level="DEBUG")
+                self.logger.log(f"  - カラーマップ: {color_pack_name_override}/{color_map_name_override}", level="DEBUG")
+                self.logger.log(f"  - 計算用共通パラメータ: 中心=({final_common_params['center_real']:.4f},{final_common_params['center_imag']:.4f}), 幅={final_common_params['width']:.3e}, 高さ(複素)={final_common_params['height']:.3e}, 反復={final_common_params['max_iterations']}", level="DEBUG")
+            # タイルごとに計算→カラーリング→縮小を済ませ、スーパーサンプリング解像度の中間配列を画像全体で持たない
+            downsampled_image_rgba = np.empty((output_height, output_width, 4), dtype=np.uint8)
+            tiles = list(self._iter_output_tiles(output_width, output_height, aa_factor, active_coloring_plugin.supports_tiling))
+            render_args = (active_fractal_plugin, final_fractal_plugin_params, active_coloring_plugin, final_coloring_algo_params,
+                           final_color_map_data, final_common_params, output_width, output_height, aa_factor, downsampled_image_rgba)
+            if len(tiles) > 1 and self._tile_pool_workers > 1:
+                # 各タイルは出力配列の互いに重ならない範囲へ書き込むため、ロックなしでスレッドに分配できる
+                futures = [self._tile_pool.submit(self._render_output_tile, tile, *render_args, parallel_kernels=False) for tile in tiles]
+                tile_results = [future.result() for future in futures]
+            else:
+                tile_results = [self._render_output_tile(tile, *render_args, parallel_kernels=True) for tile in tiles]
+            if not all(tile_results):
                 return None
-            downsampled_image_rgba = self._downsample_image(colored_image_ss_rgba, output_width, output_height, aa_factor)
             self.logger.log(f"高解像度画像が正常に生成されました ({output_width}x{output_height})。", level="INFO")
             return downsampled_image_rgba
         except Exception as e:
@@ -605,7 +1057,7 @@ class FractalEngine:
     def save_settings(self) -> dict:
         """現在のエンジンの設定を辞書としてシリアライズします。"""
         settings = {
-            "common_parameters": self.get_common_parameters(),
+            "common_parameters": self.get_common_parameters().as_dict(),
             "active_fractal_plugin_name": self.current_fractal_plugin.name if self.current_fractal_plugin else None,
             "fractal_plugin_parameters": self.current_fractal_plugin_parameters,
 
@@ -624,87 +1076,91 @@ class FractalEngine:
             # 画像サイズは必要に応じてcommon_parametersの一部とするか、別途保存できます
             "image_width_px": self.image_width_px,
             "image_height_px": self.image_height_px,
+            "precision_mode": self.precision_mode,
         }
         self.logger.log("エンジン設定をシリアライズしました。", level="DEBUG")
         return settings
 
     def load_settings(self, settings: dict):
-        """辞書からエンジンの設定を復元します。"""
+        """辞書からエンジンの設定を復元します。各設定は batch_update の中でまとめて適用します。"""
         if not isinstance(settings, dict):
             self.logger.log("load_settings: settings が辞書ではありません。ロードをスキップします。", level="WARNING")
             return
         try:
-            cp = settings.get("common_parameters")
-            if cp and isinstance(cp, dict):
-                self.set_common_parameters(
-                    center_real=cp.get('center_real', self.center_real),
-                    center_imag=cp.get('center_imag', self.center_imag),
-                    width=cp.get('width', self.width),
-                    max_iterations=cp.get('max_iterations', self.max_iterations),
-                    escape_radius=cp.get('escape_radius', self.escape_radius)
-                )
-
-            fp_name = settings.get("active_fractal_plugin_name")
-            if fp_name:
-                if self.set_active_fractal_plugin(fp_name): # これによりデフォルトのプラグインパラメータも設定されます
-                    fp_params = settings.get("fractal_plugin_parameters")
-                    if fp_params and isinstance(fp_params, dict): # 保存されたパラメータでデフォルトを上書き
-                        for name, value in fp_params.items():
-                            self.set_fractal_plugin_parameter(name, value)
-
-            # 発散部のカラーリング設定を復元
-            cpd_name = settings.get("coloring_plugin_divergent_name")
-            if cpd_name:
-                if self.set_active_coloring_plugin(cpd_name, target_type='divergent'):
-                    cpd_params = settings.get("coloring_plugin_divergent_params")
-                    if cpd_params and isinstance(cpd_params, dict):
-                        for name, value in cpd_params.items():
-                             self.set_coloring_plugin_parameter(name, value, target_type='divergent')
-
-            cpd_pack = settings.get("color_pack_divergent_name")
-            cpd_map = settings.get("color_map_divergent_name")
-            if cpd_pack and cpd_map:
-                # 設定する前にパックとマップが存在することを確認
-                if cpd_pack in self.get_available_color_pack_names() and \
-                   cpd_map in self.get_available_color_map_names_in_pack(cpd_pack):
-                    self.set_active_color_map(cpd_pack, cpd_map, target_type='divergent')
-                else:
-                    self.logger.log(f"発散部: 保存されたカラーマップ {cpd_pack}/{cpd_map} が見つかりません。", level="WARNING")
-
-            # 非発散部のカラーリング設定を復元
-            cpnd_name = settings.get("coloring_plugin_non_divergent_name")
-            if cpnd_name:
-                if self.set_active_coloring_plugin(cpnd_name, target_type='non_divergent'):
-                    cpnd_params = settings.get("coloring_plugin_non_divergent_params")
-                    if cpnd_params and isinstance(cpnd_params, dict):
-                        for name, value in cpnd_params.items():
-                             self.set_coloring_plugin_parameter(name, value, target_type='non_divergent')
-
-            cpnd_pack = settings.get("color_pack_non_divergent_name")
-            cpnd_map = settings.get("color_map_non_divergent_name")
-            if cpnd_pack and cpnd_map:
-                if cpnd_pack in self.get_available_color_pack_names() and \
-                   cpnd_map in self.get_available_color_map_names_in_pack(cpnd_pack):
-                    self.set_active_color_map(cpnd_pack, cpnd_map, target_type='non_divergent')
-                else:
-                    self.logger.log(f"非発散部: 保存されたカラーマップ {cpnd_pack}/{cpnd_map} が見つかりません。", level="WARNING")
-
-            # 特定のタイプがロードされた後にアクティブなターゲットタイプを復元
-            self.active_coloring_target_type = settings.get("active_coloring_target_type", self.active_coloring_target_type)
-
-            # 画像サイズを復元（オプション、UIで処理可能）
-            # 設定前にこれらが正であることを確認
-            loaded_width = settings.get("image_width_px", self.image_width_px)
-            if loaded_width > 0: self.image_width_px = loaded_width
-            loaded_height = settings.get("image_height_px", self.image_height_px)
-            if loaded_height > 0: self.image_height_px = loaded_height
-            self.update_aspect_ratio() # 'height'（複素平面）が更新されることを確認
-
-            self.last_fractal_data_cache = None # キャッシュを無効化
+            # 各セッターのアスペクト比の再計算とキャッシュの無効化は、最後に1回だけ行う
+            with self.batch_update():
+                cp = settings.get("common_parameters")
+                if cp and isinstance(cp, dict):
+                    self.set_common_parameters(
+                        center_real=cp.get('center_real', self.center_real),
+                        center_imag=cp.get('center_imag', self.center_imag),
+                        width=cp.get('width', self.width),
+                        max_iterations=cp.get('max_iterations', self.max_iterations),
+                        escape_radius=cp.get('escape_radius', self.escape_radius)
+                    )
+
+                fp_name = settings.get("active_fractal_plugin_name")
+                if fp_name:
+                    if self.set_active_fractal_plugin(fp_name): # これによりデフォルトのプラグインパラメータも設定されます
+                        fp_params = settings.get("fractal_plugin_parameters")
+                        if fp_params and isinstance(fp_params, dict): # 保存されたパラメータでデフォルトを上書き
+                            self.set_fractal_plugin_parameters(fp_params)
+
+                # 発散部のカラーリング設定を復元
+                cpd_name = settings.get("coloring_plugin_divergent_name")
+                if cpd_name:
+                    if self.set_active_coloring_plugin(cpd_name, target_type='divergent'):
+                        cpd_params = settings.get("coloring_plugin_divergent_params")
+                        if cpd_params and isinstance(cpd_params, dict):
+                            self.set_coloring_plugin_parameters(cpd_params, target_type='divergent')
+
+                cpd_pack = settings.get("color_pack_divergent_name")
+                cpd_map = settings.get("color_map_divergent_name")
+                if cpd_pack and cpd_map:
+                    # 設定する前にパックとマップが存在することを確認 (名前のリストを作らずに辞書で確認する)
+                    if self.color_manager.has_color_map(cpd_pack, cpd_map):
+                        self.set_active_color_map(cpd_pack, cpd_map, target_type='divergent')
+                    else:
+                        self.logger.log(f"発散部: 保存されたカラーマップ {cpd_pack}/{cpd_map} が見つかりません。", level="WARNING")
+
+                # 非発散部のカラーリング設定を復元
+                cpnd_name = settings.get("coloring_plugin_non_divergent_name")
+                if cpnd_name:
+                    if self.set_active_coloring_plugin(cpnd_name, target_type='non_divergent'):
+                        cpnd_params = settings.get("coloring_plugin_non_divergent_params")
+                        if cpnd_params and isinstance(cpnd_params, dict):
+                            self.set_coloring_plugin_parameters(cpnd_params, target_type='non_divergent')
+
+                cpnd_pack = settings.get("color_pack_non_divergent_name")
+                cpnd_map = settings.get("color_map_non_divergent_name")
+                if cpnd_pack and cpnd_map:
+                    if self.color_manager.has_color_map(cpnd_pack, cpnd_map):
+                        self.set_active_color_map(cpnd_pack, cpnd_map, target_type='non_divergent')
+                    else:
+                        self.logger.log(f"非発散部: 保存されたカラーマップ {cpnd_pack}/{cpnd_map} が見つかりません。", level="WARNING")
+
+                # 特定のタイプがロードされた後にアクティブなターゲットタイプを復元
+                self.active_coloring_target_type = settings.get("active_coloring_target_type", self.active_coloring_target_type)
+
+                # 画像サイズを復元（オプション、UIで処理可能）
+                # 設定前にこれらが正であることを確認
+                loaded_width = settings.get("image_width_px", self.image_width_px)
+                if loaded_width > 0: self.image_width_px = loaded_width
+                loaded_height = settings.get("image_height_px", self.image_height_px)
+                if loaded_height > 0: self.image_height_px = loaded_height
+                self._refresh_aspect_ratio() # 'height'（複素平面）はバッチを抜けるときに1回だけ更新される
+
+                loaded_precision = settings.get("precision_mode", self.precision_mode)
+                if loaded_precision in ('auto', 'f32', 'f64'):
+                    self.precision_mode = loaded_precision
+
+                self._invalidate_fractal_data() # キャッシュの無効化もバッチを抜けるときに1回だけ行う
+                self._cmap_cache.clear() # カラーマップLUTも作り直す
+                clear_grid_axes_cache() # 座標軸のキャッシュも破棄
             self.logger.log("エンジン設定読込完了", level="INFO")
         except Exception as e:
             self.logger.log(f"エンジン設定読込中にエラー発生: {e}", level="ERROR")
-            traceback.print_exc()
+            self.logger.log("トレースバック (直近の呼び出し):", level="DEBUG", exc_info=True)
 
 if __name__ == '__main__':
     # テストには、CWDからの相対的なデフォルトの場所にプラグインとカラーパックが必要です
@@ -0,0 +1,279 @@
+"""
+カラーリングプラグイン用の共有ヘルパー。
+
+画像全体の反復回数分布に基づく正規化など、複数のカラーリングプラグインで使える処理を
+NumPy のベクトル演算でまとめています。フラクタル計算と同じパスで色付けする場合 (融合カラーリング) に
+カーネルから呼び出す画素単位の処理は、Numba の JIT 関数として置いています。
+PluginManager のスキャン対象 (plugins/coloring/*) の外に置いているため、
+プラグインとしては読み込まれず、通常のモジュールとしてインポートされます。
+"""
+import math
+
+import numpy as np
+from numba import jit, prange
+
+
+def histogram_cdf(iterations: np.ndarray, max_iterations: int) -> np.ndarray | None:
+    """
+    発散したピクセル (反復回数 < max_iterations) の反復回数の累積分布 (長さ max_iterations + 1, 0.0〜1.0) を返します。
+
+    `np.bincount` によるヒストグラム → `np.cumsum` による累積分布の2回の一括処理で計算します。
+    集合内部のピクセルは分布に含めないため、cdf[max_iterations] は 1.0 になります。発散したピクセルがない場合は None を返します。
+
+    Args:
+        iterations (np.ndarray): 反復回数の配列 (0以上の整数)。
+        max_iterations (int): 最大反復回数。
+
+    Returns:
+        np.ndarray | None: float64 の累積分布。
+    """
+    max_iterations = int(max_iterations)
+    counts = np.bincount(np.clip(iterations.ravel(), 0, max_iterations), minlength=max_iterations + 1)
+    counts[max_iterations] = 0 # 集合内部のピクセルは分布に含めない
+    cdf = np.cumsum(counts, dtype=np.float64)
+    total = cdf[-1]
+    if total <= 0:
+        return None
+    cdf /= total
+    return cdf
+
+
+def histogram_equalize(iterations: np.ndarray, max_iterations: int) -> np.ndarray:
+    """
+    反復回数をヒストグラム平坦化し、各ピクセルの累積分布値 (0.0〜1.0) を返します。
+
+    発散したピクセル (反復回数 < max_iterations) だけを数え、
+    `np.bincount` によるヒストグラム → `np.cumsum` による累積分布 → `cdf[iterations]` の参照、
+    の3回の一括処理で計算します (Pythonループなし)。
+    最大反復回数に達したピクセル (集合内部) は 1.0 になります。発散したピクセルがない場合はすべて 0.0 を返します。
+
+    Args:
+        iterations (np.ndarray): 反復回数の配列 (0以上の整数)。
+        max_iterations (int): 最大反復回数。
+
+    Returns:
+        np.ndarray: iterations と同じ形状の float64 配列。
+    """
+    cdf = histogram_cdf(iterations, max_iterations)
+    if cdf is None:
+        return np.zeros(iterations.shape, dtype=np.float64)
+    return cdf[np.clip(iterations, 0, int(max_iterations))]
+
+
+def bake_color_lut(color_map: np.ndarray | list, size: int = 256, cyclic: bool = False) -> np.ndarray:
+    """
+    カラーマップの制御色を等間隔に `size` 点サンプリングし、線形補間済みの (size, 4) uint8 LUT を作ります。
+
+    ピクセルごとに隣接2色を補間する代わりに、`lookup_color_lut` で1回の `np.take` (連続領域からの一括参照) だけで
+    色を決められるようにするためのものです。作成は size 点分の計算だけなので、カラーリングのたびに呼んでも構いません。
+
+    Args:
+        color_map (np.ndarray | list): (N, 3) または (N, 4) の制御色 (0〜255)。N は1以上。
+        size (int): LUT の要素数。
+        cyclic (bool): True の場合、最後の色から先頭の色へ戻る1周期 (位置 0〜N) をサンプリングします。
+            False の場合、先頭から最後の色まで (位置 0〜N-1) をサンプリングします。
+
+    Returns:
+        np.ndarray: (size, 4) の uint8 配列。RGBのみのマップはアルファ255で埋めます。
+    """
+    control = np.asarray(color_map, dtype=np.float32)
+    num_colors = control.shape[0]
+    if control.shape[1] == 3:
+        control = np.concatenate([control, np.full((num_colors, 1), 255.0, dtype=np.float32)], axis=1)
+    if cyclic:
+        positions = np.arange(size, dtype=np.float64) * (num_colors / size)
+    else:
+        positions = np.linspace(0.0, num_colors - 1, size)
+    idx0 = np.minimum(np.floor(positions).astype(np.int64), num_colors - 1)
+    fraction = (positions - idx0).astype(np.float32)[:, np.newaxis]
+    idx1 = (idx0 + 1) % num_colors if cyclic else np.minimum(idx0 + 1, num_colors - 1)
+    baked = control[idx0] * (1.0 - fraction) + control[idx1] * fraction
+    np.clip(baked, 0.0, 255.0, out=baked)
+    return baked.astype(np.uint8)
+
+
+def lookup_color_lut(normalized: np.ndarray, lut: np.ndarray, cyclic: bool = False) -> np.ndarray:
+    """
+    0.0〜1.0 に正規化した値を `bake_color_lut` の LUT で色に変換します (最も近い LUT の要素を参照)。
+
+    Args:
+        normalized (np.ndarray): 正規化済みの値。cyclic が False なら範囲外は端の色にクランプし、
+            True なら 1.0 を周期として折り返します。
+        lut (np.ndarray): (size, 4) uint8 の LUT。
+        cyclic (bool): bake_color_lut に渡したものと同じ値。
+
+    Returns:
+        np.ndarray: normalized の形状に RGBA の軸を加えた uint8 配列。
+    """
+    size = lut.shape[0]
+    if cyclic:
+        indices = np.floor(normalized * size + 0.5).astype(np.int64) % size
+    else:
+        indices = np.clip((normalized * (size - 1) + 0.5).astype(np.int32), 0, size - 1)
+    return np.take(lut, indices, axis=0)
+
+
+# RGBA 1画素を uint32 として見たときのアルファ (255) のビット (バイト順に依存しないよう uint8 の並びから作る)
+_ALPHA_MASK_U32 = np.array([0, 0, 0, 255], dtype=np.uint8).view(np.uint32)[0]
+
+
+def _make_histogram_color_kernel(parallel):
+    """
+    ヒストグラム平坦化カラーリングを1パスで行うカーネルを生成します。
+
+    反復回数 → 累積分布 → 巡回LUTの位置 → 色、の変換と集合内部の黒塗り・アルファ設定を画素ごとにまとめて行い、
+    NumPy 版 (histogram_equalize → lookup_color_lut → マスク代入) が作る画像サイズの一時配列 (float64 2枚、int64 1枚、bool 1枚) をなくします。
+    LUT と出力は RGBA 4バイトを uint32 として扱い、1画素を32ビットの1回の読み込み・書き込みで処理します。
+    浮動小数点演算は NumPy 版と同じ順序で行い (fastmath なし)、結果は同一です。
+    parallel が False の場合は行を逐次処理します (出力タイルのワーカースレッドから呼ぶ場合に使用)。
+    """
+    row_range = prange if parallel else range
+
+    @jit(nopython=True, parallel=parallel, nogil=True, cache=True, boundscheck=False)
+    def histogram_color_kernel(iterations, max_iterations, cdf, cycle_scale, lut_rgba32, alpha_mask, out_rgba32):
+        """
+        Args:
+            iterations (np.ndarray): 反復回数の配列 (高さ x 幅)。
+            max_iterations (int): 最大反復回数。これ以上の画素は黒になります。
+            cdf (np.ndarray): histogram_cdf の累積分布。
+            cycle_scale (float): 累積分布値に掛ける係数 (LUT 1周期を 1.0 とする位置へ変換)。
+            lut_rgba32 (np.ndarray): bake_color_lut(cyclic=True) の LUT を uint32 (size,) として見たもの。
+            alpha_mask (np.uint32): アルファを255にするビット (_ALPHA_MASK_U32)。
+            out_rgba32 (np.ndarray): 書き込み先 (高さ x 幅 x 4, uint8) を uint32 (高さ x 幅) として見たもの。
+        """
+        height = iterations.shape[0]
+        width = iterations.shape[1]
+        lut_size = lut_rgba32.shape[0]
+        # LUT の色数が2のべき乗 (既定の256色など) なら、巡回の剰余 (除算と符号補正) をビットマスクの AND にする
+        lut_index_mask = lut_size - 1 if (lut_size & (lut_size - 1)) == 0 else -1
+        for r_idx in row_range(height):
+            for c_idx in range(width):
+                iters = iterations[r_idx, c_idx]
+                if iters >= max_iterations:
+                    out_rgba32[r_idx, c_idx] = alpha_mask # 集合内部は黒 (不透明)
+                else:
+                    position = cdf[max(iters, 0)] * cycle_scale
+                    lut_pos = np.int64(math.floor(position * lut_size + 0.5))
+                    if lut_index_mask >= 0:
+                        lut_idx = lut_pos & lut_index_mask # 負の値でも % と同じ結果 (2の補数)
+                    else:
+                        lut_idx = lut_pos % lut_size
+                    out_rgba32[r_idx, c_idx] = lut_rgba32[lut_idx] | alpha_mask
+
+    return histogram_color_kernel
+
+
+# 行並列の有無 -> ヒストグラム平坦化カラーリングカーネル
+_HISTOGRAM_COLOR_KERNELS = {
+    True: _make_histogram_color_kernel(True),
+    False: _make_histogram_color_kernel(False),
+}
+
+
+def histogram_color_grid(iterations: np.ndarray, max_iterations: int, cycle_scale: float, lut: np.ndarray,
+                         parallel: bool = True) -> np.ndarray:
+    """
+    反復回数をヒストグラム平坦化し、巡回LUTで色付けした RGBA 画像 (高さ x 幅 x 4, uint8) を返します。
+    最大反復回数に達した画素は黒になります。結果は
+    `lookup_color_lut(histogram_equalize(iterations, max_iterations) * cycle_scale, lut, cyclic=True)` に
+    集合内部の黒塗りを加えたものと同一です (アルファは常に255)。
+
+    Args:
+        iterations (np.ndarray): 反復回数の配列 (0以上の整数)。
+        max_iterations (int): 最大反復回数。
+        cycle_scale (float): 累積分布値 (0.0〜1.0) に掛ける係数。1.0 で LUT を1周します。
+        lut (np.ndarray): bake_color_lut(cyclic=True) の (size, 4) uint8 LUT。
+        parallel (bool): 行並列 (prange) を使うかどうか。
+
+    Returns:
+        np.ndarray: RGBA 画像。
+    """
+    max_iterations = int(max_iterations)
+    cdf = histogram_cdf(iterations, max_iterations)
+    if cdf is None:
+        cdf = np.zeros(max_iterations + 1, dtype=np.float64) # 発散した画素がない場合は全画素が位置 0.0
+    out = np.empty(iterations.shape + (4,), dtype=np.uint8)
+    lut_rgba32 = np.ascontiguousarray(lut, dtype=np.uint8).view(np.uint32).reshape(-1)
+    _HISTOGRAM_COLOR_KERNELS[bool(parallel)](iterations, max_iterations, cdf, float(cycle_scale), lut_rgba32,
+                                             _ALPHA_MASK_U32, out.view(np.uint32).reshape(iterations.shape))
+    return out
+
+
+# 1 / log(2) (Numba はグローバル変数をコンパイル時の定数として扱う)
+_INV_LOG2 = 1.0 / math.log(2.0)
+
+
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
+def smooth_color_pixel_jit(out_row, c_idx, iters, mod_sq, max_iters, color_scale_factor, color_map):
+    """
+    スムーズカラー (`iters + 1 - log(log(|Z|))/log(2)`) で1ピクセルのRGBを out_row[c_idx, 0:3] に書き込みます。
+    集合内部 (iters == max_iters) は黒です。アルファは書き込みません。
+
+    スムーズカラープラグインと、計算と同時に色付けする融合カーネル
+    (plugins/_fractal_kernels.py の compute_mandelbrot_smooth_grid) が同じ結果になるよう、両方がこの関数を使います。
+
+    Args:
+        out_row (np.ndarray): 書き込み先の1行分 (W x 4, uint8)。
+        c_idx (int): 列番号。
+        iters (int): 反復回数。
+        mod_sq (float): 最後のZの |Z|^2。
+        max_iters (int): 最大反復回数。
+        color_scale_factor (float): 色の変化の速さを調整するスケールファクター。
+        color_map (np.ndarray): 色補間に使用するカラーマップ (形状: (N,3) または (N,4), N >= 2, dtype: uint8)。
+    """
+    if iters == max_iters: # 点が集合内に留まった場合
+        out_row[c_idx, 0] = 0 # 黒色で描画
+        out_row[c_idx, 1] = 0
+        out_row[c_idx, 2] = 0
+        return
+    smooth_val: float
+    # 発散した点では |Z|^2 > escape_radius^2 (> 1) となるはず。|Z|^2 <= 1 (|Z| <= 1) では log(log(|Z|)) が定義できないため反復回数をそのまま使う
+    if mod_sq <= 1.0:
+        smooth_val = float(iters)
+    else:
+        # log(|Z|) = log(sqrt(|Z|^2)) = 0.5 * log(|Z|^2) として平方根を省く
+        smooth_val = float(iters) + 1.0 - math.log(0.5 * math.log(mod_sq)) * _INV_LOG2
+
+    # smooth_val をカラーインデックスにマッピングし、マップ内の2色間を線形補間する
+    num_colors_in_map = color_map.shape[0]
+    color_idx_float = smooth_val * color_scale_factor
+    idx0_floor = math.floor(color_idx_float)
+    fraction = color_idx_float - idx0_floor # fraction は常に [0.0, 1.0) の範囲
+    if (num_colors_in_map & (num_colors_in_map - 1)) == 0:
+        # 色数が2のべき乗 (256色のマップや既定のグレースケールなど) なら、剰余 (除算と符号補正) をビットマスクの AND にする。
+        # 色数は呼び出しの間変わらないため、画素ループに展開されたこの分岐は LLVM がループの外へ出せる
+        color_index_mask = num_colors_in_map - 1
+        c1_idx = int(idx0_floor) & color_index_mask # 負の値でも % と同じ結果 (2の補数)
+        c2_idx = (int(idx0_floor) + 1) & color_index_mask
+    else:
+        c1_idx = int(idx0_floor) % num_colors_in_map # 負のインデックスも正しく扱えるように剰余演算を使用 (結果は [0, N))
+        # c1_idx は [0, N) に正規化済みなので、次の色は2回目の剰余 (整数除算) ではなく比較だけで折り返せる
+        c2_idx = c1_idx + 1
+        if c2_idx == num_colors_in_map:
+            c2_idx = 0
+    for channel in range(3): # 4要素 (RGBA) のマップでもRGBのみ使う
+        value = color_map[c1_idx, channel] * (1.0 - fraction) + color_map[c2_idx, channel] * fraction
+        # 2色 (0..255) の凸結合 (fraction は [0, 1)) なので value は常に [0, 255] に収まり、クランプせずにそのまま切り捨てで変換できる
+        out_row[c_idx, channel] = np.uint8(value)
+
+
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
+def smooth_color_row_jit(iterations_row, z_real_row, z_imag_row, max_iters, color_scale_factor, color_map, out_row):
+    """
+    計算直後の1行 (反復回数と最後のZ) をスムーズカラーで out_row (W x 4, uint8) に色付けします。
+    |Z|^2 はスムーズカラープラグインが受け取る 'last_z_modulus_sq' と同じく、実部と虚部の2乗の和です。
+    """
+    for c_idx in range(iterations_row.shape[0]):
+        smooth_color_pixel_jit(out_row, c_idx, iterations_row[c_idx],
+                               _modulus_sq_jit(z_real_row[c_idx], z_imag_row[c_idx]),
+                               max_iters, color_scale_factor, color_map)
+        out_row[c_idx, 3] = 255
+
+
+@jit(nopython=True, nogil=True, fastmath=False, cache=True)
+def _modulus_sq_jit(z_real, z_imag):
+    """
+    |Z|^2 = z_real^2 + z_imag^2。積和演算 (FMA) にまとめると NumPy の np.square の和と丸めが変わるため、
+    fastmath を使わずに計算します。
+    """
+    return z_real * z_real + z_imag * z_imag
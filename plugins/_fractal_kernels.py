@@ -0,0 +1,965 @@
+"""
+エスケープタイム系フラクタル (Mandelbrot / Julia) 用の共有Numbaカーネル。
+
+各フラクタルプラグインが個別にピクセルループを持たずに済むよう、
+行単位で並列化 (prange) した nopython カーネルをここにまとめています。
+PluginManager のスキャン対象 (plugins/fractals) の外に置いているため、
+プラグインとしては読み込まれず、通常のモジュールとしてインポートされます。
+use_gpu=True が指定され CUDA が利用可能な場合は、plugins/_fractal_kernels_cuda.py のGPUカーネルへ切り替えます。
+
+注意: このモジュールはインポート時に Numba のプロセス全体の設定 `numba.core.config.SLP_VECTORIZE` を True にします。
+これは意図的な全体への変更で、以降に同じプロセスでコンパイルされるすべての Numba 関数 (他のプラグインや
+サードパーティのコードを含む) に LLVM の SLP ベクトル化が適用されます。Numba は最適化パスの構成を
+CPU ターゲットのコード生成器の初期化時 (プロセスで最初のコンパイル時) に作るため、このモジュールのカーネルの
+コンパイル中だけ有効にして元に戻すことはできません。環境変数 NUMBA_SLP_VECTORIZE が指定されている場合は変更せず、
+その値に従います (NUMBA_SLP_VECTORIZE=0 で無効のままにできます)。
+"""
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+import llvmlite.binding as llvm_binding
+from numba import guvectorize, jit, prange
+from numba.core import config as numba_config
+from numba.extending import overload
+from logger.custom_logger import CustomLogger
+from plugins._coloring_kernels import smooth_color_row_jit
+
+logger = CustomLogger()
+
+
+def detect_simd_level() -> str:
+    """
+    実行中のCPUが対応するSIMD命令セットの段階を返します ('avx512' / 'avx2' / 'sse2' / 'baseline')。
+
+    Numba はカーネルを実行中のCPU向けに JIT コンパイルする (キャッシュもCPUごとに分かれる) ため、
+    命令セットごとの個別ビルドは不要です。ここでの判定はブロック幅の選択とログ出力にのみ使用します。
+    NUMBA_CPU_NAME でコンパイル対象のCPUが固定されている場合は、ホストの機能を当てにせず 'baseline' とします。
+    """
+    if numba_config.CPU_NAME:
+        return 'baseline'
+    try:
+        features = llvm_binding.get_host_cpu_features()
+    except Exception:
+        return 'baseline'
+    if features.get('avx512f'):
+        return 'avx512'
+    if features.get('avx2') and features.get('fma'):
+        return 'avx2'
+    if features.get('sse2'):
+        return 'sse2'
+    return 'baseline'
+
+
+SIMD_LEVEL = detect_simd_level()
+
+# 次数2の反復で同時に処理するブロックの1状態あたりのバイト数 (float64 なら 16 画素、float32 なら 32 画素)。
+# 独立した画素を多めに並べて乗算のレイテンシを隠す。AVX2 / AVX-512 では 128 バイトが最速で、
+# レジスタが16本・128ビット幅の SSE2 以下ではスピルが増えるため 64 バイトに抑える
+BLOCK_BYTES = 128 if SIMD_LEVEL in ('avx512', 'avx2') else 64
+
+# ブロック内の画素ループを SIMD 命令にまとめるため、LLVM の SLP ベクトル化を有効にする。
+# Numba の既定では無効で、レーンごとのスカラー演算のままになる。
+# プロセス全体の設定で、最初のコンパイルより前に設定する必要があるため、インポート時に変更する (モジュールの docstring を参照)。
+# 環境変数で明示的に指定されている場合はそれを優先する
+if 'NUMBA_SLP_VECTORIZE' not in os.environ:
+    numba_config.SLP_VECTORIZE = True
+
+# 行関数の fastmath フラグ。値を変えうる再結合 (reassoc) と近似関数 (afn) は使わない。
+# 行関数はカーネルへリンクされた後にもう一度最適化されるため、再結合を許すと最初の起動 (その場でコンパイル) と
+# 2回目以降の起動 (ディスクキャッシュから読込) で演算順序が変わり、反復回数が食い違うことがある
+_ROW_FASTMATH_FLAGS = {'nnan', 'ninf', 'nsz', 'arcp', 'contract'}
+
+# 周期検出で「記録したzに戻った」とみなす距離 (実部・虚部それぞれの差の上限)。
+# 発散する軌道がこれほど近くに戻ることはまずないため、反復回数が変わらない範囲で打ち切れる
+PERIODICITY_EPS = 1e-12
+# 周期検出を行う反復の間隔。比較のコストを抑えるため毎反復ではなくこの間隔ごとに行い、
+# zの記録もこの倍数 (間隔, 2倍, 4倍, ...) の反復で取り直す
+PERIODICITY_CHECK_INTERVAL = 8
+
+# build_grid_axes でキャッシュする座標軸の組の数 (高解像度出力のタイル数を十分に覆う数)
+GRID_AXES_CACHE_SIZE = 1024
+
+_scratch_local = threading.local() # get_scratch が使うスレッドごとの作業バッファ
+
+
+@jit(nopython=True, fastmath=True, cache=True)
+def _complex_int_pow_jit(z_real, z_imag, power):
+    """
+    複素数 z = z_real + i*z_imag の整数乗を、三角関数を使わずに乗算の繰り返しで計算します。
+
+    Args:
+        z_real (float): zの実部。
+        z_imag (float): zの虚部。
+        power (int): 次数 (2以上)。
+
+    Returns:
+        tuple[float, float]: z^power の (実部, 虚部)。
+    """
+    r_real = z_real
+    r_imag = z_imag
+    for _ in range(power - 1):
+        t_real = r_real * z_real - r_imag * z_imag
+        r_imag = r_real * z_imag + r_imag * z_real
+        r_real = t_real
+    return r_real, r_imag
+
+
+def _block_lanes(xs):
+    """座標軸 xs の型で BLOCK_BYTES に収まるブロックの画素数を返します。"""
+    return BLOCK_BYTES // xs.itemsize
+
+
+@overload(_block_lanes)
+def _block_lanes_overload(xs):
+    """
+    nopython モード用の _block_lanes。画素数を型から求めた定数として埋め込み、
+    LLVM がブロックの長さを知った上でループを展開・ベクトル化できるようにします。
+    """
+    lanes = BLOCK_BYTES // (xs.dtype.bitwidth // 8)
+    return lambda xs: lanes
+
+
+@jit(nopython=True, nogil=True, fastmath=_ROW_FASTMATH_FLAGS, cache=True, boundscheck=False)
+def _check_periodicity(state, lanes, z_plane, alive_plane, record_plane, iteration, record_at, eps, max_iters):
+    """
+    行関数のブロック作業領域に対して周期検出 (Brent 法) を1反復分行います。
+
+    生存中のレーンのうち、zが記録済みのzから実部・虚部とも eps 以内に戻ったものを発散しない (周期軌道) とみなし、
+    alive を 0、count を max_iters にして以降の反復から外します。PERIODICITY_CHECK_INTERVAL 回ごとに呼ばれ、
+    記録はその 1, 2, 4, 8, ... 倍の反復後に取り直すため、周期 p の軌道は収束してから数倍の p 回程度で検出されます。
+
+    Args:
+        state (np.ndarray): ブロックの作業領域 (区画の並びは行関数を参照)。
+        lanes (int): ブロックの画素数 (1区画の長さ)。
+        z_plane (int): z_real の区画番号 (z_imag は次の区画)。
+        alive_plane (int): alive の区画番号 (count は次の区画)。
+        record_plane (int): 記録したz_realの区画番号 (記録したz_imagは次の区画)。
+        iteration (int): 直前に終えた反復の番号 (0始まり)。
+        record_at (int): 次にzを記録する反復回数。
+        eps (float): 同じ点とみなす距離。
+        max_iters (int): 最大反復回数。
+
+    Returns:
+        int: 更新後の record_at。
+    """
+    zero = state.dtype.type(0.0)
+    for k in range(lanes):
+        dist_real = abs(state[z_plane * lanes + k] - state[record_plane * lanes + k])
+        dist_imag = abs(state[(z_plane + 1) * lanes + k] - state[(record_plane + 1) * lanes + k])
+        periodic = (state[alive_plane * lanes + k] > zero) & (dist_real < eps) & (dist_imag < eps)
+        state[alive_plane * lanes + k] = zero if periodic else state[alive_plane * lanes + k]
+        state[(alive_plane + 1) * lanes + k] = state.dtype.type(max_iters) if periodic else state[(alive_plane + 1) * lanes + k]
+    if iteration + 1 == record_at:
+        for k in range(lanes):
+            state[record_plane * lanes + k] = state[z_plane * lanes + k]
+            state[(record_plane + 1) * lanes + k] = state[(z_plane + 1) * lanes + k]
+        record_at *= 2
+    return record_at
+
+
+@jit(nopython=True, nogil=True, fastmath=_ROW_FASTMATH_FLAGS, cache=True, boundscheck=False)
+def _mandelbrot_row_jit(xs, c_imag, max_iters, escape_radius_sq, power, skip_interior,
+                        out_iterations, out_z_real, out_z_imag):
+    """
+    マンデルブロ集合 (z = z^power + c, z0 = 0) の1行分のエスケープタイム計算を行います。
+
+    Args:
+        xs (np.ndarray): 各列の c の実部 (長さ W)。
+        c_imag (float): この行の c の虚部。
+        max_iters (int): 最大反復回数。
+        escape_radius_sq (float): 発散とみなすための半径の2乗。
+        power (int): zの次数。
+        skip_interior (bool): 真の場合、発散しないことが確定したピクセルの反復を打ち切って max_iters とします。
+            次数2では主カージオイドまたは周期2の円板に含まれるピクセルを反復せずに判定し、それ以外は
+            周期検出 (2^k 回目ごとに記録したzに以降のzが PERIODICITY_EPS 以内で戻ったら周期軌道とみなす) を行います。
+            打ち切ったピクセルの最後のzは途中の値 (カージオイド・円板内は 0) になります。
+        out_iterations (np.ndarray): 反復回数の書き込み先 (長さ W, int32)。
+        out_z_real (np.ndarray): 最後のzの実部の書き込み先 (長さ W, float64)。
+        out_z_imag (np.ndarray): 最後のzの虚部の書き込み先 (長さ W, float64)。
+    """
+    float_type = xs.dtype.type # 反復は座標軸と同じ型 (float32 / float64) で行う
+    escape_radius_sq = float_type(escape_radius_sq)
+    zero = float_type(0.0)
+    one = float_type(1.0)
+    two = float_type(2.0)
+    width_px = xs.shape[0]
+    c_imag = float_type(c_imag)
+    eps = float_type(PERIODICITY_EPS)
+    if power == 2:
+        lanes = _block_lanes(xs)
+        # 作業領域を1本の配列にまとめる: [c_real | z_real | z_imag | z_real^2 | z_imag^2 | alive | count | 記録z_real | 記録z_imag]。
+        # 各区画のオフセットが定数になり、区画どうしが重ならないことを LLVM が証明できるためベクトル化される。
+        # alive / count も同じ浮動小数点型で持つ (最大反復回数 100000 は float32 でも正確に数えられる)
+        state = np.empty(9 * lanes, dtype=float_type)
+        for x_start in range(0, width_px, lanes):
+            for k in range(lanes):
+                # 行末の端数ブロックは最終列を複製して埋め、書き戻し時に捨てる
+                state[k] = float_type(xs[min(x_start + k, width_px - 1)])
+                state[lanes + k] = zero
+                state[2 * lanes + k] = zero
+                state[3 * lanes + k] = zero
+                state[4 * lanes + k] = zero
+                state[5 * lanes + k] = one
+                state[6 * lanes + k] = zero
+                state[7 * lanes + k] = zero
+                state[8 * lanes + k] = zero
+            if skip_interior:
+                for k in range(lanes):
+                    # 主カージオイド: q(q + (x - 1/4)) < y^2/4 (q = (x - 1/4)^2 + y^2)、周期2の円板: (x + 1)^2 + y^2 < 1/16
+                    shifted_real = state[k] - float_type(0.25)
+                    q = shifted_real * shifted_real + c_imag * c_imag
+                    in_cardioid = q * (q + shifted_real) < float_type(0.25) * c_imag * c_imag
+                    bulb_real = state[k] + one
+                    in_bulb = bulb_real * bulb_real + c_imag * c_imag < float_type(0.0625)
+                    if in_cardioid or in_bulb:
+                        state[5 * lanes + k] = zero
+                        state[6 * lanes + k] = float_type(max_iters)
+            record_at = PERIODICITY_CHECK_INTERVAL
+            for it in range(max_iters):
+                any_alive = False
+                for k in range(lanes):
+                    lane_alive = state[5 * lanes + k]
+                    z_real = state[lanes + k]
+                    z_imag = state[2 * lanes + k]
+                    # 脱出判定で求めた z_real^2, z_imag^2 を次の反復で再利用し、1反復あたりの乗算を3回に抑える
+                    next_imag = two * z_real * z_imag + c_imag
+                    next_real = state[3 * lanes + k] - state[4 * lanes + k] + state[k]
+                    z_imag = next_imag if lane_alive > zero else z_imag
+                    z_real = next_real if lane_alive > zero else z_real
+                    z_real_sq = z_real * z_real
+                    z_imag_sq = z_imag * z_imag
+                    lane_alive = lane_alive if z_real_sq + z_imag_sq <= escape_radius_sq else zero
+                    state[lanes + k] = z_real
+                    state[2 * lanes + k] = z_imag
+                    state[3 * lanes + k] = z_real_sq
+                    state[4 * lanes + k] = z_imag_sq
+                    state[5 * lanes + k] = lane_alive
+                    state[6 * lanes + k] += lane_alive
+                    any_alive |= lane_alive > zero
+                if not any_alive:
+                    break
+                if skip_interior and (it + 1) % PERIODICITY_CHECK_INTERVAL == 0:
+                    record_at = _check_periodicity(state, lanes, 1, 5, 7, it, record_at, eps, max_iters)
+            for k in range(min(lanes, width_px - x_start)):
+                out_iterations[x_start + k] = np.int32(state[6 * lanes + k])
+                out_z_real[x_start + k] = state[lanes + k]
+                out_z_imag[x_start + k] = state[2 * lanes + k]
+    else:
+        for x_idx in range(width_px):
+            c_real_px = float_type(xs[x_idx])
+            z_real_px = zero
+            z_imag_px = zero
+            record_real = zero
+            record_imag = zero
+            record_at = PERIODICITY_CHECK_INTERVAL
+            n = max_iters
+            for i in range(max_iters):
+                z_real_px, z_imag_px = _complex_int_pow_jit(z_real_px, z_imag_px, power)
+                z_real_px += c_real_px
+                z_imag_px += c_imag
+                if z_real_px * z_real_px + z_imag_px * z_imag_px > escape_radius_sq:
+                    n = i
+                    break
+                if skip_interior and (i + 1) % PERIODICITY_CHECK_INTERVAL == 0:
+                    if abs(z_real_px - record_real) < eps and abs(z_imag_px - record_imag) < eps:
+                        break # 周期軌道 (発散しない)
+                    if i + 1 == record_at:
+                        record_real = z_real_px
+                        record_imag = z_imag_px
+                        record_at *= 2
+            out_iterations[x_idx] = n
+            out_z_real[x_idx] = z_real_px
+            out_z_imag[x_idx] = z_imag_px
+
+
+@jit(nopython=True, nogil=True, fastmath=_ROW_FASTMATH_FLAGS, cache=True, boundscheck=False)
+def _julia_row_jit(xs, z_imag_start, c_real, c_imag, max_iters, escape_radius_sq, power, skip_interior,
+                   out_iterations, out_z_real, out_z_imag):
+    """
+    ジュリア集合 (z = z^power + c, z0 = ピクセル座標) の1行分のエスケープタイム計算を行います。
+
+    Args:
+        xs (np.ndarray): 各列の z0 の実部 (長さ W)。
+        z_imag_start (float): この行の z0 の虚部。
+        c_real (float): 定数複素数cの実部。
+        c_imag (float): 定数複素数cの虚部。
+        max_iters (int): 最大反復回数。
+        escape_radius_sq (float): 発散とみなすための半径の2乗。
+        power (int): zの次数。
+        skip_interior (bool): 真の場合、周期検出で発散しないことが確定したピクセルの反復を打ち切って max_iters とします
+            (_mandelbrot_row_jit を参照)。打ち切ったピクセルの最後のzは途中の値になります。
+        out_iterations (np.ndarray): 反復回数の書き込み先 (長さ W, int32)。
+        out_z_real (np.ndarray): 最後のzの実部の書き込み先 (長さ W, float64)。
+        out_z_imag (np.ndarray): 最後のzの虚部の書き込み先 (長さ W, float64)。
+    """
+    float_type = xs.dtype.type # 反復は座標軸と同じ型 (float32 / float64) で行う
+    escape_radius_sq = float_type(escape_radius_sq)
+    zero = float_type(0.0)
+    one = float_type(1.0)
+    two = float_type(2.0)
+    width_px = xs.shape[0]
+    eps = float_type(PERIODICITY_EPS)
+    c_real = float_type(c_real)
+    c_imag = float_type(c_imag)
+    z_imag_start = float_type(z_imag_start)
+    if power == 2:
+        lanes = _block_lanes(xs)
+        # 作業領域を1本の配列にまとめる: [z_real | z_imag | alive | count | 記録z_real | 記録z_imag]
+        # (理由は _mandelbrot_row_jit を参照)
+        state = np.empty(6 * lanes, dtype=float_type)
+        for x_start in range(0, width_px, lanes):
+            for k in range(lanes):
+                # 行末の端数ブロックは最終列を複製して埋め、書き戻し時に捨てる
+                state[k] = float_type(xs[min(x_start + k, width_px - 1)])
+                state[lanes + k] = z_imag_start
+                state[2 * lanes + k] = one
+                state[3 * lanes + k] = zero
+                state[4 * lanes + k] = state[k]
+                state[5 * lanes + k] = z_imag_start
+            record_at = PERIODICITY_CHECK_INTERVAL
+            for it in range(max_iters):
+                any_alive = False
+                for k in range(lanes):
+                    z_real = state[k]
+                    z_imag = state[lanes + k]
+                    # 脱出判定 (更新前) で求めた z_real^2, z_imag^2 をそのまま更新式に使う
+                    z_real_sq = z_real * z_real
+                    z_imag_sq = z_imag * z_imag
+                    lane_alive = state[2 * lanes + k] if z_real_sq + z_imag_sq <= escape_radius_sq else zero
+                    next_imag = two * z_real * z_imag + c_imag
+                    next_real = z_real_sq - z_imag_sq + c_real
+                    state[lanes + k] = next_imag if lane_alive > zero else z_imag
+                    state[k] = next_real if lane_alive > zero else z_real
+                    state[2 * lanes + k] = lane_alive
+                    state[3 * lanes + k] += lane_alive
+                    any_alive |= lane_alive > zero
+                if not any_alive:
+                    break
+                if skip_interior and (it + 1) % PERIODICITY_CHECK_INTERVAL == 0:
+                    record_at = _check_periodicity(state, lanes, 0, 2, 4, it, record_at, eps, max_iters)
+            for k in range(min(lanes, width_px - x_start)):
+                out_iterations[x_start + k] = np.int32(state[3 * lanes + k])
+                out_z_real[x_start + k] = state[k]
+                out_z_imag[x_start + k] = state[lanes + k]
+    else:
+        for x_idx in range(width_px):
+            z_real_px = float_type(xs[x_idx])
+            z_imag_px = z_imag_start
+            record_real = z_real_px
+            record_imag = z_imag_px
+            record_at = PERIODICITY_CHECK_INTERVAL
+            n = max_iters
+            for i in range(max_iters):
+                if z_real_px * z_real_px + z_imag_px * z_imag_px > escape_radius_sq:
+                    n = i
+                    break
+                z_real_px, z_imag_px = _complex_int_pow_jit(z_real_px, z_imag_px, power)
+                z_real_px += c_real
+                z_imag_px += c_imag
+                if skip_interior and (i + 1) % PERIODICITY_CHECK_INTERVAL == 0:
+                    if abs(z_real_px - record_real) < eps and abs(z_imag_px - record_imag) < eps:
+                        break # 周期軌道 (発散しない)
+                    if i + 1 == record_at:
+                        record_real = z_real_px
+                        record_imag = z_imag_px
+                        record_at *= 2
+            out_iterations[x_idx] = n
+            out_z_real[x_idx] = z_real_px
+            out_z_imag[x_idx] = z_imag_px
+
+
+def _make_escape_time_kernels(parallel):
+    """
+    行ループを持つ (マンデルブロ用, ジュリア用) カーネルの組を生成します。
+
+    1行分の計算は行関数 (_mandelbrot_row_jit / _julia_row_jit) にあり、カーネルは行を割り振るだけです。
+    反復の型は座標軸 xs, ys の型 (float32 / float64) で決まり、Numba が型ごとに特殊化します。
+    parallel が False の場合は行ループを逐次実行するカーネルを生成します。どちらも GIL を解放する (nogil) ため、
+    複数スレッドからタイルごとに呼び出す場合は逐次版を使い、スレッド側で並列化します。
+
+    行関数はクロージャに取り込まずモジュールのグローバルとして参照します。
+    Numba はクロージャ変数の内容をディスクキャッシュのキーに含め、ディスパッチャはプロセスごとに異なる値で
+    シリアライズされるため、取り込むと起動のたびにキャッシュが外れて再コンパイルになります。
+
+    Returns:
+        tuple: (マンデルブロ用カーネル, ジュリア用カーネル)。
+    """
+    row_range = prange if parallel else range
+
+    @jit(nopython=True, parallel=parallel, nogil=True, fastmath=True, cache=True, boundscheck=False)
+    def mandelbrot_kernel(xs, ys, max_iters, escape_radius_sq, power, skip_interior,
+                          out_iterations, out_z_real, out_z_imag):
+        """
+        マンデルブロ集合のエスケープタイム計算を行ごとに (parallel が真なら並列に) 実行します。
+
+        Args:
+            xs (np.ndarray): 各列の c の実部 (長さ W)。
+            ys (np.ndarray): 各行の c の虚部 (長さ H)。
+            max_iters (int): 最大反復回数。
+            escape_radius_sq (float): 発散とみなすための半径の2乗。
+            power (int): zの次数。
+            skip_interior (bool): 内部と確定できるピクセルの反復を省略するかどうか (_mandelbrot_row_jit を参照)。
+            out_iterations (np.ndarray): 反復回数の書き込み先 (H x W, int32)。
+            out_z_real (np.ndarray): 最後のzの実部の書き込み先 (H x W, float64)。
+            out_z_imag (np.ndarray): 最後のzの虚部の書き込み先 (H x W, float64)。
+        """
+        for y_idx in row_range(ys.shape[0]):
+            _mandelbrot_row_jit(xs, ys[y_idx], max_iters, escape_radius_sq, power, skip_interior,
+                                out_iterations[y_idx], out_z_real[y_idx], out_z_imag[y_idx])
+
+    @jit(nopython=True, parallel=parallel, nogil=True, fastmath=True, cache=True, boundscheck=False)
+    def julia_kernel(xs, ys, c_real, c_imag, max_iters, escape_radius_sq, power, skip_interior,
+                     out_iterations, out_z_real, out_z_imag):
+        """
+        ジュリア集合のエスケープタイム計算を行ごとに (parallel が真なら並列に) 実行します。
+
+        Args:
+            xs (np.ndarray): 各列の z0 の実部 (長さ W)。
+            ys (np.ndarray): 各行の z0 の虚部 (長さ H)。
+            c_real (float): 定数複素数cの実部。
+            c_imag (float): 定数複素数cの虚部。
+            max_iters (int): 最大反復回数。
+            escape_radius_sq (float): 発散とみなすための半径の2乗。
+            power (int): zの次数。
+            skip_interior (bool): 周期検出で内部と確定したピクセルの反復を省略するかどうか (_julia_row_jit を参照)。
+            out_iterations (np.ndarray): 反復回数の書き込み先 (H x W, int32)。
+            out_z_real (np.ndarray): 最後のzの実部の書き込み先 (H x W, float64)。
+            out_z_imag (np.ndarray): 最後のzの虚部の書き込み先 (H x W, float64)。
+        """
+        for y_idx in row_range(ys.shape[0]):
+            _julia_row_jit(xs, ys[y_idx], c_real, c_imag, max_iters, escape_radius_sq, power, skip_interior,
+                           out_iterations[y_idx], out_z_real[y_idx], out_z_imag[y_idx])
+
+    return mandelbrot_kernel, julia_kernel
+
+
+# 行並列の有無 -> (マンデルブロ用カーネル, ジュリア用カーネル)。コンパイルは初回呼び出し時に型ごとに行われる
+_CPU_KERNELS = {
+    True: _make_escape_time_kernels(True),
+    False: _make_escape_time_kernels(False),
+}
+
+
+@lru_cache(maxsize=None)
+def _get_row_gufuncs(precision: str, parallel: bool):
+    """
+    行関数 (_mandelbrot_row_jit / _julia_row_jit) を包んだ gufunc (guvectorize) の組を返します。
+
+    ys (長さ H) の各要素を gufunc のループ次元として渡すと、行の分配を NumPy ufunc 機構
+    (target='parallel' ではNumbaのスレッドプール) が受け持ちます。
+    gufunc は型シグネチャを指定した時点でコンパイルされるため、モジュールの読み込み時ではなく
+    最初に使う (precision, parallel) の組ごとに一度だけ生成し、以降は再コンパイルせずにここから返します。
+
+    gufunc の行分配は静的な等分割なので、行ごとの計算量の偏りが大きい画像では prange 版
+    (TBB/ワークキューによる動的分配) より遅くなることがあります。既定は prange 版で、
+    compute_*_grid の use_gufunc=True で切り替えます。
+
+    Returns:
+        tuple: (マンデルブロ用gufunc, ジュリア用gufunc)。
+    """
+    axis_type = 'float32' if precision == 'f32' else 'float64'
+    gufunc_target = 'parallel' if parallel else 'cpu'
+
+    @guvectorize([f'void({axis_type}[:], {axis_type}, int64, float64, int64, boolean, int32[:], float64[:], float64[:])'],
+                 '(n),(),(),(),(),()->(n),(n),(n)',
+                 target=gufunc_target, nopython=True, fastmath=True, cache=True)
+    def mandelbrot_gufunc(xs, c_imag, max_iters, escape_radius_sq, power, skip_interior,
+                          out_iterations, out_z_real, out_z_imag):
+        """マンデルブロ集合の1行を計算する gufunc。ys (長さ H) を渡すと H 行分を計算します。"""
+        _mandelbrot_row_jit(xs, c_imag, max_iters, escape_radius_sq, power, skip_interior,
+                            out_iterations, out_z_real, out_z_imag)
+
+    @guvectorize([f'void({axis_type}[:], {axis_type}, float64, float64, int64, float64, int64, boolean, int32[:], float64[:], float64[:])'],
+                 '(n),(),(),(),(),(),(),()->(n),(n),(n)',
+                 target=gufunc_target, nopython=True, fastmath=True, cache=True)
+    def julia_gufunc(xs, z_imag_start, c_real, c_imag, max_iters, escape_radius_sq, power, skip_interior,
+                     out_iterations, out_z_real, out_z_imag):
+        """ジュリア集合の1行を計算する gufunc。ys (長さ H) を渡すと H 行分を計算します。"""
+        _julia_row_jit(xs, z_imag_start, c_real, c_imag, max_iters, escape_radius_sq, power, skip_interior,
+                       out_iterations, out_z_real, out_z_imag)
+
+    return mandelbrot_gufunc, julia_gufunc
+
+
+@lru_cache(maxsize=GRID_AXES_CACHE_SIZE)
+def build_grid_axes(min_x: float, max_x: float, min_y: float, max_y: float,
+                    width_px: int, height_px: int, dtype=np.float64) -> tuple[np.ndarray, np.ndarray]:
+    """
+    ピクセル格子に対応する複素平面の座標軸 (1次元) を生成します。
+    座標は `min + index * (max - min) / 画素数` で、従来のカーネル内計算と同じ値になります。
+
+    同じ領域・画素数での再計算 (プレビューと出力の往復、出力タイルの再描画など) では軸を作り直さないよう、
+    結果は引数をキーにキャッシュされます。共有されるため、返す配列は読み取り専用です。
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (各列の実部 xs, 各行の虚部 ys)。
+    """
+    xs = min_x + np.arange(width_px, dtype=np.float64) * ((max_x - min_x) / width_px)
+    ys = min_y + np.arange(height_px, dtype=np.float64) * ((max_y - min_y) / height_px)
+    xs = xs.astype(dtype, copy=False)
+    ys = ys.astype(dtype, copy=False)
+    xs.flags.writeable = False
+    ys.flags.writeable = False
+    return xs, ys
+
+
+def clear_grid_axes_cache() -> None:
+    """build_grid_axes のキャッシュを破棄します。"""
+    build_grid_axes.cache_clear()
+
+
+def _select_cpu_kernels(precision: str, parallel: bool, use_gufunc: bool = False):
+    """
+    precision ('f32' / 'f64') と parallel に対応する (マンデルブロ, ジュリア) のCPUカーネルと座標軸のdtypeを返します。
+    use_gufunc が真の場合は、同じ引数で呼び出せる行単位の gufunc を返します。
+    """
+    precision = 'f32' if precision == 'f32' else 'f64'
+    axis_dtype = np.float32 if precision == 'f32' else np.float64
+    if use_gufunc:
+        return (*_get_row_gufuncs(precision, bool(parallel)), axis_dtype)
+    return (*_CPU_KERNELS[bool(parallel)], axis_dtype)
+
+
+class BufferPool:
+    """
+    name ごとに1本の作業領域を保持し、指定形状・dtypeの配列 (ビュー) を返すバッファプール。
+
+    作業領域は1次元の uint8 配列で、より大きなサイズが必要になったときだけ確保し直します。
+    同じサイズでの繰り返し (再描画のたびの計算など) では確保とページフォルトが発生しません。
+    返す配列は同じ name を次に要求した時点で上書きされるため、所有者は前回の結果を使い終えてから次を要求してください。
+    ロックを持たないため、1つのプールを複数のスレッドから同時に使わないでください。
+    """
+
+    def __init__(self):
+        self._buffers: dict[str, np.ndarray] = {}
+
+    def get(self, name: str, shape: tuple[int, ...], dtype) -> np.ndarray:
+        """name の作業領域から、指定形状・dtypeの C連続配列 (ビュー) を返します。"""
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.nbytes < nbytes:
+            buffer = self._buffers[name] = np.empty(nbytes, dtype=np.uint8)
+        return buffer[:nbytes].view(dtype).reshape(shape)
+
+    def clear(self) -> None:
+        """保持しているすべての作業領域を解放します。"""
+        self._buffers.clear()
+
+
+def pooled_empty(pool: BufferPool | None, name: str, shape: tuple[int, ...], dtype) -> np.ndarray:
+    """pool があればその name の作業領域を、なければ新しい np.empty 配列を返します。"""
+    if pool is None:
+        return np.empty(shape, dtype=dtype)
+    return pool.get(name, shape, dtype)
+
+
+def get_scratch(name: str, shape: tuple[int, ...], dtype) -> np.ndarray:
+    """
+    呼び出し元スレッド専用の作業バッファ (BufferPool) から、指定形状・dtypeの配列 (ビュー) を返します。
+
+    返す配列は同じスレッドで同じ name を次に要求した時点で上書きされるため、呼び出し側は結果を保持し続けないでください。
+    スレッドごとに別のプールを使うので、ロックは不要です。
+    """
+    pool = getattr(_scratch_local, 'pool', None)
+    if pool is None:
+        pool = _scratch_local.pool = BufferPool()
+    return pool.get(name, shape, dtype)
+
+
+def _allocate_outputs(width_px: int, height_px: int, reuse_buffers: bool = False,
+                      buffer_pool: BufferPool | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    カーネルの出力配列を確保します。
+    buffer_pool が指定された場合はそのプールの作業領域を、reuse_buffers が真の場合はスレッドごとの作業バッファを再利用します。
+    """
+    shape = (height_px, width_px)
+    if buffer_pool is None and reuse_buffers:
+        return (get_scratch('iterations', shape, np.int32),
+                get_scratch('z_real', shape, np.float64),
+                get_scratch('z_imag', shape, np.float64))
+    return (pooled_empty(buffer_pool, 'iterations', shape, np.int32),
+            pooled_empty(buffer_pool, 'z_real', shape, np.float64),
+            pooled_empty(buffer_pool, 'z_imag', shape, np.float64))
+
+
+@jit(nopython=True, nogil=True, cache=True, boundscheck=False)
+def _escape_time_derived_jit(iterations, z_real, z_imag, max_iters, modulus_sq, is_diverged):
+    """
+    最後のZのプレーンから |Z|^2 と発散マスクを1パスで求めます。
+    |Z|^2 は積和演算 (FMA) にまとめず (fastmath なし)、NumPy の np.square の和と同じ丸めにします。
+    """
+    for y_idx in range(iterations.shape[0]):
+        for x_idx in range(iterations.shape[1]):
+            z_r = z_real[y_idx, x_idx]
+            z_i = z_imag[y_idx, x_idx]
+            modulus_sq[y_idx, x_idx] = z_r * z_r + z_i * z_i
+            is_diverged[y_idx, x_idx] = iterations[y_idx, x_idx] < max_iters
+
+
+def escape_time_result(iterations: np.ndarray, z_real: np.ndarray, z_imag: np.ndarray, max_iters: int,
+                       buffer_pool: BufferPool | None = None) -> dict:
+    """
+    エスケープタイム系カーネルの出力から、compute_fractal が返す結果の辞書を組み立てます。
+
+    最後のZは実部・虚部の float64 プレーン ('last_z_real' / 'last_z_imag', SoA) のまま返し、
+    複素数の 'last_zn_values' (AoS) は作りません。'last_z_modulus_sq' と 'is_diverged' は1パスで求め、
+    buffer_pool が指定された場合はその作業領域に書き込みます。
+
+    Returns:
+        dict: 'iterations', 'last_z_real', 'last_z_imag', 'last_z_modulus_sq', 'is_diverged' を含む辞書。
+    """
+    modulus_sq = pooled_empty(buffer_pool, 'last_z_modulus_sq', iterations.shape, np.float64)
+    is_diverged = pooled_empty(buffer_pool, 'is_diverged', iterations.shape, np.bool_)
+    _escape_time_derived_jit(iterations, z_real, z_imag, int(max_iters), modulus_sq, is_diverged)
+    return {
+        'iterations': iterations,
+        'last_z_real': z_real,
+        'last_z_imag': z_imag,
+        'last_z_modulus_sq': modulus_sq,
+        'is_diverged': is_diverged
+    }
+
+
+def is_gpu_available() -> bool:
+    """CUDA カーネル (plugins/_fractal_kernels_cuda.py) が利用可能かどうかを返します。"""
+    from plugins import _fractal_kernels_cuda # CUDA を使わない場合はインポートコストを払わない
+    return _fractal_kernels_cuda.is_cuda_available()
+
+
+def _cuda_kernels_if_enabled(use_gpu: bool):
+    """use_gpu が真で CUDA が利用可能な場合に CUDA カーネルモジュールを返します。それ以外は None。"""
+    if not use_gpu:
+        return None
+    from plugins import _fractal_kernels_cuda # CUDA を使わない場合はインポートコストを払わない
+    if not _fractal_kernels_cuda.is_cuda_available():
+        logger.log("CUDA が利用できないため、CPUカーネルで計算します。", level="DEBUG")
+        return None
+    return _fractal_kernels_cuda
+
+
+def compute_mandelbrot_grid(min_x: float, max_x: float, min_y: float, max_y: float,
+                            width_px: int, height_px: int, max_iters: int,
+                            escape_radius_sq: float, power: int,
+                            use_gpu: bool = False,
+                            precision: str = 'f64',
+                            parallel: bool = True,
+                            reuse_buffers: bool = False,
+                            use_gufunc: bool = False,
+                            skip_interior: bool = False,
+                            buffer_pool: BufferPool | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    指定領域のマンデルブロ集合を計算します。
+    use_gpu が真で CUDA が利用可能な場合はGPUで計算し、失敗時はCPUカーネルにフォールバックします。
+    precision='f32' の場合、CPUカーネルは単精度で反復します (浅いズーム向け。GPU経路は常に倍精度)。
+    parallel=False の場合、CPUカーネルは行を逐次処理します (呼び出し側がスレッドで並列化する場合に使用)。
+    reuse_buffers=True の場合、出力はスレッドごとの作業バッファ (get_scratch) へのビューになり、次の呼び出しで上書きされます。
+    buffer_pool を指定した場合、CPU計算の出力はそのプールの作業領域 ('iterations', 'z_real', 'z_imag') へのビューになります
+    (reuse_buffers より優先。GPU経路は常に新しい配列を返します)。
+    use_gufunc=True の場合、CPU計算に行単位の gufunc (_get_row_gufuncs) を使います (結果は既定のカーネルと同一)。
+    skip_interior=True の場合、次数2で主カージオイド・周期2の円板に含まれるピクセルを反復せずに max_iters とし、
+    それ以外のピクセルも周期検出で発散しないと確定した時点で反復を打ち切って max_iters とします。
+    反復回数は変わりませんが、それらのピクセルの最後のzは途中の値 (カージオイド・円板内は 0) になるため、
+    集合内部の色付けに最後のzを使わない場合にだけ指定してください。
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: (反復回数の配列, 最後のzの実数部の配列, 最後のzの虚数部の配列)。
+    """
+    cuda_kernels = _cuda_kernels_if_enabled(use_gpu)
+    if cuda_kernels is not None:
+        try:
+            xs, ys = build_grid_axes(min_x, max_x, min_y, max_y, width_px, height_px)
+            return cuda_kernels.compute_mandelbrot_grid_cuda(xs, ys, int(max_iters), float(escape_radius_sq), int(power),
+                                                             bool(skip_interior))
+        except Exception as e:
+            logger.log(f"GPUでのマンデルブロ計算に失敗したため、CPUで再計算します: {e}", level="WARNING")
+    mandelbrot_kernel, _, axis_dtype = _select_cpu_kernels(precision, parallel, use_gufunc)
+    xs, ys = build_grid_axes(min_x, max_x, min_y, max_y, width_px, height_px, axis_dtype)
+    iterations, z_real, z_imag = _allocate_outputs(width_px, height_px, reuse_buffers, buffer_pool)
+    mandelbrot_kernel(xs, ys, int(max_iters), float(escape_radius_sq), int(power), bool(skip_interior),
+                      iterations, z_real, z_imag)
+    return iterations, z_real, z_imag
+
+
+def compute_julia_grid(min_x: float, max_x: float, min_y: float, max_y: float,
+                       width_px: int, height_px: int, c_real: float, c_imag: float,
+                       max_iters: int, escape_radius_sq: float, power: int,
+                       use_gpu: bool = False,
+                       precision: str = 'f64',
+                       parallel: bool = True,
+                       reuse_buffers: bool = False,
+                       use_gufunc: bool = False,
+                       skip_interior: bool = False,
+                       buffer_pool: BufferPool | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    指定領域のジュリア集合を計算します。
+    use_gpu が真で CUDA が利用可能な場合はGPUで計算し、失敗時はCPUカーネルにフォールバックします。
+    precision='f32' の場合、CPUカーネルは単精度で反復します (浅いズーム向け。GPU経路は常に倍精度)。
+    parallel=False の場合、CPUカーネルは行を逐次処理します (呼び出し側がスレッドで並列化する場合に使用)。
+    reuse_buffers=True の場合、出力はスレッドごとの作業バッファ (get_scratch) へのビューになり、次の呼び出しで上書きされます。
+    buffer_pool を指定した場合、CPU計算の出力はそのプールの作業領域 ('iterations', 'z_real', 'z_imag') へのビューになります
+    (reuse_buffers より優先。GPU経路は常に新しい配列を返します)。
+    use_gufunc=True の場合、CPU計算に行単位の gufunc (_get_row_gufuncs) を使います (結果は既定のカーネルと同一)。
+    skip_interior=True の場合、周期検出で発散しないと確定したピクセルの反復を打ち切って max_iters とします。
+    反復回数は変わりませんが、そのピクセルの最後のzは途中の値になるため、集合内部の色付けに最後のzを使わない場合にだけ指定してください。
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: (反復回数の配列, 最後のzの実数部の配列, 最後のzの虚数部の配列)。
+    """
+    cuda_kernels = _cuda_kernels_if_enabled(use_gpu)
+    if cuda_kernels is not None:
+        try:
+            xs, ys = build_grid_axes(min_x, max_x, min_y, max_y, width_px, height_px)
+            return cuda_kernels.compute_julia_grid_cuda(xs, ys, float(c_real), float(c_imag), int(max_iters),
+                                                        float(escape_radius_sq), int(power), bool(skip_interior))
+        except Exception as e:
+            logger.log(f"GPUでのジュリア計算に失敗したため、CPUで再計算します: {e}", level="WARNING")
+    _, julia_kernel, axis_dtype = _select_cpu_kernels(precision, parallel, use_gufunc)
+    xs, ys = build_grid_axes(min_x, max_x, min_y, max_y, width_px, height_px, axis_dtype)
+    iterations, z_real, z_imag = _allocate_outputs(width_px, height_px, reuse_buffers, buffer_pool)
+    julia_kernel(xs, ys, float(c_real), float(c_imag), int(max_iters),
+                 float(escape_radius_sq), int(power), bool(skip_interior), iterations, z_real, z_imag)
+    return iterations, z_real, z_imag
+
+
+def _make_mandelbrot_smooth_kernel(parallel):
+    """
+    マンデルブロ集合の計算とスムーズカラーでの色付けを行ごとに続けて行うカーネルを生成します。
+    parallel が False の場合は行ループを逐次実行します。
+    """
+    row_range = prange if parallel else range
+
+    @jit(nopython=True, parallel=parallel, nogil=True, fastmath=True, cache=True, boundscheck=False)
+    def mandelbrot_smooth_kernel(xs, ys, max_iters, escape_radius_sq, power, skip_interior, color_scale, color_map,
+                                 out_iterations, out_z_real, out_z_imag, out_rgba):
+        """
+        1行を計算した直後に、その行 (キャッシュに載ったまま) をスムーズカラーで out_rgba (H x W x 4, uint8) に色付けします。
+        反復回数と最後のzも mandelbrot_kernel と同じく書き込みます。
+        """
+        for y_idx in row_range(ys.shape[0]):
+            _mandelbrot_row_jit(xs, ys[y_idx], max_iters, escape_radius_sq, power, skip_interior,
+                                out_iterations[y_idx], out_z_real[y_idx], out_z_imag[y_idx])
+            smooth_color_row_jit(out_iterations[y_idx], out_z_real[y_idx], out_z_imag[y_idx],
+                                 max_iters, color_scale, color_map, out_rgba[y_idx])
+
+    return mandelbrot_smooth_kernel
+
+
+# 行並列の有無 -> マンデルブロ集合の計算とスムーズカラーの融合カーネル
+_MANDELBROT_SMOOTH_KERNELS = {
+    True: _make_mandelbrot_smooth_kernel(True),
+    False: _make_mandelbrot_smooth_kernel(False),
+}
+
+
+def _make_julia_smooth_kernel(parallel):
+    """
+    ジュリア集合の計算とスムーズカラーでの色付けを行ごとに続けて行うカーネルを生成します。
+    parallel が False の場合は行ループを逐次実行します。
+    """
+    row_range = prange if parallel else range
+
+    @jit(nopython=True, parallel=parallel, nogil=True, fastmath=True, cache=True, boundscheck=False)
+    def julia_smooth_kernel(xs, ys, c_real, c_imag, max_iters, escape_radius_sq, power, skip_interior, color_scale, color_map,
+                            out_iterations, out_z_real, out_z_imag, out_rgba):
+        """
+        1行を計算した直後に、その行 (キャッシュに載ったまま) をスムーズカラーで out_rgba (H x W x 4, uint8) に色付けします。
+        反復回数と最後のzも julia_kernel と同じく書き込みます。
+        """
+        for y_idx in row_range(ys.shape[0]):
+            _julia_row_jit(xs, ys[y_idx], c_real, c_imag, max_iters, escape_radius_sq, power, skip_interior,
+                           out_iterations[y_idx], out_z_real[y_idx], out_z_imag[y_idx])
+            smooth_color_row_jit(out_iterations[y_idx], out_z_real[y_idx], out_z_imag[y_idx],
+                                 max_iters, color_scale, color_map, out_rgba[y_idx])
+
+    return julia_smooth_kernel
+
+
+# 行並列の有無 -> ジュリア集合の計算とスムーズカラーの融合カーネル
+_JULIA_SMOOTH_KERNELS = {
+    True: _make_julia_smooth_kernel(True),
+    False: _make_julia_smooth_kernel(False),
+}
+
+
+def compute_mandelbrot_smooth_grid(min_x: float, max_x: float, min_y: float, max_y: float,
+                                   width_px: int, height_px: int,
+                                   max_iters: int, escape_radius_sq: float, power: int,
+                                   color_scale: float, color_map: np.ndarray,
+                                   precision: str = 'f64',
+                                   parallel: bool = True,
+                                   reuse_buffers: bool = False,
+                                   skip_interior: bool = False,
+                                   buffer_pool: BufferPool | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    compute_mandelbrot_grid (CPU) と同じ計算を行い、同じパスでスムーズカラーの RGBA 画像も生成します。
+
+    色付けは行を計算した直後にその行に対して行うため、反復回数と最後のzを画像全体として読み直す
+    別パスのカラーリングが不要になります。結果はスムーズカラープラグインの apply_coloring と同一です。
+    引数の意味は compute_mandelbrot_grid と同じで、color_scale / color_map はスムーズカラーの
+    色のスケールと (N, 3) / (N, 4) uint8 のカラーマップ (N >= 2) です。GPU には対応しません。
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+            (反復回数の配列, 最後のzの実数部の配列, 最後のzの虚数部の配列, RGBA画像 (H x W x 4, uint8))。
+    """
+    axis_dtype = np.float32 if precision == 'f32' else np.float64
+    xs, ys = build_grid_axes(min_x, max_x, min_y, max_y, width_px, height_px, axis_dtype)
+    iterations, z_real, z_imag = _allocate_outputs(width_px, height_px, reuse_buffers, buffer_pool)
+    rgba = np.empty((height_px, width_px, 4), dtype=np.uint8)
+    _MANDELBROT_SMOOTH_KERNELS[bool(parallel)](xs, ys, int(max_iters), float(escape_radius_sq), int(power),
+                                                bool(skip_interior), float(color_scale), color_map,
+                                                iterations, z_real, z_imag, rgba)
+    return iterations, z_real, z_imag, rgba
+
+
+def compute_julia_smooth_grid(min_x: float, max_x: float, min_y: float, max_y: float,
+                              width_px: int, height_px: int,
+                              c_real: float, c_imag: float,
+                              max_iters: int, escape_radius_sq: float, power: int,
+                              color_scale: float, color_map: np.ndarray,
+                              precision: str = 'f64',
+                              parallel: bool = True,
+                              reuse_buffers: bool = False,
+                              skip_interior: bool = False,
+                              buffer_pool: BufferPool | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    compute_julia_grid (CPU) と同じ計算を行い、同じパスでスムーズカラーの RGBA 画像も生成します。
+    引数の意味は compute_julia_grid と、color_scale / color_map は compute_mandelbrot_smooth_grid と同じです。
+    結果はスムーズカラープラグインの apply_coloring と同一です。GPU には対応しません。
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+            (反復回数の配列, 最後のzの実数部の配列, 最後のzの虚数部の配列, RGBA画像 (H x W x 4, uint8))。
+    """
+    axis_dtype = np.float32 if precision == 'f32' else np.float64
+    xs, ys = build_grid_axes(min_x, max_x, min_y, max_y, width_px, height_px, axis_dtype)
+    iterations, z_real, z_imag = _allocate_outputs(width_px, height_px, reuse_buffers, buffer_pool)
+    rgba = np.empty((height_px, width_px, 4), dtype=np.uint8)
+    _JULIA_SMOOTH_KERNELS[bool(parallel)](xs, ys, float(c_real), float(c_imag), int(max_iters), float(escape_radius_sq),
+                                           int(power), bool(skip_interior), float(color_scale), color_map,
+                                           iterations, z_real, z_imag, rgba)
+    return iterations, z_real, z_imag, rgba
+
+
+def _make_box_downsample_kernel(parallel):
+    """
+    RGBA (uint8) 画像を aa x aa ブロックの平均で縮小するカーネルを生成します。
+
+    出力1行ぶんの和を uint32 の作業配列に整数のまま集計し、最後に画素数で切り捨て除算します。
+    float への変換と縮約用の一時配列がなく、入力は行ごとに連続した順序で1回だけ読みます。
+    aa=2/3/4 は aa 行を直接読んでブロックの和を uint16 で求める専用ループで処理します (結果は汎用ループと同一)。
+    結果は float32 の平均を uint8 へ切り捨てた場合と同一です (和は float32 で厳密に表せる範囲に収まるため)。
+    parallel が False の場合は出力行を逐次処理します (出力タイルのワーカースレッドから呼ぶ場合に使用)。
+    """
+    row_range = prange if parallel else range
+
+    @jit(nopython=True, parallel=parallel, nogil=True, cache=True, boundscheck=False)
+    def box_downsample_kernel(image, aa_factor, out):
+        """
+        Args:
+            image (np.ndarray): 縮小元の画像 (out の高さ*aa_factor x 幅*aa_factor x 4, uint8)。
+            aa_factor (int): 縮小率。
+            out (np.ndarray): 縮小結果の書き込み先 (高さ x 幅 x 4, uint8)。
+        """
+        out_height = out.shape[0]
+        out_width = out.shape[1]
+        # UI が選べる 2x2 / 3x3 / 4x4 は専用ループ: ブロックの和は uint16 に収まり、作業配列も dx 方向の
+        # 累積もないため、LLVM がチャネル方向をまとめてベクトル化できる (汎用ループより 1.8-5 倍速い)。
+        # 2 と 4 は除算の代わりに右シフト、3 は定数除算 (乗算に変換される) で平均する
+        if aa_factor == 2:
+            for y_idx in row_range(out_height):
+                src_row0 = image[2 * y_idx]
+                src_row1 = image[2 * y_idx + 1]
+                out_row = out[y_idx]
+                for x_idx in range(out_width):
+                    for channel in range(4):
+                        block_sum = ((np.uint16(src_row0[2 * x_idx, channel]) + np.uint16(src_row0[2 * x_idx + 1, channel]))
+                                     + (np.uint16(src_row1[2 * x_idx, channel]) + np.uint16(src_row1[2 * x_idx + 1, channel])))
+                        out_row[x_idx, channel] = np.uint8(block_sum >> 2)
+            return
+        if aa_factor == 3:
+            for y_idx in row_range(out_height):
+                src_row0 = image[3 * y_idx]
+                src_row1 = image[3 * y_idx + 1]
+                src_row2 = image[3 * y_idx + 2]
+                out_row = out[y_idx]
+                for x_idx in range(out_width):
+                    for channel in range(4):
+                        block_sum = np.uint16(0)
+                        for dx in range(3):
+                            src_x = 3 * x_idx + dx
+                            block_sum += (np.uint16(src_row0[src_x, channel]) + np.uint16(src_row1[src_x, channel])
+                                          + np.uint16(src_row2[src_x, channel]))
+                        out_row[x_idx, channel] = np.uint8(block_sum // np.uint16(9))
+            return
+        if aa_factor == 4:
+            for y_idx in row_range(out_height):
+                src_row0 = image[4 * y_idx]
+                src_row1 = image[4 * y_idx + 1]
+                src_row2 = image[4 * y_idx + 2]
+                src_row3 = image[4 * y_idx + 3]
+                out_row = out[y_idx]
+                for x_idx in range(out_width):
+                    for channel in range(4):
+                        block_sum = np.uint16(0)
+                        for dx in range(4):
+                            src_x = 4 * x_idx + dx
+                            block_sum += ((np.uint16(src_row0[src_x, channel]) + np.uint16(src_row1[src_x, channel]))
+                                          + (np.uint16(src_row2[src_x, channel]) + np.uint16(src_row3[src_x, channel])))
+                        out_row[x_idx, channel] = np.uint8(block_sum >> 4)
+            return
+        block_size = aa_factor * aa_factor
+        for y_idx in row_range(out_height):
+            acc = np.zeros((out_width, 4), dtype=np.uint32)
+            for dy in range(aa_factor):
+                src_row = image[y_idx * aa_factor + dy]
+                for x_idx in range(out_width):
+                    for dx in range(aa_factor):
+                        for channel in range(4):
+                            acc[x_idx, channel] += src_row[x_idx * aa_factor + dx, channel]
+            for x_idx in range(out_width):
+                for channel in range(4):
+                    out[y_idx, x_idx, channel] = acc[x_idx, channel] // block_size
+
+    return box_downsample_kernel
+
+
+# 行並列の有無 -> 縮小カーネル
+_BOX_DOWNSAMPLE_KERNELS = {
+    True: _make_box_downsample_kernel(True),
+    False: _make_box_downsample_kernel(False),
+}
+
+
+def box_downsample(image: np.ndarray, aa_factor: int, out: np.ndarray, parallel: bool = True) -> np.ndarray:
+    """
+    RGBA (uint8) 画像を aa_factor x aa_factor ブロックの平均 (切り捨て) で縮小し、out に書き込んで返します。
+    image の高さ・幅は out の aa_factor 倍である必要があります。
+    """
+    _BOX_DOWNSAMPLE_KERNELS[bool(parallel)](image, int(aa_factor), out)
+    return out
+
+
+def init_parallel_runtime() -> None:
+    """
+    並列カーネル (prange) が使うスレッド層 (TBB / OpenMP / workqueue) を、呼び出し元のスレッドで初期化します。
+    TBB は最初の並列カーネルをメインスレッド以外で実行すると、プロセス終了時にワーカーの終了待ちで止まるため、
+    ウォームアップや描画をバックグラウンドのスレッドで始める前に、メインスレッドから呼び出してください。
+    """
+    box_downsample(np.zeros((2, 2, 4), dtype=np.uint8), 2, np.empty((1, 1, 4), dtype=np.uint8), parallel=True)
+
+
+def warmup_kernels() -> None:
+    """
+    2x2 のダミー格子でプラグインに依存しない共有カーネル (|Z|^2・発散マスクの導出、縮小カーネル) を一度呼び出し、
+    JITコンパイル (またはキャッシュ読込) を済ませます。エンジン初期化時にバックグラウンドのスレッドで呼び出されます。
+
+    フラクタルごとの計算カーネル (行並列版・逐次版、倍精度・単精度) は、各プラグインの warmup
+    (FractalPlugin.warmup) がプラグインを最初にアクティブにしたときに用意します。
+    """
+    escape_time_result(*_allocate_outputs(2, 2), 2)
+    for parallel in (True, False):
+        box_downsample(np.zeros((2, 2, 4), dtype=np.uint8), 2, np.empty((1, 1, 4), dtype=np.uint8), parallel=parallel)
@@ -0,0 +1,188 @@
+"""
+エスケープタイム系フラクタル (Mandelbrot / Julia) 用の CUDA カーネル。
+
+1スレッド = 1ピクセルで計算し、(16, 16) のスレッドブロックで格子全体を覆います。
+CUDA が利用できない環境でもインポート自体は失敗しないよう、numba.cuda は遅延的に扱います。
+呼び出し側 (plugins/_fractal_kernels.py) は is_cuda_available() で確認してからこのモジュールの関数を使用します。
+"""
+import math
+import threading
+import numpy as np
+
+from plugins._fractal_kernels import PERIODICITY_CHECK_INTERVAL, PERIODICITY_EPS
+
+try:
+    from numba import cuda
+except Exception: # pragma: no cover ; CUDAサポートなしでビルドされたNumbaなど
+    cuda = None
+
+THREADS_PER_BLOCK = (16, 16)
+
+_cuda_available: bool | None = None
+_device_local = threading.local() # _device_outputs がスレッドごとに保持するデバイス上の出力バッファ
+
+
+def is_cuda_available() -> bool:
+    """CUDA デバイスが利用可能かどうかを返します (結果はプロセス内でキャッシュされます)。"""
+    global _cuda_available
+    if _cuda_available is None:
+        try:
+            _cuda_available = cuda is not None and bool(cuda.is_available())
+        except Exception:
+            _cuda_available = False
+    return _cuda_available
+
+
+if cuda is not None:
+    @cuda.jit(device=True)
+    def _complex_int_pow_cuda(z_real, z_imag, power):
+        """複素数の整数乗 (デバイス関数)。"""
+        r_real = z_real
+        r_imag = z_imag
+        for _ in range(power - 1):
+            t_real = r_real * z_real - r_imag * z_imag
+            r_imag = r_real * z_imag + r_imag * z_real
+            r_real = t_real
+        return r_real, r_imag
+
+    @cuda.jit
+    def _mandelbrot_kernel_cuda(xs, ys, max_iters, escape_radius_sq, power, skip_interior,
+                                out_iterations, out_z_real, out_z_imag):
+        """マンデルブロ集合の1ピクセルを1スレッドで計算するCUDAカーネル。"""
+        x_idx, y_idx = cuda.grid(2)
+        if x_idx >= xs.shape[0] or y_idx >= ys.shape[0]:
+            return
+        c_real = xs[x_idx]
+        c_imag = ys[y_idx]
+        z_real = 0.0
+        z_imag = 0.0
+        record_real = 0.0
+        record_imag = 0.0
+        record_at = PERIODICITY_CHECK_INTERVAL
+        n = max_iters
+        iter_count = max_iters
+        if skip_interior and power == 2:
+            # 主カージオイド・周期2の円板に含まれるピクセルは反復しない (CPUカーネルと同じ判定)
+            shifted_real = c_real - 0.25
+            q = shifted_real * shifted_real + c_imag * c_imag
+            bulb_real = c_real + 1.0
+            if (q * (q + shifted_real) < 0.25 * c_imag * c_imag
+                    or bulb_real * bulb_real + c_imag * c_imag < 0.0625):
+                iter_count = 0
+        for i in range(iter_count):
+            if power == 2:
+                z_real_sq = z_real * z_real
+                z_imag_sq = z_imag * z_imag
+                z_imag = 2.0 * z_real * z_imag + c_imag
+                z_real = z_real_sq - z_imag_sq + c_real
+            else:
+                z_real, z_imag = _complex_int_pow_cuda(z_real, z_imag, power)
+                z_real += c_real
+                z_imag += c_imag
+            if z_real * z_real + z_imag * z_imag > escape_radius_sq:
+                n = i
+                break
+            if skip_interior and (i + 1) % PERIODICITY_CHECK_INTERVAL == 0:
+                # 周期検出 (CPUカーネルと同じ判定)
+                if abs(z_real - record_real) < PERIODICITY_EPS and abs(z_imag - record_imag) < PERIODICITY_EPS:
+                    break
+                if i + 1 == record_at:
+                    record_real = z_real
+                    record_imag = z_imag
+                    record_at *= 2
+        out_iterations[y_idx, x_idx] = n
+        out_z_real[y_idx, x_idx] = z_real
+        out_z_imag[y_idx, x_idx] = z_imag
+
+    @cuda.jit
+    def _julia_kernel_cuda(xs, ys, c_real, c_imag, max_iters, escape_radius_sq, power, skip_interior,
+                           out_iterations, out_z_real, out_z_imag):
+        """ジュリア集合の1ピクセルを1スレッドで計算するCUDAカーネル。"""
+        x_idx, y_idx = cuda.grid(2)
+        if x_idx >= xs.shape[0] or y_idx >= ys.shape[0]:
+            return
+        z_real = xs[x_idx]
+        z_imag = ys[y_idx]
+        record_real = z_real
+        record_imag = z_imag
+        record_at = PERIODICITY_CHECK_INTERVAL
+        n = max_iters
+        for i in range(max_iters):
+            if z_real * z_real + z_imag * z_imag > escape_radius_sq:
+                n = i
+                break
+            if power == 2:
+                z_real_sq = z_real * z_real
+                z_imag_sq = z_imag * z_imag
+                z_imag = 2.0 * z_real * z_imag + c_imag
+                z_real = z_real_sq - z_imag_sq + c_real
+            else:
+                z_real, z_imag = _complex_int_pow_cuda(z_real, z_imag, power)
+                z_real += c_real
+                z_imag += c_imag
+            if skip_interior and (i + 1) % PERIODICITY_CHECK_INTERVAL == 0:
+                if abs(z_real - record_real) < PERIODICITY_EPS and abs(z_imag - record_imag) < PERIODICITY_EPS:
+                    break
+                if i + 1 == record_at:
+                    record_real = z_real
+                    record_imag = z_imag
+                    record_at *= 2
+        out_iterations[y_idx, x_idx] = n
+        out_z_real[y_idx, x_idx] = z_real
+        out_z_imag[y_idx, x_idx] = z_imag
+
+
+def _blocks_per_grid(width_px: int, height_px: int) -> tuple[int, int]:
+    return (math.ceil(width_px / THREADS_PER_BLOCK[0]), math.ceil(height_px / THREADS_PER_BLOCK[1]))
+
+
+def _device_outputs(width_px: int, height_px: int):
+    """
+    デバイス上の出力バッファ (反復回数, 最後のzの実数部, 虚数部) を返します。
+    同じ画素数で続けて計算する場合 (パン・ズーム中のプレビューなど) はフレームごとに確保し直さないよう、
+    直近のサイズのバッファをスレッドごとに保持して再利用します。結果はホストへコピーして返すため、上書きしても問題ありません。
+    """
+    shape = (height_px, width_px)
+    cached = getattr(_device_local, 'outputs', None)
+    if cached is None or cached[0] != shape:
+        cached = (shape, (cuda.device_array(shape, dtype=np.int32),
+                          cuda.device_array(shape, dtype=np.float64),
+                          cuda.device_array(shape, dtype=np.float64)))
+        _device_local.outputs = cached
+    return cached[1]
+
+
+def compute_mandelbrot_grid_cuda(xs: np.ndarray, ys: np.ndarray, max_iters: int,
+                                 escape_radius_sq: float, power: int,
+                                 skip_interior: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    GPU上でマンデルブロ集合を計算し、結果をホストへ転送して返します。
+    skip_interior の意味は plugins/_fractal_kernels.py の compute_mandelbrot_grid と同じです。
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: (反復回数の配列, 最後のzの実数部の配列, 最後のzの虚数部の配列)。
+    """
+    width_px, height_px = xs.shape[0], ys.shape[0]
+    d_iterations, d_z_real, d_z_imag = _device_outputs(width_px, height_px)
+    _mandelbrot_kernel_cuda[_blocks_per_grid(width_px, height_px), THREADS_PER_BLOCK](
+        cuda.to_device(xs), cuda.to_device(ys), max_iters, escape_radius_sq, power, skip_interior,
+        d_iterations, d_z_real, d_z_imag)
+    return d_iterations.copy_to_host(), d_z_real.copy_to_host(), d_z_imag.copy_to_host()
+
+
+def compute_julia_grid_cuda(xs: np.ndarray, ys: np.ndarray, c_real: float, c_imag: float,
+                            max_iters: int, escape_radius_sq: float, power: int,
+                            skip_interior: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    GPU上でジュリア集合を計算し、結果をホストへ転送して返します。
+    skip_interior の意味は plugins/_fractal_kernels.py の compute_julia_grid と同じです。
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: (反復回数の配列, 最後のzの実数部の配列, 最後のzの虚数部の配列)。
+    """
+    width_px, height_px = xs.shape[0], ys.shape[0]
+    d_iterations, d_z_real, d_z_imag = _device_outputs(width_px, height_px)
+    _julia_kernel_cuda[_blocks_per_grid(width_px, height_px), THREADS_PER_BLOCK](
+        cuda.to_device(xs), cuda.to_device(ys), c_real, c_imag, max_iters, escape_radius_sq, power, skip_interior,
+        d_iterations, d_z_real, d_z_imag)
+    return d_iterations.copy_to_host(), d_z_real.copy_to_host(), d_z_imag.copy_to_host()
@@ -22,6 +22,71 @@ class ColoringAlgorithmPlugin(ABC):
         """
         return 'divergent'
 
+    @property
+    def supports_tiling(self) -> bool:
+        """
+        画像をタイルに分割して個別にカラーリングしても、一括でカラーリングした場合と同じ結果になるかどうか。
+        画像全体の統計量 (最小値・最大値など) で正規化するアルゴリズムは False を返してください。
+        False の場合、高解像度出力は画像全体を一度にカラーリングします。デフォルトは True です。
+        """
+        return True
+
+    @property
+    def needs_interior_z(self) -> bool:
+        """
+        集合内部 (最大反復回数に達したピクセル) の色付けに最後のZ ('last_zn_values' / 'last_re' / 'last_im') を使うかどうか。
+        False の場合、エンジンは内部と確定できるピクセル (マンデルブロ集合の主カージオイド、周期軌道に収束したピクセルなど) の
+        反復を省略・打ち切ることがあり、そのピクセルの最後のZは意味のない値になります。
+        発散部用のプラグインは集合内部を塗らないため、デフォルトでは target_type が 'non_divergent' の場合のみ True です。
+        """
+        return self.target_type == 'non_divergent'
+
+    def get_fused_coloring(self, algorithm_params: dict, color_map_data) -> tuple | None:
+        """
+        フラクタル計算と同じパスで色付けできる場合に、その指定 (種類名, 引数...) のタプルを返します。
+        対応するフラクタルプラグイン (例: Mandelbrot / Julia は 'smooth') は、共通パラメータ 'fused_coloring' でこれを受け取ると
+        計算と同時に色付けした RGBA をフラクタルデータの 'fused_rgba' として返し、エンジンはそれを
+        apply_coloring の結果として使います。結果は apply_coloring と同一である必要があります。
+        デフォルトは None (融合しない) です。
+        """
+        return None
+
+    def warmup(self) -> None:
+        """
+        Numba などのJITコンパイル (2回目以降の起動ではディスクキャッシュの読込) を前もって済ませます。
+        エンジンはプラグインを最初にアクティブにしたときに、バックグラウンドのスレッドでこれを1回だけ呼び出します。
+        JITカーネルを使うプラグインは、_warmup_apply_coloring を呼ぶなどして小さなダミーデータで一度カーネルを実行してください。
+        デフォルトは何もしません。
+        """
+        pass
+
+    def _warmup_apply_coloring(self, size: int = 4) -> None:
+        """
+        size x size のダミーデータ (発散した画素と集合内部の画素を含む) と既定のパラメータで apply_coloring を実行します。
+        行並列の有無 ('parallel_kernels') の両方で呼び出し、プレビューと高解像度出力のタイルが使うカーネルを用意します。
+        """
+        max_iterations = 8
+        iterations = (np.arange(size * size, dtype=np.int32) % (max_iterations + 1)).reshape(size, size)
+        z_real = np.full((size, size), 3.0, dtype=np.float64)
+        z_imag = np.full((size, size), 0.5, dtype=np.float64)
+        fractal_data = {
+            'iterations': iterations,
+            'last_z_real': z_real,
+            'last_z_imag': z_imag,
+            'last_re': z_real.astype(np.float32),
+            'last_im': z_imag.astype(np.float32),
+            'last_zn_values': z_real + 1j * z_imag,
+            'last_z_modulus_sq': z_real * z_real + z_imag * z_imag,
+            'is_diverged': iterations < max_iterations,
+        }
+        algorithm_params = {p['name']: p['default'] for p in self.get_parameters_definition()}
+        color_map = np.array([[0, 0, 0, 255], [255, 255, 255, 255]], dtype=np.uint8) # エンジンが渡すものと同じ (N, 4) uint8 LUT
+        color_map.setflags(write=False)
+        for parallel in (True, False):
+            common_params = {'max_iterations': max_iterations, 'escape_radius': 2.0,
+                             'image_width_px': size, 'image_height_px': size, 'parallel_kernels': parallel}
+            self.apply_coloring(fractal_data, common_params, algorithm_params, color_map)
+
     @abstractmethod
     def get_parameters_definition(self) -> list:
         """
@@ -37,7 +102,7 @@ class ColoringAlgorithmPlugin(ABC):
         fractal_data: dict,
         common_fractal_params: dict,
         algorithm_params: dict,
-        color_map_data: list[tuple[int, int, int]] | None # カラーマップはオプション
+        color_map_data: list[tuple[int, int, int]] | np.ndarray | None # カラーマップはオプション
     ) -> np.ndarray:
         """
         指定されたデータとカラーマップを使用してカラーリングを適用し、
@@ -49,8 +114,14 @@ class ColoringAlgorithmPlugin(ABC):
                     'iterations': np.ndarray (dtype=np.int32) - エスケープ時間配列。
                 オプションキー (アルゴリズムによる):
                     'last_z_modulus_sq': np.ndarray (dtype=np.float64) - 発散時の|Z|^2。
+                    'is_diverged': np.ndarray (dtype=np.bool_) - 発散したか (iterations < max_iterations)。フラクタルカーネルが計算と同時に求めるため、
+                                   NumPy で集合内部のマスクが必要な場合は `iterations == max_iterations` を計算し直さずにこれを使ってください
+                                   (Numba カーネル内で画素ごとに反復回数を比較する場合は、別の配列を読むより比較の方が安価です)。
                     'last_z_real': np.ndarray (dtype=np.float64) - 発散時のZの実部。
                     'last_z_imag': np.ndarray (dtype=np.float64) - 発散時のZの虚部。
+                    'last_re': np.ndarray (dtype=np.float32, C連続) - 最終Zの実部 (エンジンが 'last_z_real' または 'last_zn_values' から作るSoAプレーン)。
+                    'last_im': np.ndarray (dtype=np.float32, C連続) - 最終Zの虚部 (同上)。
+                    # 'last_re'/'last_im' が存在する場合、複素数の 'last_zn_values' より優先して使用することを推奨
                     # 他にも軌道トラップ用の軌跡データなども考えられる
 
             common_fractal_params (dict): フラクタル計算時の共通パラメータ。
@@ -62,9 +133,13 @@ class ColoringAlgorithmPlugin(ABC):
             algorithm_params (dict): このカラーリングアルゴリズム固有のパラメータ。
                                     get_parameters_definitionで定義された 'name' がキー。
 
-            color_map_data (list[tuple[int, int, int]] | None):
-                使用するカラーマップの色データのリスト。各要素は(R, G, B)のタプル (0-255)。
-                カラーマップを使用しないアルゴリズムの場合は無視されるか、Noneまたは空リストが渡される。
+            color_map_data (list[tuple[int, int, int]] | np.ndarray | None):
+                使用するカラーマップの色データ。エンジンからは常に、カラーマップごとにキャッシュした
+                C連続の (N, 4) uint8 の読み取り専用LUT (RGBのみのマップはアルファ255) が渡されます
+                (カラーマップがない場合は N=0、高解像度出力では16段階のグレースケール)。
+                単体で呼び出す場合は (R, G, B) のタプル (0-255) のリストも受け付けてください。
+                真偽値判定 (`if not color_map_data`) ではなく `is None` / `len()` で確認してください。
+                カラーマップを使用しないアルゴリズムの場合は無視されます。
 
         戻り値:
             numpy.ndarray: RGBAカラーデータのNumPy配列 (形状: 高Hx幅Wx4, dtype=np.uint8)。
@@ -92,24 +167,27 @@ if __name__ == '__main__':
             print(f"  アルゴリズムパラメータ: {algorithm_params}")
             print(f"  カラーマップサイズ: {len(color_map_data) if color_map_data else 0}")
 
-            img_array = np.zeros((height, width, 4), dtype=np.uint8)
+            img_array = np.empty((height, width, 4), dtype=np.uint8)
             img_array[:, :, 3] = 255 # Alphaチャンネルを不透明に
 
-            for r_idx in range(height):
-                for c_idx in range(width):
-                    iter_val = iterations[r_idx, c_idx]
-                    if iter_val == max_iters: # 内部 (最大反復回数に達した場合)
-                        img_array[r_idx, c_idx, 0:3] = [0, 0, 0] # 黒
-                    else: # 外部 (発散した場合)
-                        if color_map_data and len(color_map_data) > 0:
-                            # カラーマップを使用 (単純な剰余で色を選択)
-                            color_idx = iter_val % len(color_map_data)
-                            img_array[r_idx, c_idx, 0:3] = color_map_data[color_idx]
-                        else:
-                            # カラーマップがない場合はグレースケール (反復回数に応じて)
-                            gray_val = int(255 * (iter_val / max_iters))
-                            gray_val = max(0, min(255, gray_val)) # クランプ
-                            img_array[r_idx, c_idx, 0:3] = [gray_val, gray_val, gray_val]
+            # 画素ごとの Python ループではなく、配列演算で全画素をまとめて色付けする
+            if color_map_data is not None and len(color_map_data) > 0:
+                # カラーマップを使用 (単純な剰余で色を選択)
+                cmap = np.asarray(color_map_data, dtype=np.uint8)
+                num_colors = len(cmap)
+                if num_colors & (num_colors - 1) == 0:
+                    color_idx = iterations & (num_colors - 1) # 色数が2のべき乗なら剰余 (除算) をビットマスクの AND にする
+                else:
+                    color_idx = np.remainder(iterations, num_colors)
+                img_array[:, :, :3] = cmap[color_idx, :3]
+            else:
+                # カラーマップがない場合はグレースケール (反復回数に応じて)
+                gray = np.clip((iterations.astype(np.int64) * 255) // max_iters, 0, 255).astype(np.uint8)
+                img_array[:, :, :3] = gray[..., np.newaxis]
+            # 内部 (最大反復回数に達した場合) は黒。フラクタルデータの発散マスクがあれば、反復回数の比較をやり直さない
+            is_diverged = fractal_data.get('is_diverged')
+            interior = ~is_diverged if is_diverged is not None else iterations == max_iters
+            img_array[interior, :3] = 0
             return img_array
 
     print("DummyColoringPlugin のテストを実行中...")
@@ -55,7 +55,9 @@ class FractalPlugin(ABC):
         戻り値:
             dict: 計算結果を格納した辞書。最低限以下のキーを含むことを期待:
                   'iterations': numpy.ndarray (dtype=np.int32) - 各ピクセルのエスケープ回数/収束判定値
-                  'last_zn_values': numpy.ndarray (dtype=np.complex128) - 各ピクセルの最終Z_n値 (複素数)
+                  'last_z_real', 'last_z_imag': numpy.ndarray (dtype=np.float64) - 各ピクセルの最終Z_n値の実部/虚部 (SoA)
+                  実部/虚部の代わりに、従来の 'last_zn_values': numpy.ndarray (dtype=np.complex128, AoS) を返しても構いません
+                  (エンジンがどちらからでもカラーリング用の 'last_re' / 'last_im' を作ります)。
                   他のキーはプラグインやカラーリングアルゴリズムの要求に応じて追加可能
                   (例: 'last_z_modulus_sq', 'zn_trajectory_real', 'zn_trajectory_imag')
         """
@@ -70,6 +72,15 @@ class FractalPlugin(ABC):
         """
         pass
 
+    def warmup(self) -> None:
+        """
+        Numba などのJITコンパイル (2回目以降の起動ではディスクキャッシュの読込) を前もって済ませます。
+        エンジンはプラグインを最初にアクティブにしたときに、バックグラウンドのスレッドでこれを1回だけ呼び出すため、
+        初回の描画 (パン・ズーム) でコンパイル待ちが発生しません。
+        JITカーネルを使うプラグインは、4x4 程度のダミー格子で一度カーネルを実行してください。デフォルトは何もしません。
+        """
+        pass
+
     # オプションのメソッド: プリセット値を提供する場合など
     def get_presets(self) -> dict | None:
         """
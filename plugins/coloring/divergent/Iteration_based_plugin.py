@@ -1,109 +1,236 @@
 import numpy as np
-from numba import jit
+from numba import jit, prange
 import math
+from functools import lru_cache
 
 try:
     from plugins.base_coloring_plugin import ColoringAlgorithmPlugin
+    from plugins._fractal_kernels import pooled_empty
 except ImportError:
     # このフォールバックは、プロジェクト構造が一貫しており、
     # 実行ポイントが常にプロジェクトルートである場合は不要かもしれません。
     from base_coloring_plugin import ColoringAlgorithmPlugin
+    from _fractal_kernels import pooled_empty
 
-# CustomLoggerをインポート - プロジェクトルートのloggerディレクトリにあると仮定
-import sys
-from pathlib import Path
-# このスクリプトが自身のフォルダから直接実行された場合、または
-# 他の理由でpluginsフォルダがsys.pathに追加された場合にloggerが見つかるようにする
-_logger_path_finder = Path(__file__).resolve()
-# plugins/coloring -> plugins -> ルート (jules_frac) のように上位へ移動
-_project_root_for_logger = _logger_path_finder.parent.parent.parent
-if str(_project_root_for_logger) not in sys.path:
-    sys.path.insert(0, str(_project_root_for_logger))
-try:
-    from logger.custom_logger import CustomLogger
-    logger = CustomLogger()
-except ImportError:
-    # loggerをインポートできない場合のフォールバック (例: 特定の実行コンテキストでのパスの問題など)
-    print("警告: Iteration_based_plugin.py で CustomLogger をインポートできませんでした。標準のprintを使用します。")
-    class PrintLogger: # シンプルなフォールバックロガーを定義
-        def log(self, message, level="INFO"): print(f"[{level}] {message}") # ログレベルとメッセージを出力
-    logger = PrintLogger()
+from logger.custom_logger import CustomLogger # logger がプロジェクトルート/loggerにあると仮定
+
+logger = CustomLogger()
 
 
 # Numba JITコンパイル済みヘルパー関数
-@jit(nopython=True)
-def _apply_iteration_based_coloring_jit(
-    iterations_array: np.ndarray,
-    max_iters: int,
-    color_map: np.ndarray,
-    color_scale_factor: float
-) -> np.ndarray:
+@jit(nopython=True, nogil=True, cache=True)
+def _iteration_color_jit(iters, max_iters, color_map, color_scale_factor):
     """
-    反復回数とカラーマップに基づいてカラーリングを適用するJITコンパイル済み関数。
+    発散した点 (iters != max_iters) 1つの色 (R, G, B) を返します。
 
     Args:
-        iterations_array (np.ndarray): 各点の反復回数を格納した配列。
+        iters (int): 反復回数。
         max_iters (int): 最大反復回数。
-        color_map (np.ndarray): 色補間に使用するカラーマップ (形状: (N,3), dtype: uint8)。
+        color_map (np.ndarray): 色補間に使用するカラーマップ (形状: (N,3) または (N,4), dtype: uint8)。
         color_scale_factor (float): 色の変化の速さを調整するスケールファクター。
     Returns:
-        np.ndarray: RGBA形式のカラーリング済み画像データ。
+        tuple: (R, G, B) の np.uint8。
+    """
+    if color_map.shape[0] < 2: # カラーマップの色が不足している場合
+        # デフォルトのグレースケールのような動作（黒から白へ）
+        gray_value = int((1.0 - (iters / max_iters)) * 255)
+        gray_value = max(0, min(255, gray_value))
+        return np.uint8(gray_value), np.uint8(gray_value), np.uint8(gray_value)
+
+    # iters を [0, 1) の範囲に正規化し、スケールを適用
+    normalized_iter = iters / max_iters # 0に近いほど早く発散
+
+    # スムーズなカラーリングと同様のインデックス計算と補間
+    # (1.0 - normalized_iter) を使うと、早く発散する点がカラーマップの最初の色に近くなる
+    color_idx_float = (1.0 - normalized_iter) * (color_map.shape[0] -1) * color_scale_factor
+
+    idx0_floor = math.floor(color_idx_float)
+    fraction = color_idx_float - idx0_floor
+
+    c1_idx = int(idx0_floor) % color_map.shape[0]
+    c2_idx = (int(idx0_floor) + 1) % color_map.shape[0]
+
+    # RGBA (4要素) のカラーマップでも RGB のみ使う
+    c1_r, c1_g, c1_b = color_map[c1_idx, 0], color_map[c1_idx, 1], color_map[c1_idx, 2]
+    c2_r, c2_g, c2_b = color_map[c2_idx, 0], color_map[c2_idx, 1], color_map[c2_idx, 2]
+
+    r_val = c1_r * (1.0 - fraction) + c2_r * fraction
+    g_val = c1_g * (1.0 - fraction) + c2_g * fraction
+    b_val = c1_b * (1.0 - fraction) + c2_b * fraction
+
+    return (np.uint8(max(0.0, min(255.0, r_val))),
+            np.uint8(max(0.0, min(255.0, g_val))),
+            np.uint8(max(0.0, min(255.0, b_val))))
+
+
+# 全反復回数 (0..max_iters) のパレットをキャッシュする最大反復回数 (これを超える場合は画像ごとに範囲のパレットを作る)
+FULL_PALETTE_MAX_ITERATIONS = 1 << 18
+
+# _get_full_iteration_palette でキャッシュするパレットの数 (カラーマップ・スケール・最大反復回数の組)
+FULL_PALETTE_CACHE_SIZE = 8
+
+
+@jit(nopython=True, nogil=True, cache=True, boundscheck=False)
+def _fill_full_iteration_palette_jit(palette, max_iters, color_map, color_scale_factor):
+    """
+    palette (max_iters + 1, 4) に反復回数 0..max_iters - 1 の色と、最後の要素に集合内部の黒を書き込みます。アルファは常に255。
+    """
+    for iters in range(max_iters):
+        r, g, b = _iteration_color_jit(iters, max_iters, color_map, color_scale_factor)
+        palette[iters, 0] = r
+        palette[iters, 1] = g
+        palette[iters, 2] = b
+        palette[iters, 3] = 255
+    palette[max_iters, 0] = 0
+    palette[max_iters, 1] = 0
+    palette[max_iters, 2] = 0
+    palette[max_iters, 3] = 255
+
+
+@lru_cache(maxsize=FULL_PALETTE_CACHE_SIZE)
+def _get_full_iteration_palette(color_map_bytes: bytes, color_map_shape: tuple, color_scale_factor: float,
+                                max_iters: int) -> np.ndarray:
     """
-    height, width = iterations_array.shape
-    colored_image_rgba = np.empty((height, width, 4), dtype=np.uint8)
-
-    for r_idx in range(height):
-        for c_idx in range(width):
-            iters = iterations_array[r_idx, c_idx]
-            colored_image_rgba[r_idx, c_idx, 3] = 255  # アルファチャンネル (完全に不透明に設定)
-
-            if iters == max_iters:  # 点は集合内に存在します
-                colored_image_rgba[r_idx, c_idx, 0] = 0  # R
-                colored_image_rgba[r_idx, c_idx, 1] = 0  # G
-                colored_image_rgba[r_idx, c_idx, 2] = 0  # B
-            else: # 点は発散しました
-                if color_map.shape[0] < 2: # カラーマップの色が不足している場合
-                    # デフォルトのグレースケールのような動作（黒から白へ）
-                    gray_value = int((1.0 - (iters / max_iters)) * 255)
-                    gray_value = max(0, min(255, gray_value))
-                    colored_image_rgba[r_idx, c_idx, 0] = np.uint8(gray_value)
-                    colored_image_rgba[r_idx, c_idx, 1] = np.uint8(gray_value)
-                    colored_image_rgba[r_idx, c_idx, 2] = np.uint8(gray_value)
+    反復回数 0..max_iters の色 (最後は集合内部の黒) を並べたパレットを uint32 (max_iters + 1,) として返します。
+
+    パレットはカラーマップ・色のスケール・最大反復回数だけで決まるため、引数をキーにキャッシュされ、
+    パン・ズームなどで同じ設定のまま再描画する間は作り直しません。共有されるため、返す配列は読み取り専用です。
+    """
+    color_map = np.frombuffer(color_map_bytes, dtype=np.uint8).reshape(color_map_shape)
+    palette = np.empty((max_iters + 1, 4), dtype=np.uint8)
+    _fill_full_iteration_palette_jit(palette, max_iters, color_map, color_scale_factor)
+    palette32 = palette.view(np.uint32).reshape(max_iters + 1)
+    palette32.flags.writeable = False
+    return palette32
+
+
+def _make_iteration_based_coloring_kernel(parallel):
+    """
+    反復回数ベースのカラーリングカーネルと、キャッシュ済みの全反復回数パレットを参照するカーネルの組を生成します。
+    parallel が False の場合は行を逐次処理します (出力タイルのワーカースレッドから呼ぶ場合に使用)。
+    """
+    row_range = prange if parallel else range
+
+    @jit(nopython=True, parallel=parallel, nogil=True, cache=True, boundscheck=False) # 出力タイルのワーカースレッドから並行して呼べるよう GIL を解放する
+    def iteration_based_coloring_kernel(
+        iterations_array: np.ndarray,
+        max_iters: int,
+        color_map: np.ndarray,
+        color_scale_factor: float,
+        colored_image_rgba: np.ndarray
+    ) -> np.ndarray:
+        """
+        反復回数とカラーマップに基づいてカラーリングを適用するJITコンパイル済み関数。
+
+        色は反復回数だけで決まるため、画像内の発散した点の反復回数の範囲 [最小, 最大] の各値の色 (RGBA) を先にパレットとして求め、
+        各ピクセルはパレットを 32ビット (RGBA 4バイト) で1回参照して書き込むだけにします。
+        パレットの色はピクセルごとに計算した場合と同じ式で求めるため、結果は同一です。
+        反復回数の範囲が画素数より広い場合 (小さな画像で反復回数が大きく散らばる場合) は、パレットを作らずにピクセルごとに計算します。
+        範囲の走査・パレットの計算・書き込みはいずれも行 (パレットは要素) ごとに独立しており、並列版はそれぞれを prange で分担します。
+
+        Args:
+            iterations_array (np.ndarray): 各点の反復回数を格納した配列。
+            max_iters (int): 最大反復回数。
+            color_map (np.ndarray): 色補間に使用するカラーマップ (形状: (N,3) または (N,4), dtype: uint8)。
+            color_scale_factor (float): 色の変化の速さを調整するスケールファクター。
+            colored_image_rgba (np.ndarray): 書き込み先 (高さ x 幅 x 4, uint8, C連続)。
+        Returns:
+            np.ndarray: colored_image_rgba (RGBA形式のカラーリング済み画像データ)。
+        """
+        height, width = iterations_array.shape
+
+        # 発散した点の反復回数の範囲 (パレットの大きさ) を行ごとに求めてから合わせる
+        row_lo = np.empty(height, dtype=np.int64)
+        row_hi = np.empty(height, dtype=np.int64)
+        for r_idx in row_range(height):
+            lo = np.int64(max_iters)
+            hi = np.int64(-1)
+            for c_idx in range(width):
+                iters = iterations_array[r_idx, c_idx]
+                if iters != max_iters:
+                    lo = min(lo, iters)
+                    hi = max(hi, iters)
+            row_lo[r_idx] = lo
+            row_hi[r_idx] = hi
+        iters_lo = np.int64(max_iters)
+        iters_hi = np.int64(-1)
+        for r_idx in range(height):
+            iters_lo = min(iters_lo, row_lo[r_idx])
+            iters_hi = max(iters_hi, row_hi[r_idx])
+
+        if iters_hi < iters_lo or iters_hi - iters_lo + 1 <= height * width:
+            # パレット: 範囲内の反復回数ごとの色と、最後の要素に集合内部の黒。アルファは常に255
+            palette_size = max(iters_hi - iters_lo + 1, 0)
+            palette = np.empty((palette_size + 1, 4), dtype=np.uint8)
+            for offset in row_range(palette_size):
+                r, g, b = _iteration_color_jit(iters_lo + offset, max_iters, color_map, color_scale_factor)
+                palette[offset, 0] = r
+                palette[offset, 1] = g
+                palette[offset, 2] = b
+                palette[offset, 3] = 255
+            palette[palette_size, 0] = 0
+            palette[palette_size, 1] = 0
+            palette[palette_size, 2] = 0
+            palette[palette_size, 3] = 255
+            palette32 = palette.view(np.uint32).reshape(palette_size + 1)
+            out32 = colored_image_rgba.view(np.uint32).reshape(height, width)
+            for r_idx in row_range(height):
+                for c_idx in range(width):
+                    iters = iterations_array[r_idx, c_idx]
+                    out32[r_idx, c_idx] = palette32[palette_size if iters == max_iters else iters - iters_lo]
+            return colored_image_rgba
+
+        for r_idx in row_range(height):
+            for c_idx in range(width):
+                iters = iterations_array[r_idx, c_idx]
+                colored_image_rgba[r_idx, c_idx, 3] = 255  # アルファチャンネル (完全に不透明に設定)
+                if iters == max_iters:  # 点は集合内に存在します
+                    colored_image_rgba[r_idx, c_idx, 0] = 0  # R
+                    colored_image_rgba[r_idx, c_idx, 1] = 0  # G
+                    colored_image_rgba[r_idx, c_idx, 2] = 0  # B
+                else: # 点は発散しました
+                    r, g, b = _iteration_color_jit(iters, max_iters, color_map, color_scale_factor)
+                    colored_image_rgba[r_idx, c_idx, 0] = r
+                    colored_image_rgba[r_idx, c_idx, 1] = g
+                    colored_image_rgba[r_idx, c_idx, 2] = b
+        return colored_image_rgba
+
+    @jit(nopython=True, parallel=parallel, nogil=True, cache=True, boundscheck=False)
+    def full_palette_lookup_kernel(
+        iterations_array: np.ndarray,
+        max_iters: int,
+        color_map: np.ndarray,
+        color_scale_factor: float,
+        palette32: np.ndarray,
+        colored_image_rgba: np.ndarray
+    ) -> np.ndarray:
+        """
+        _get_full_iteration_palette のパレット (uint32, 長さ max_iters + 1) を反復回数で直接参照して colored_image_rgba に書き込みます。
+        範囲外の反復回数 (通常は発生しない) はパレットを参照せず、ピクセルごとに計算します。
+        """
+        height, width = iterations_array.shape
+        out32 = colored_image_rgba.view(np.uint32).reshape(height, width)
+        for r_idx in row_range(height):
+            for c_idx in range(width):
+                iters = iterations_array[r_idx, c_idx]
+                if 0 <= iters <= max_iters:
+                    out32[r_idx, c_idx] = palette32[iters]
                 else:
-                    # カラーマップを使用
-                    # iters を [0, 1) の範囲に正規化し、スケールを適用
-                    # iters が 0 から max_iters-1 の範囲で変化すると仮定
-                    # (max_iters の場合は既に処理済み)
-                    normalized_iter = iters / max_iters # 0に近いほど早く発散
-
-                    # スムーズなカラーリングと同様のインデックス計算と補間
-                    # (1.0 - normalized_iter) を使うと、早く発散する点がカラーマップの最初の色に近くなる
-                    color_idx_float = (1.0 - normalized_iter) * (color_map.shape[0] -1) * color_scale_factor
-
-                    idx0_floor = math.floor(color_idx_float)
-                    fraction = color_idx_float - idx0_floor
-
-                    c1_idx = int(idx0_floor) % color_map.shape[0]
-                    c2_idx = (int(idx0_floor) + 1) % color_map.shape[0]
-
-                    c1 = color_map[c1_idx]
-                    c2 = color_map[c2_idx]
-                    # RGBA対応: 4要素ならRGBのみ使う
-                    if c1.shape[0] == 4:
-                        c1_r, c1_g, c1_b = c1[0], c1[1], c1[2]
-                        c2_r, c2_g, c2_b = c2[0], c2[1], c2[2]
-                    else:
-                        c1_r, c1_g, c1_b = c1[0], c1[1], c1[2]
-                        c2_r, c2_g, c2_b = c2[0], c2[1], c2[2]
-
-                    r_val = c1_r * (1.0 - fraction) + c2_r * fraction
-                    g_val = c1_g * (1.0 - fraction) + c2_g * fraction
-                    b_val = c1_b * (1.0 - fraction) + c2_b * fraction
-
-                    colored_image_rgba[r_idx, c_idx, 0] = np.uint8(max(0.0, min(255.0, r_val)))
-                    colored_image_rgba[r_idx, c_idx, 1] = np.uint8(max(0.0, min(255.0, g_val)))
-                    colored_image_rgba[r_idx, c_idx, 2] = np.uint8(max(0.0, min(255.0, b_val)))
-    return colored_image_rgba
+                    r, g, b = _iteration_color_jit(iters, max_iters, color_map, color_scale_factor)
+                    colored_image_rgba[r_idx, c_idx, 0] = r
+                    colored_image_rgba[r_idx, c_idx, 1] = g
+                    colored_image_rgba[r_idx, c_idx, 2] = b
+                    colored_image_rgba[r_idx, c_idx, 3] = 255
+        return colored_image_rgba
+
+    return iteration_based_coloring_kernel, full_palette_lookup_kernel
+
+
+# 行並列の有無 -> (反復回数ベースのカラーリングカーネル, 全反復回数パレット参照カーネル)
+_ITERATION_BASED_COLORING_KERNELS = {
+    True: _make_iteration_based_coloring_kernel(True),
+    False: _make_iteration_based_coloring_kernel(False),
+}
 
 
 class IterationBasedColoringPlugin(ColoringAlgorithmPlugin):
@@ -116,6 +243,10 @@ class IterationBasedColoringPlugin(ColoringAlgorithmPlugin):
         """カラーリングアルゴリズムの名前を返します。"""
         return "反復回数ベース" # 名前を変更して機能を反映
 
+    def warmup(self) -> None:
+        """4x4 のダミーデータで apply_coloring を実行し、Numba カーネルのJITコンパイル (またはキャッシュ読込) を済ませます。"""
+        self._warmup_apply_coloring()
+
     def get_parameters_definition(self) -> list:
         """このカラーリングアルゴリズムに固有の調整可能なパラメータのリストを返します。"""
         return [
@@ -129,7 +260,7 @@ class IterationBasedColoringPlugin(ColoringAlgorithmPlugin):
         fractal_data: dict,
         common_fractal_params: dict,
         algorithm_params: dict,
-        color_map_data: list[tuple[int, int, int]] | None
+        color_map_data: list[tuple[int, int, int]] | np.ndarray | None
     ) -> np.ndarray:
         """
         反復回数と提供されたカラーマップに基づいてカラーリングを適用します。
@@ -147,12 +278,16 @@ class IterationBasedColoringPlugin(ColoringAlgorithmPlugin):
             fallback_image[:, :, 3] = 255 # アルファチャンネルを不透明に設定
             return fallback_image
 
+        # エンジンが正規化済みの C連続 int32 ならコピーしない (直接呼ばれた場合もカーネルを同じ型で使うため)
+        iterations = np.ascontiguousarray(iterations, dtype=np.int32)
+
         max_iters = common_fractal_params.get('max_iterations', 100) # max_iterations が提供されない場合のデフォルト値
 
         color_scale_from_plugin = algorithm_params.get('color_scale', 1.0)
 
-        if not color_map_data or len(color_map_data) < 2:
-            logger.log(f"{self.name}: カラーマップが不十分なため、デフォルトのグレースケールマップを使用します。", level="DEBUG")
+        if color_map_data is None or len(color_map_data) < 2:
+            if logger.is_enabled_for("DEBUG"): # カラーマップなし (N=0) のときは毎フレーム通るため、DEBUG 出力時のみ組み立てる
+                logger.log(f"{self.name}: カラーマップが不十分なため、デフォルトのグレースケールマップを使用します。", level="DEBUG")
             # デフォルトのグレースケールマップ (黒から白へ)
             # JIT関数内でこのケースを処理するため、ここでは単純な2色マップを渡すか、
             # JIT関数が color_map.shape[0] < 2 をチェックするようにします。
@@ -163,15 +298,24 @@ class IterationBasedColoringPlugin(ColoringAlgorithmPlugin):
             # 簡単のため、JIT関数に渡す color_map_np は常に有効な形状とし、JIT内で色数をチェックします。
             color_map_np = np.array([[0,0,0],[255,255,255]], dtype=np.uint8) # JITが扱う最小限のマップ
         else:
-            color_map_np = np.array(color_map_data, dtype=np.uint8)
+            color_map_np = np.ascontiguousarray(color_map_data, dtype=np.uint8) # エンジンのLUT (C連続 ndarray) はコピーせずに使う
             # RGBA(4要素)にも対応: shape[1]が3または4ならOK
             if color_map_np.ndim == 2 and (color_map_np.shape[1] == 3 or color_map_np.shape[1] == 4):
                 pass # OK
             else:
                 # それ以外は強制的にRGB2色にする
                 color_map_np = np.array([[0,0,0],[255,255,255]], dtype=np.uint8)
-        colored_image = _apply_iteration_based_coloring_jit(iterations, max_iters, color_map_np, color_scale_from_plugin)
-        return colored_image
+        # 行並列 (prange) 版が既定。出力タイルのワーカースレッドからは逐次版を使う ('parallel_kernels': False)
+        kernel, lookup_kernel = _ITERATION_BASED_COLORING_KERNELS[bool(common_fractal_params.get('parallel_kernels', True))]
+        # エンジンがバッファプールを渡した場合は、同じ画像サイズの間フレームごとに出力を確保し直さない
+        colored_image = pooled_empty(common_fractal_params.get('buffer_pool'), 'iteration_based_rgba',
+                                     iterations.shape + (4,), np.uint8)
+        if 0 < max_iters <= FULL_PALETTE_MAX_ITERATIONS:
+            # 同じカラーマップ・スケール・最大反復回数の間はパレットを作り直さない
+            palette32 = _get_full_iteration_palette(color_map_np.tobytes(), color_map_np.shape,
+                                                    float(color_scale_from_plugin), int(max_iters))
+            return lookup_kernel(iterations, max_iters, color_map_np, color_scale_from_plugin, palette32, colored_image)
+        return kernel(iterations, max_iters, color_map_np, color_scale_from_plugin, colored_image)
 
 if __name__ == '__main__':
     logger.log("IterationBasedColoringPlugin のテストを開始します...", level="INFO")
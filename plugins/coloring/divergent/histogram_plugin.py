@@ -0,0 +1,110 @@
+import numpy as np
+
+try:
+    from plugins.base_coloring_plugin import ColoringAlgorithmPlugin
+    from plugins._coloring_kernels import histogram_equalize, histogram_color_grid, bake_color_lut
+except ImportError: # pragma: no cover
+    # このプラグインファイルがプロジェクトのルートからではなく、
+    # plugins/coloring/divergent ディレクトリから直接実行された場合など、
+    # 相対インポートが失敗するケースのためのフォールバック。
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent))
+    from plugins.base_coloring_plugin import ColoringAlgorithmPlugin
+    from plugins._coloring_kernels import histogram_equalize, histogram_color_grid, bake_color_lut
+
+from logger.custom_logger import CustomLogger # logger がプロジェクトルート/loggerにあると仮定
+
+logger = CustomLogger()
+
+
+class HistogramEqualizationColoringPlugin(ColoringAlgorithmPlugin):
+    """
+    反復回数の分布をヒストグラム平坦化してカラーマップに割り当てるカラーリングプラグインです。
+    ピクセル数の多い反復回数帯ほど多くの色が割り当てられるため、
+    最大反復回数を増やしても色の大半が外側の帯に偏りません。
+    """
+
+    @property
+    def name(self) -> str:
+        """カラーリングアルゴリズムの名前を返します。"""
+        return "ヒストグラム平坦化"
+
+    @property
+    def supports_tiling(self) -> bool:
+        """画像全体の反復回数分布で正規化するため、タイル単位のカラーリングには対応しません。"""
+        return False
+
+    def warmup(self) -> None:
+        """4x4 のダミーデータで apply_coloring を実行し、Numba カーネルのJITコンパイル (またはキャッシュ読込) を済ませます。"""
+        self._warmup_apply_coloring()
+
+    def get_parameters_definition(self) -> list:
+        """このカラーリングアルゴリズムに固有の調整可能なパラメータのリストを返します。"""
+        return [
+            {'name': 'color_scale', 'label': '色のスケール',
+             'type': 'float', 'default': 1.0, 'range': (0.01, 100.0), 'step': 0.01,
+             'tooltip': 'カラーマップを繰り返す回数を調整します。大きいほど色が細かく変化します。'}
+        ]
+
+    def apply_coloring(
+        self,
+        fractal_data: dict,
+        common_fractal_params: dict,
+        algorithm_params: dict,
+        color_map_data: list[tuple[int, int, int]] | np.ndarray | None
+    ) -> np.ndarray:
+        """
+        ヒストグラム平坦化した反復回数 (0.0〜1.0) で、線形補間済みのLUTを参照してカラーリングを適用します。
+        最大反復回数に達したピクセルは黒になります。
+        カラーマップが提供されない場合、または色数が不十分な場合は、グレースケール（黒から白）で描画します。
+        """
+        iterations = fractal_data.get('iterations')
+        if iterations is None:
+            height_px = common_fractal_params.get('image_height_px', 100)
+            width_px = common_fractal_params.get('image_width_px', 100)
+            logger.log("必須データ 'iterations' が見つかりません。黒い画像を返します。", level="WARNING")
+            fallback_image = np.zeros((height_px, width_px, 4), dtype=np.uint8)
+            fallback_image[:, :, 3] = 255 # アルファチャンネルを不透明に設定
+            return fallback_image
+
+        max_iters = common_fractal_params.get('max_iterations', 100)
+        color_scale = algorithm_params.get('color_scale', 1.0)
+
+        if color_map_data is None or len(color_map_data) < 2:
+            if logger.is_enabled_for("DEBUG"): # カラーマップなし (N=0) のときは毎フレーム通るため、DEBUG 出力時のみ組み立てる
+                logger.log(f"{self.name}: カラーマップが不十分なため、デフォルトのグレースケールマップを使用します。", level="DEBUG")
+            color_map_np = np.array([[0, 0, 0], [255, 255, 255]], dtype=np.uint8)
+        else:
+            color_map_np = np.asarray(color_map_data, dtype=np.uint8) # エンジンのLUT (ndarray) はコピーせずに使う
+            if color_map_np.ndim != 2 or color_map_np.shape[1] not in (3, 4):
+                color_map_np = np.array([[0, 0, 0], [255, 255, 255]], dtype=np.uint8)
+        num_colors = color_map_np.shape[0]
+
+        # 累積分布値をカラーマップ上の位置 (0〜N-1, color_scale 倍) に変換し、
+        # 1周期 (N色、最後の色から先頭の色へ巡回) を補間済みのLUT (256色以上) から参照する。
+        # 参照・集合内部の黒塗り・アルファ設定は Numba カーネルで1パスにまとめる (plugins/_coloring_kernels.py)
+        color_lut = bake_color_lut(color_map_np, max(256, num_colors), cyclic=True)
+        return histogram_color_grid(iterations, max_iters, (num_colors - 1) * color_scale / num_colors, color_lut,
+                                    parallel=common_fractal_params.get('parallel_kernels', True))
+
+
+if __name__ == '__main__':
+    logger.log("HistogramEqualizationColoringPlugin のテストを開始します...", level="INFO")
+    plugin = HistogramEqualizationColoringPlugin()
+    default_algo_params = {p['name']: p['default'] for p in plugin.get_parameters_definition()}
+
+    # 反復回数 0 が 1ピクセル、5 が 3ピクセル、50 (=max_iters) が 2ピクセル
+    test_iterations_data = np.array([[0, 5, 5], [5, 50, 50]], dtype=np.int32)
+    test_fractal_data = {'iterations': test_iterations_data}
+    test_common_fractal_params = {'max_iterations': 50}
+
+    equalized = histogram_equalize(test_iterations_data, 50)
+    assert np.allclose(equalized, [[0.25, 1.0, 1.0], [1.0, 1.0, 1.0]])
+
+    result = plugin.apply_coloring(test_fractal_data, test_common_fractal_params, default_algo_params, None)
+    assert result.shape == (2, 3, 4) and result.dtype == np.uint8
+    assert np.array_equal(result[1, 1, :3], [0, 0, 0]) # 集合内部は黒
+    assert np.array_equal(result[0, 0, :3], [63, 63, 63]) # 累積分布 0.25 -> 255 * 0.25
+    assert np.all(result[..., 3] == 255)
+    logger.log("HistogramEqualizationColoringPlugin のテストが正常に完了しました。", level="INFO")
@@ -1,127 +1,121 @@
+from functools import lru_cache
+
 import numpy as np
-from numba import jit
-import math
+from numba import guvectorize, jit, prange
 
 try:
     from plugins.base_coloring_plugin import ColoringAlgorithmPlugin
+    from plugins._coloring_kernels import smooth_color_pixel_jit
 except ImportError: # pragma: no cover
     # このプラグインファイルがプロジェクトのルートからではなく、
     # plugins/coloring/divergent ディレクトリから直接実行された場合など、
     # 相対インポートが失敗するケースのためのフォールバック。
     from plugins.base_coloring_plugin import ColoringAlgorithmPlugin
+    from plugins._coloring_kernels import smooth_color_pixel_jit
 
-# CustomLoggerをインポートするためのパス設定
-import sys
-from pathlib import Path
-_logger_path_finder = Path(__file__).resolve()
-# このファイルの場所 (plugins/coloring/divergent) からプロジェクトルート (jules_frac) を特定
-_project_root_for_logger = _logger_path_finder.parent.parent.parent
-if str(_project_root_for_logger) not in sys.path:
-    sys.path.insert(0, str(_project_root_for_logger))
-try:
-    from logger.custom_logger import CustomLogger
-    logger = CustomLogger()
-except ImportError: # pragma: no cover
-    # CustomLogger のインポートに失敗した場合のフォールバック (例: 環境設定の問題)
-    print("警告: smooth_coloring_plugin.py で CustomLogger をインポートできませんでした。標準のprintを使用します。")
-    class PrintLogger: # シンプルなフォールバックロガー
-        def log(self, message, level="INFO"): print(f"[{level}] {message}") # ログレベルとメッセージを出力
-    logger = PrintLogger()
-
-@jit(nopython=True, cache=False, fastmath=True) # Numba JITコンパイラを適用。キャッシュは一時的に無効 (ModuleNotFoundError回避のため)。fastmathを有効化。
-def _apply_smooth_coloring_jit(
-    iterations_array: np.ndarray,
-    last_z_mod_sq_array: np.ndarray,
-    max_iters: int,
-    escape_radius_sq: float, # 現在の平滑化計算式では直接使用されていませんが、将来の拡張や他の平滑化手法との一貫性のために引数として保持しています。
-    color_scale_factor: float,
-    color_map: np.ndarray # カラーマップデータ。形状は (N, 3) または (N, 4) で、各行がRGB値またはRGBA値 (uint8) を表します。
-) -> np.ndarray:
+from logger.custom_logger import CustomLogger # logger がプロジェクトルート/loggerにあると仮定
+
+logger = CustomLogger()
+
+
+def _make_smooth_coloring_kernel(parallel):
     """
-    反復回数と最終的な|Z|^2値に基づいてスムーズカラーリングを適用するJITコンパイル済み関数。
-    アルゴリズムは `iters + 1 - log(log(|Z|))/log(2)` に基づいています。
-
-    Args:
-        iterations_array (np.ndarray): 各点の反復回数を格納した配列。
-        last_z_mod_sq_array (np.ndarray): 各点の最終的な|Z|^2値を格納した配列。
-        max_iters (int): 最大反復回数。
-        escape_radius_sq (float): 発散とみなす半径の2乗 (この関数では直接使用されませんが、インターフェースの一貫性のために存在)。
-        color_scale_factor (float): 色の変化の速さを調整するスケールファクター。
-        color_map (np.ndarray): 色補間に使用するカラーマップ (形状: (N,3) または (N,4), dtype: uint8)。
-
-    Returns:
-        np.ndarray: RGBA形式のカラーリング済み画像データ。
+    スムーズカラーリングのカーネルを生成します。
+    各ピクセルは独立しており、各行は出力の自身の行にだけ書き込むため、並列版は行を prange で分担します。
+    parallel が False の場合は行を逐次処理します (出力タイルのワーカースレッドから呼ぶ場合に使用)。
     """
-    height, width = iterations_array.shape
-    output_image_rgba = np.empty((height, width, 4), dtype=np.uint8)
-    output_image_rgba[:, :, 3] = 255 # アルファチャンネルを完全に不透明に設定
-
-    num_colors_in_map = color_map.shape[0]
-    # 補間には少なくとも2色を確保してください。そうでない場合は黒にフォールバックします。
-    # これは理想的には、color_map_data の呼び出し側Pythonコードのロジックによって保証されるべきです。
-    if num_colors_in_map < 2: # カラーマップの色数が2未満の場合
-        output_image_rgba[:, :, 0:3] = 0 # RGBを黒に設定
-        return output_image_rgba
+    row_range = prange if parallel else range
+
+    @jit(nopython=True, parallel=parallel, nogil=True, cache=True, fastmath=True) # Numba JITコンパイラを適用。fastmathを有効化。出力タイルの並行処理のため GIL を解放。
+    def apply_smooth_coloring_kernel(
+        iterations_array: np.ndarray,
+        last_z_mod_sq_array: np.ndarray,
+        max_iters: int,
+        escape_radius_sq: float, # 現在の平滑化計算式では直接使用されていませんが、将来の拡張や他の平滑化手法との一貫性のために引数として保持しています。
+        color_scale_factor: float,
+        color_map: np.ndarray # カラーマップデータ。形状は (N, 3) または (N, 4) で、各行がRGB値またはRGBA値 (uint8) を表します。
+    ) -> np.ndarray:
+        """
+        反復回数と最終的な|Z|^2値に基づいてスムーズカラーリングを適用するJITコンパイル済み関数。
+        アルゴリズムは `iters + 1 - log(log(|Z|))/log(2)` に基づいています。
 
-    # RGBA対応: カラーマップの要素数を確認
-    color_channels = color_map.shape[1]
-    # 3要素（RGB）または4要素（RGBA）のみ対応
-    if color_channels not in [3, 4]:
-        output_image_rgba[:, :, 0:3] = 0 # RGBを黒に設定
+        Args:
+            iterations_array (np.ndarray): 各点の反復回数を格納した配列。
+            last_z_mod_sq_array (np.ndarray): 各点の最終的な|Z|^2値を格納した配列。
+            max_iters (int): 最大反復回数。
+            escape_radius_sq (float): 発散とみなす半径の2乗 (この関数では直接使用されませんが、インターフェースの一貫性のために存在)。
+            color_scale_factor (float): 色の変化の速さを調整するスケールファクター。
+            color_map (np.ndarray): 色補間に使用するカラーマップ (形状: (N,3) または (N,4), dtype: uint8)。
+
+        Returns:
+            np.ndarray: RGBA形式のカラーリング済み画像データ。
+        """
+        height, width = iterations_array.shape
+        output_image_rgba = np.empty((height, width, 4), dtype=np.uint8)
+
+        num_colors_in_map = color_map.shape[0]
+        # 補間には少なくとも2色を確保してください。そうでない場合は黒にフォールバックします。
+        # これは理想的には、color_map_data の呼び出し側Pythonコードのロジックによって保証されるべきです。
+        if num_colors_in_map < 2: # カラーマップの色数が2未満の場合
+            output_image_rgba[:, :, 0:3] = 0 # RGBを黒に設定
+            output_image_rgba[:, :, 3] = 255 # アルファチャンネルを完全に不透明に設定
+            return output_image_rgba
+
+        # RGBA対応: カラーマップの要素数を確認
+        color_channels = color_map.shape[1]
+        # 3要素（RGB）または4要素（RGBA）のみ対応
+        if color_channels not in [3, 4]:
+            output_image_rgba[:, :, 0:3] = 0 # RGBを黒に設定
+            output_image_rgba[:, :, 3] = 255 # アルファチャンネルを完全に不透明に設定
+            return output_image_rgba
+
+        for r_idx in row_range(height):
+            output_row = output_image_rgba[r_idx]
+            for c_idx in range(width):
+                # 1ピクセル分の計算は融合カーネルと共有する (plugins/_coloring_kernels.py)
+                smooth_color_pixel_jit(output_row, c_idx, iterations_array[r_idx, c_idx], last_z_mod_sq_array[r_idx, c_idx],
+                                       max_iters, color_scale_factor, color_map)
+                # アルファは RGB と同じパスで書く (画像全体を別に1回走査してアルファだけを埋めない)
+                output_row[c_idx, 3] = 255
         return output_image_rgba
 
-    log_2 = math.log(2.0) # log(2)を事前計算
-
-    for r_idx in range(height):
-        for c_idx in range(width):
-            iters = iterations_array[r_idx, c_idx]
-
-            if iters == max_iters: # 点が集合内に留まった場合
-                output_image_rgba[r_idx, c_idx, 0:3] = 0 # 黒色で描画
-            else:
-                mod_sq = last_z_mod_sq_array[r_idx, c_idx]
-                smooth_val: float
-                try:
-                    # 発散した点の場合、mod_sq は escape_radius_sq より大きくなるはずです (例: 半径2の場合 > 4.0)。
-                    # これは mod_sq > 0 を意味します。
-                    if mod_sq <= 0.0: # 通常、正しく発散した点では mod_sq > 0 となります。これはエッジケースの処理です。
-                        smooth_val = float(iters)
-                    else:
-                        modulus = math.sqrt(mod_sq) # |Z|
-                        # escape_radius > 1 (例: 2) の場合、modulus > 1 です。
-                        if modulus <= 1.0: # 通常、発散した点では modulus > escape_radius (>1) となります。これもエッジケースの処理です。
-                            # |Z| <= 1 の場合、log(|Z|) <= 0 となり、log(log(|Z|)) が問題になります。
-                            smooth_val = float(iters)
-                        else:
-                            log_of_modulus = math.log(modulus) # log(|Z|)
-                            # modulus > 1 なので、log_of_modulus > 0 です。
-                            # これにより、log(log_of_modulus) の項は数学的に有効になります。
-                            smooth_val = float(iters) + 1.0 - math.log(log_of_modulus) / log_2
-                except Exception: # pragma: no cover ; 予期しない数学的エラー (例: 極端な値による domain error) をキャッチ
-                    # 計算エラーが発生した場合は、単純な整数反復回数にフォールバックします
-                    smooth_val = float(iters)
-
-                # smooth_val をカラーインデックスにマッピングします
-                color_idx_float = smooth_val * color_scale_factor
-
-                # マップ内の2色間の線形補間
-                idx0_floor = math.floor(color_idx_float)
-                fraction = color_idx_float - idx0_floor # fraction は常に [0.0, 1.0) の範囲になります
-
-                # 配列アクセス用にインデックスが整数であることを確認し、floor の負の結果を剰余で正しく処理します
-                c1_idx = int(idx0_floor) % num_colors_in_map # 負のインデックスも正しく扱えるように剰余演算を使用
-                c2_idx = (int(idx0_floor) + 1) % num_colors_in_map
-
-                # RGBA対応: 4要素ならRGBのみ使う、3要素ならそのまま使う
-                r_val = color_map[c1_idx, 0] * (1.0 - fraction) + color_map[c2_idx, 0] * fraction
-                g_val = color_map[c1_idx, 1] * (1.0 - fraction) + color_map[c2_idx, 1] * fraction
-                b_val = color_map[c1_idx, 2] * (1.0 - fraction) + color_map[c2_idx, 2] * fraction
-
-                # uint8 に変換する前にカラー値を [0, 255] にクランプします
-                output_image_rgba[r_idx, c_idx, 0] = np.uint8(max(0.0, min(255.0, r_val))) # R
-                output_image_rgba[r_idx, c_idx, 1] = np.uint8(max(0.0, min(255.0, g_val)))
-                output_image_rgba[r_idx, c_idx, 2] = np.uint8(max(0.0, min(255.0, b_val)))
-    return output_image_rgba
+    return apply_smooth_coloring_kernel
+
+
+# カラーマップがない・不正な場合に使う256段階のグレースケール (呼び出しのたびに作り直さないよう共有するため読み取り専用)
+_DEFAULT_GRAYSCALE_MAP = np.repeat(np.arange(256, dtype=np.uint8)[:, np.newaxis], 3, axis=1)
+_DEFAULT_GRAYSCALE_MAP.setflags(write=False)
+
+
+# 行並列の有無 -> スムーズカラーリングカーネル
+_SMOOTH_COLORING_KERNELS = {
+    True: _make_smooth_coloring_kernel(True),
+    False: _make_smooth_coloring_kernel(False),
+}
+
+
+@lru_cache(maxsize=None)
+def _get_smooth_row_gufunc(parallel: bool):
+    """
+    1行分のスムーズカラーリングを行う gufunc (guvectorize) を返します。
+
+    反復回数と |Z|^2 の (H, W) 配列を渡すと、行の分配を NumPy ufunc 機構 (target='parallel' ではNumbaのスレッドプール) が受け持ち、
+    (H, W, C) の出力を確保して返します。C はカラーマップの列数のため、(N, 4) のカラーマップを渡してください。
+    画素ごとの計算は prange 版と同じ smooth_color_pixel_jit のため、結果は同一です。
+    型シグネチャを指定した時点でコンパイルされるため、モジュールの読み込み時ではなく最初に使うときに一度だけ生成します。
+    既定は prange 版で、共通パラメータの 'use_gufunc' が真の場合に使います (フラクタルプラグインと同じキー)。
+    """
+    @guvectorize(['void(int32[:], float64[:], int64, float64, uint8[:, :], uint8[:, :])'],
+                 '(n),(n),(),(),(m,c)->(n,c)',
+                 target='parallel' if parallel else 'cpu', nopython=True, fastmath=True, cache=True)
+    def smooth_coloring_gufunc(iterations_row, mod_sq_row, max_iters, color_scale_factor, color_map, out_row):
+        """スムーズカラーリングの1行を計算する gufunc。(H, W) の配列を渡すと H 行分を計算します。"""
+        for c_idx in range(iterations_row.shape[0]):
+            smooth_color_pixel_jit(out_row, c_idx, iterations_row[c_idx], mod_sq_row[c_idx],
+                                   max_iters, color_scale_factor, color_map)
+            out_row[c_idx, 3] = 255
+
+    return smooth_coloring_gufunc
 
 
 class SmoothColoringPlugin(ColoringAlgorithmPlugin):
@@ -135,6 +129,10 @@ class SmoothColoringPlugin(ColoringAlgorithmPlugin):
         """カラーリングアルゴリズムの名前を返します。"""
         return "スムーズカラー"
 
+    def warmup(self) -> None:
+        """4x4 のダミーデータで apply_coloring を実行し、Numba カーネルのJITコンパイル (またはキャッシュ読込) を済ませます。"""
+        self._warmup_apply_coloring()
+
     def get_parameters_definition(self) -> list:
         """このカラーリングアルゴリズムに固有の調整可能なパラメータのリストを返します。"""
         return [
@@ -144,7 +142,7 @@ class SmoothColoringPlugin(ColoringAlgorithmPlugin):
         ]
 
     def apply_coloring(self, fractal_data: dict, common_fractal_params: dict,
-                       algorithm_params: dict, color_map_data: list[tuple[int,int,int]] | None) -> np.ndarray:
+                       algorithm_params: dict, color_map_data: list[tuple[int,int,int]] | np.ndarray | None) -> np.ndarray:
         """
         フラクタルデータにスムーズカラーリングを適用します。
 
@@ -155,7 +153,7 @@ class SmoothColoringPlugin(ColoringAlgorithmPlugin):
                                         'max_iterations', 'escape_radius', 'image_height_px', 'image_width_px' が期待されます。
             algorithm_params (dict): このカラーリングアルゴリズム固有のパラメータ。
                                    'color_scale' が期待されます。
-            color_map_data (list[tuple[int,int,int]] | None): 使用するカラーマップのリスト。Noneまたは色数が少ない場合はデフォルトを使用。
+            color_map_data (list[tuple[int,int,int]] | np.ndarray | None): 使用するカラーマップ (リストまたは (N,3)/(N,4) uint8 配列)。Noneまたは色数が少ない場合はデフォルトを使用。
 
         Returns:
             np.ndarray: RGBA形式のカラーリング済み画像データ。
@@ -195,24 +193,27 @@ class SmoothColoringPlugin(ColoringAlgorithmPlugin):
             fallback_img[:,:,3] = 255 # アルファチャンネルを不透明に設定
             return fallback_img
 
+        # エンジンが正規化済みの C連続配列ならコピーしない (直接呼ばれた場合もカーネルを同じ型で使うため)
+        iterations = np.ascontiguousarray(iterations, dtype=np.int32)
+        last_z_mod_sq = np.ascontiguousarray(last_z_mod_sq, dtype=np.float64)
+
         max_iters = common_fractal_params.get('max_iterations', 100)
         escape_radius = common_fractal_params.get('escape_radius', 2.0)
         escape_radius_sq = escape_radius * escape_radius # JIT関数に渡されます
 
         color_scale_from_plugin = algorithm_params.get('color_scale', 1.0)
-
-        if not color_map_data or len(color_map_data) < 2: # 補間には少なくとも2色が必要です
-            # logger.log("SmoothColoringPlugin 警告: 提供されたカラーマップの色数が不足しているため (2色未満)、デフォルトのグレースケールマップを使用します。", level="WARNING")
-            # カラーマップが提供されていないか、色数が補間に不足している場合は、単純なグレースケールマップをデフォルトとして使用します。
-            color_map_np = np.array([(i,i,i) for i in range(256)], dtype=np.uint8)
-        else:
-            color_map_np = np.array(color_map_data, dtype=np.uint8)
-            # RGBA対応: 4要素ならそのまま、3要素ならそのまま使用
-            if color_map_np.shape[1] not in [3, 4]:
-                logger.log(f"SmoothColoringPlugin 警告: カラーマップの形状が不正です {color_map_np.shape}。デフォルトのグレースケールマップを使用します。", level="WARNING")
-                color_map_np = np.array([(i,i,i) for i in range(256)], dtype=np.uint8)
-
-        colored_image = _apply_smooth_coloring_jit(
+        color_map_np = self._prepare_color_map(color_map_data)
+
+        parallel = bool(common_fractal_params.get('parallel_kernels', True))
+        if common_fractal_params.get('use_gufunc', False):
+            if color_map_np.shape[1] == 3: # gufunc は出力の列数をカラーマップから決めるため、アルファ列を加える
+                color_map_np = np.concatenate([color_map_np, np.full((color_map_np.shape[0], 1), 255, dtype=np.uint8)], axis=1)
+            return _get_smooth_row_gufunc(parallel)(iterations, last_z_mod_sq, int(max_iters),
+                                                    float(color_scale_from_plugin), color_map_np)
+
+        # 行並列 (prange) 版が既定。出力タイルのワーカースレッドからは逐次版を使う ('parallel_kernels': False)
+        kernel = _SMOOTH_COLORING_KERNELS[parallel]
+        colored_image = kernel(
             iterations, last_z_mod_sq, max_iters, escape_radius_sq,
             color_scale_from_plugin,
             color_map_np
@@ -220,6 +221,26 @@ class SmoothColoringPlugin(ColoringAlgorithmPlugin):
 
         return colored_image
 
+    def get_fused_coloring(self, algorithm_params: dict, color_map_data) -> tuple | None:
+        """
+        マンデルブロ集合の計算と同じパスで色付けするための指定を返します。
+        融合カーネルは apply_coloring と同じ画素単位の処理 (smooth_color_pixel_jit) を使うため、結果は同一です。
+        """
+        return ('smooth', float(algorithm_params.get('color_scale', 1.0)), self._prepare_color_map(color_map_data))
+
+    @staticmethod
+    def _prepare_color_map(color_map_data) -> np.ndarray:
+        """カラーマップを (N, 3) / (N, 4) の uint8 配列にします。2色未満または形状が不正な場合はグレースケールを返します。"""
+        if color_map_data is None or len(color_map_data) < 2: # 補間には少なくとも2色が必要です
+            # カラーマップが提供されていないか、色数が補間に不足している場合は、単純なグレースケールマップをデフォルトとして使用します。
+            return _DEFAULT_GRAYSCALE_MAP
+        color_map_np = np.ascontiguousarray(color_map_data, dtype=np.uint8) # エンジンのLUT (C連続 ndarray) はコピーせずに使う
+        # RGBA対応: 4要素ならそのまま、3要素ならそのまま使用
+        if color_map_np.shape[1] not in [3, 4]:
+            logger.log(f"SmoothColoringPlugin 警告: カラーマップの形状が不正です {color_map_np.shape}。デフォルトのグレースケールマップを使用します。", level="WARNING")
+            return _DEFAULT_GRAYSCALE_MAP
+        return color_map_np
+
 if __name__ == '__main__':
     logger.log("SmoothColoringPlugin のテストを開始します...", level="INFO")
     plugin = SmoothColoringPlugin()
@@ -9,108 +9,122 @@ except ImportError:
     logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
     CustomLogger = type("CustomLogger", (), {"log": lambda self, msg, level="INFO": logging.info(msg) if level == "INFO" else logging.warning(msg) if level == "WARNING" else logging.error(msg)})()
 
-from numba import jit
+from numba import jit, prange
+import math
 import matplotlib.pyplot as plt
 
 logger = CustomLogger()
 
-@jit(nopython=True)
-def _apply_final_z_abs_coloring_jit(
-    iterations: np.ndarray,
-    last_zn_values: np.ndarray,
-    max_iterations: int,
-    escape_radius: float,
-    gamma: float,
-    img_array_rgb: np.ndarray,
-    color_map_array: np.ndarray | None,
-    use_color_map: bool,
-    magnitude_offset: float,
-    magnitude_scale: float
-) -> None:
-    """最終Z値の絶対値に基づいて色を付けるJITコンパイル済み関数。
-
-    非発散点に対して、最終的なZ値の絶対値を正規化し、ガンマ補正を適用した後、
-    グレースケールまたは指定されたカラーマップに基づいて色を決定します。
-
-    Args:
-        iterations (np.ndarray): 各点の反復回数を格納した配列。
-        last_zn_values (np.ndarray): 各点の最終Z値を格納した複素数型配列。
-        max_iterations (int): 最大反復回数。
-        escape_radius (float): 発散半径。正規化に使用されます。
-        gamma (float): ガンマ補正値。
-        img_array_rgb (np.ndarray): 色を書き込む先のRGB画像配列 (高さx幅x3)。
-        color_map_array (np.ndarray | None): カラーマップとして使用するNumPy配列 (Nx3)。Noneの場合はグレースケール。
-        use_color_map (bool): カラーマップを使用するかどうかのフラグ。
-        magnitude_offset (float): Zの絶対値に加算するオフセット値。
-        magnitude_scale (float): Zの絶対値のスケールを調整する値。
+def _make_final_z_abs_coloring_kernel(parallel):
     """
-    height, width = iterations.shape
-
-    for r_idx in range(height):
-        for c_idx in range(width):
-            if iterations[r_idx, c_idx] == max_iterations:  # 非発散点
-                final_z = last_zn_values[r_idx, c_idx]
-                abs_z = np.abs(final_z)
-
-                # オフセットとスケールを適用
-                abs_z = (abs_z + magnitude_offset) * magnitude_scale
-
-                # escape_radius を上限として [0, 1] に正規化
-                norm_val = min(max(abs_z / escape_radius, 0.0), 1.0)
-
-                # ガンマ補正
-                if norm_val > 0:
-                    corrected_val = norm_val ** (1.0 / gamma)
-                else:
-                    corrected_val = 0.0
-
-                if not use_color_map:  # グレースケール
-                    gray_val = int(corrected_val * 255)
-                    gray_val = max(0, min(gray_val, 255))
-                    img_array_rgb[r_idx, c_idx, 0] = gray_val
-                    img_array_rgb[r_idx, c_idx, 1] = gray_val
-                    img_array_rgb[r_idx, c_idx, 2] = gray_val
-                else:  # カラーマップを使用
-                    if color_map_array is not None:
-                        num_colors = color_map_array.shape[0]
-                        if num_colors > 0:
-                            # 浮動小数点インデックスを計算
-                            float_idx = corrected_val * (num_colors - 1)
-                            float_idx = max(0.0, min(float_idx, num_colors - 1))
-
-                            # 線形補間のためのインデックスと重みを計算
-                            idx1 = int(float_idx)
-                            idx2 = min(idx1 + 1, num_colors - 1)
-
-                            # 補間係数 (小数部分)
-                            interp_factor = float_idx - idx1
-
-                            # 2つの色を取得
-                            c1 = color_map_array[idx1]
-                            c2 = color_map_array[idx2]
-                            # RGBA対応: 4要素ならRGBのみ使う
-                            if c1.shape[0] == 4:
-                                c1_r, c1_g, c1_b = c1[0], c1[1], c1[2]
-                                c2_r, c2_g, c2_b = c2[0], c2[1], c2[2]
-                            else:
-                                c1_r, c1_g, c1_b = c1[0], c1[1], c1[2]
-                                c2_r, c2_g, c2_b = c2[0], c2[1], c2[2]
-
-                            # 線形補間
-                            r = c1_r * (1.0 - interp_factor) + c2_r * interp_factor
-                            g = c1_g * (1.0 - interp_factor) + c2_g * interp_factor
-                            b = c1_b * (1.0 - interp_factor) + c2_b * interp_factor
-
-                            # 結果を代入
-                            img_array_rgb[r_idx, c_idx, 0] = int(r)
-                            img_array_rgb[r_idx, c_idx, 1] = int(g)
-                            img_array_rgb[r_idx, c_idx, 2] = int(b)
-                        else: # カラーマップが空の場合 (フォールバック)
-                            img_array_rgb[r_idx, c_idx, 0] = 0
-                            img_array_rgb[r_idx, c_idx, 1] = 0
-                            img_array_rgb[r_idx, c_idx, 2] = 0
-                    # else: カラーマップがNoneだがuse_color_mapがTrue (設計上発生しにくい) -> 黒のまま
-            # else: 発散した点などはデフォルトの色（黒）のまま
+    最終Z値の絶対値によるカラーリングのカーネルを生成します。
+    parallel が False の場合は行を逐次処理します (出力タイルのワーカースレッドから呼ぶ場合に使用)。
+    """
+    row_range = prange if parallel else range
+
+    @jit(nopython=True, parallel=parallel, nogil=True, cache=True, fastmath=True, boundscheck=False)
+    def apply_final_z_abs_coloring_kernel(
+        iterations: np.ndarray,
+        last_z_real: np.ndarray,
+        last_z_imag: np.ndarray,
+        max_iterations: int,
+        escape_radius: float,
+        gamma: float,
+        img_array_rgb: np.ndarray,
+        lut_base: np.ndarray,
+        lut_delta: np.ndarray,
+        use_color_map: bool,
+        magnitude_offset: float,
+        magnitude_scale: float
+    ) -> None:
+        """最終Z値の絶対値に基づいて色を付けるJITコンパイル済み関数。
+
+        非発散点に対して、最終的なZ値の絶対値を正規化し、ガンマ補正を適用した後、
+        グレースケールまたは指定されたカラーマップに基づいて色を決定します。
+        parallel 版は行単位で並列化 (prange) しています。カラーマップの補間は分岐なしで
+        `lut_base[idx] + lut_delta[idx] * frac` (2回の参照と1回の積和) で行います。
+
+        Args:
+            iterations (np.ndarray): 各点の反復回数を格納した配列。
+            last_z_real (np.ndarray): 各点の最終Z値の実部を格納した配列。
+            last_z_imag (np.ndarray): 各点の最終Z値の虚部を格納した配列。
+            max_iterations (int): 最大反復回数。
+            escape_radius (float): 発散半径。正規化に使用されます。
+            gamma (float): ガンマ補正値。
+            img_array_rgb (np.ndarray): 色を書き込む先のRGB画像配列 (高さx幅x3)。
+            lut_base (np.ndarray): カラーマップのRGB値 (Nx3, float64)。
+            lut_delta (np.ndarray): 隣り合う色の差分 `lut_base[i+1] - lut_base[i]` (Nx3, float64, 最終行は0)。
+            use_color_map (bool): カラーマップを使用するかどうかのフラグ。Falseの場合はグレースケール。
+            magnitude_offset (float): Zの絶対値に加算するオフセット値。
+            magnitude_scale (float): Zの絶対値のスケールを調整する値。
+        """
+        height, width = iterations.shape
+        num_colors = lut_base.shape[0]
+        max_float_idx = float(num_colors - 1)
+        last_idx = max(num_colors - 2, 0) # 補間の始点として使える最大のインデックス
+        inv_gamma = 1.0 / gamma
+
+        for r_idx in row_range(height):
+            for c_idx in range(width):
+                if iterations[r_idx, c_idx] == max_iterations:  # 非発散点
+                    zr = last_z_real[r_idx, c_idx]
+                    zi = last_z_imag[r_idx, c_idx]
+                    abs_z = math.sqrt(zr * zr + zi * zi)
+
+                    # オフセットとスケールを適用
+                    abs_z = (abs_z + magnitude_offset) * magnitude_scale
+
+                    # escape_radius を上限として [0, 1] に正規化
+                    norm_val = min(max(abs_z / escape_radius, 0.0), 1.0)
+
+                    # ガンマ補正
+                    if norm_val > 0:
+                        corrected_val = norm_val ** inv_gamma
+                    else:
+                        corrected_val = 0.0
+
+                    if not use_color_map:  # グレースケール
+                        gray_val = int(corrected_val * 255)
+                        gray_val = max(0, min(gray_val, 255))
+                        img_array_rgb[r_idx, c_idx, 0] = gray_val
+                        img_array_rgb[r_idx, c_idx, 1] = gray_val
+                        img_array_rgb[r_idx, c_idx, 2] = gray_val
+                    else:  # カラーマップを使用
+                        # corrected_val は [0, 1] なので float_idx は [0, N-1] に収まる。
+                        # 始点を [0, N-2] に丸めると末尾は interp_factor=1 で最後の色になり、終点の範囲チェックが不要になる
+                        float_idx = corrected_val * max_float_idx
+                        idx1 = min(int(float_idx), last_idx)
+                        interp_factor = float_idx - idx1
+
+                        img_array_rgb[r_idx, c_idx, 0] = int(lut_base[idx1, 0] + lut_delta[idx1, 0] * interp_factor)
+                        img_array_rgb[r_idx, c_idx, 1] = int(lut_base[idx1, 1] + lut_delta[idx1, 1] * interp_factor)
+                        img_array_rgb[r_idx, c_idx, 2] = int(lut_base[idx1, 2] + lut_delta[idx1, 2] * interp_factor)
+                # else: 発散した点などはデフォルトの色（黒）のまま
+
+    return apply_final_z_abs_coloring_kernel
+
+
+# 行並列の有無 -> 最終Z値の絶対値によるカラーリングのカーネル
+_FINAL_Z_ABS_COLORING_KERNELS = {
+    True: _make_final_z_abs_coloring_kernel(True),
+    False: _make_final_z_abs_coloring_kernel(False),
+}
+
+
+def _build_interpolation_lut(color_map_np: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    カラーマップ (Nx3 または Nx4, uint8) から、分岐なし線形補間用の (基準色, 差分) のテーブルを作成します。
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (lut_base, lut_delta)。どちらも (N, 3) の float64。
+    """
+    lut_base = color_map_np[:, :3].astype(np.float64)
+    lut_delta = np.zeros_like(lut_base)
+    lut_delta[:-1] = lut_base[1:] - lut_base[:-1]
+    return lut_base, lut_delta
+
+
+_EMPTY_LUT = np.zeros((1, 3), dtype=np.float64) # カラーマップを使わない場合にカーネルへ渡すダミー
 
 
 class FinalZMagnitudeColoringPlugin(ColoringAlgorithmPlugin):
@@ -135,6 +149,7 @@ class FinalZMagnitudeColoringPlugin(ColoringAlgorithmPlugin):
     必要なデータ:
     - `iterations`: 各ピクセルの反復回数を格納したNumpy配列。
     - `last_zn_values`: 各ピクセルの最終Z値を格納した複素数型Numpy配列。
+      (`last_re` / `last_im` のSoAプレーンが存在する場合はそちらを優先して使用します)
     - `max_iterations`: 計算時の最大反復回数。
     - `escape_radius`: 計算時の発散半径。
 
@@ -160,6 +175,10 @@ class FinalZMagnitudeColoringPlugin(ColoringAlgorithmPlugin):
         """このプラグインが対象とする領域タイプ（非発散）を返します。"""
         return "non_divergent"
 
+    def warmup(self) -> None:
+        """4x4 のダミーデータで apply_coloring を実行し、Numba カーネルのJITコンパイル (またはキャッシュ読込) を済ませます。"""
+        self._warmup_apply_coloring()
+
     def get_parameters_definition(self) -> list:
         """このカラーリングアルゴリズムのパラメータ定義リストを返します。"""
         return [
@@ -208,7 +227,7 @@ class FinalZMagnitudeColoringPlugin(ColoringAlgorithmPlugin):
         fractal_data: dict,
         common_fractal_params: dict,
         algorithm_params: dict,
-        color_map_data: list[tuple[int, int, int]] | None
+        color_map_data: list[tuple[int, int, int]] | np.ndarray | None
     ) -> np.ndarray:
         gamma = algorithm_params.get("gamma", 1.0)
         if gamma <= 0:
@@ -226,8 +245,19 @@ class FinalZMagnitudeColoringPlugin(ColoringAlgorithmPlugin):
         max_iterations = common_fractal_params.get('max_iterations', 100)
         escape_radius = common_fractal_params.get('escape_radius', 2.0)
 
-        if last_zn_values is None or iterations is None:
-            logger.error("fractal_data に 'last_zn_values' または 'iterations' データが見つかりません。")
+        # エンジンが用意したSoAプレーン (float32) を優先し、無ければフラクタルプラグインの実部/虚部プレーン (float64)、
+        # それも無ければ複素数配列から実部/虚部のビューを取る
+        last_z_real = fractal_data.get('last_re')
+        last_z_imag = fractal_data.get('last_im')
+        if last_z_real is None or last_z_imag is None:
+            last_z_real = fractal_data.get('last_z_real')
+            last_z_imag = fractal_data.get('last_z_imag')
+        if (last_z_real is None or last_z_imag is None) and last_zn_values is not None:
+            last_z_real = last_zn_values.real
+            last_z_imag = last_zn_values.imag
+
+        if last_z_real is None or last_z_imag is None or iterations is None:
+            logger.error("fractal_data に最後のZ ('last_z_real'/'last_z_imag' または 'last_zn_values') または 'iterations' データが見つかりません。")
             return np.zeros((100, 100, 4), dtype=np.float32)
 
         height, width = iterations.shape
@@ -238,24 +268,32 @@ class FinalZMagnitudeColoringPlugin(ColoringAlgorithmPlugin):
         # カラーマップの準備
         use_color_map = False
         color_map_np = None
-        if color_map_data and len(color_map_data) > 0:
+        if color_map_data is not None and len(color_map_data) > 0:
             try:
-                color_map_np = np.array(color_map_data, dtype=np.uint8)
+                color_map_np = np.asarray(color_map_data, dtype=np.uint8) # エンジンのLUT (ndarray) はコピーせずに使う
                 # RGBA(4要素)にも対応: shape[1]が3または4ならOK
                 if color_map_np.ndim == 2 and (color_map_np.shape[1] == 3 or color_map_np.shape[1] == 4):
                     use_color_map = True
             except Exception as e:
                 logger.log(f"カラーマップの変換中にエラーが発生しました: {e}", level="WARNING")
 
-        # JITコンパイル済み関数を呼び出し
-        _apply_final_z_abs_coloring_jit(
+        if use_color_map:
+            lut_base, lut_delta = _build_interpolation_lut(color_map_np)
+        else:
+            lut_base, lut_delta = _EMPTY_LUT, _EMPTY_LUT
+
+        # 行並列 (prange) 版が既定。出力タイルのワーカースレッドからは逐次版を使う ('parallel_kernels': False)
+        kernel = _FINAL_Z_ABS_COLORING_KERNELS[bool(common_fractal_params.get('parallel_kernels', True))]
+        kernel(
             iterations,
-            last_zn_values,
+            last_z_real,
+            last_z_imag,
             max_iterations,
             escape_radius,
             gamma,
             img_array_rgb,
-            color_map_np,
+            lut_base,
+            lut_delta,
             use_color_map,
             magnitude_offset,
             magnitude_scale
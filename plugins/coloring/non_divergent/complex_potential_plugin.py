@@ -10,13 +10,15 @@ except ImportError:
     CustomLogger = type("CustomLogger", (), {"log": lambda self, msg, level="INFO": logging.info(msg) if level == "INFO" else logging.warning(msg) if level == "WARNING" else logging.error(msg)})()
 
 from numba import jit
+import math
 
 logger = CustomLogger()
 
 @jit(nopython=True)
 def _calculate_potentials_jit(
     iterations: np.ndarray,
-    last_zn_values: np.ndarray, # 複素数の最終Z値
+    last_z_real: np.ndarray, # 最終Z値の実部 (SoA)
+    last_z_imag: np.ndarray, # 最終Z値の虚部 (SoA)
     max_iterations: int
 ) -> tuple[np.ndarray, float, float, bool]:
     """
@@ -25,7 +27,8 @@ def _calculate_potentials_jit(
 
     Args:
         iterations (np.ndarray): 各点の反復回数を格納した配列。
-        last_zn_values (np.ndarray): 各点の最終的な複素数Zの値を格納した配列。
+        last_z_real (np.ndarray): 各点の最終的なZの実部を格納した配列。
+        last_z_imag (np.ndarray): 各点の最終的なZの虚部を格納した配列。
         max_iterations (int): 最大反復回数。
 
     Returns:
@@ -40,7 +43,9 @@ def _calculate_potentials_jit(
     for r in range(height):
         for c in range(width):
             if iterations[r, c] == max_iterations:
-                abs_zn = np.abs(last_zn_values[r, c])
+                zr = last_z_real[r, c]
+                zi = last_z_imag[r, c]
+                abs_zn = math.sqrt(zr * zr + zi * zi)
                 if abs_zn > 1e-9: # log(0) を避けるための微小値チェック
                     potential_val = np.log(abs_zn)
                     potentials[r, c] = potential_val
@@ -164,6 +169,15 @@ class ComplexPotentialColoringPlugin(ColoringAlgorithmPlugin):
         """このカラーリングアルゴリズムが対象とする領域の種類 ("divergent" または "non_divergent") を返します。"""
         return "non_divergent"
 
+    @property
+    def supports_tiling(self) -> bool:
+        """ポテンシャルを画像全体の最小値・最大値で正規化するため、タイル分割には対応しません。"""
+        return False
+
+    def warmup(self) -> None:
+        """4x4 のダミーデータで apply_coloring を実行し、Numba カーネルのJITコンパイル (またはキャッシュ読込) を済ませます。"""
+        self._warmup_apply_coloring()
+
     def get_parameters_definition(self) -> list:
         """このカラーリングアルゴリズムに固有の調整可能なパラメータのリストを返します。"""
         return [
@@ -198,7 +212,7 @@ class ComplexPotentialColoringPlugin(ColoringAlgorithmPlugin):
 
     def apply_coloring(
         self, fractal_data: dict, common_fractal_params: dict,
-        algorithm_params: dict, color_map_data: list[tuple[int, int, int]] | None
+        algorithm_params: dict, color_map_data: list[tuple[int, int, int]] | np.ndarray | None
     ) -> np.ndarray:
         """
         フラクタルデータに複素ポテンシャルカラーリングを適用します。
@@ -207,19 +221,29 @@ class ComplexPotentialColoringPlugin(ColoringAlgorithmPlugin):
             fractal_data (dict): フラクタル計算結果。'iterations' と 'last_zn_values' が必要です。
             common_fractal_params (dict): フラクタル計算の共通パラメータ。'max_iterations', 'height', 'width' が使用されます。
             algorithm_params (dict): このアルゴリズム固有のパラメータ (現在は未使用)。
-            color_map_data (list[tuple[int, int, int]] | None): 使用するカラーマップ。Noneの場合はグレースケール。
+            color_map_data (list[tuple[int, int, int]] | np.ndarray | None): 使用するカラーマップ (リストまたは uint8 配列)。Noneの場合はグレースケール。
 
         Returns:
             np.ndarray: RGBA形式のカラーリング済み画像データ。
         """
         iterations = fractal_data.get('iterations')
         last_zn_values = fractal_data.get('last_zn_values')
+        # エンジンが用意したSoAプレーン (float32) を優先し、無ければフラクタルプラグインの実部/虚部プレーン (float64)、
+        # それも無ければ複素数配列から実部/虚部のビューを取る
+        last_z_real = fractal_data.get('last_re')
+        last_z_imag = fractal_data.get('last_im')
+        if last_z_real is None or last_z_imag is None:
+            last_z_real = fractal_data.get('last_z_real')
+            last_z_imag = fractal_data.get('last_z_imag')
+        if (last_z_real is None or last_z_imag is None) and last_zn_values is not None:
+            last_z_real = last_zn_values.real
+            last_z_imag = last_zn_values.imag
 
         height_param = common_fractal_params.get('height')
         width_param = common_fractal_params.get('width')
 
-        if iterations is None or last_zn_values is None:
-            logger.log("apply_coloring: 必須データ 'iterations' または 'last_zn_values' が見つかりません。", level="ERROR")
+        if iterations is None or last_z_real is None or last_z_imag is None:
+            logger.log("apply_coloring: 必須データ 'iterations' または最後のZ ('last_z_real'/'last_z_imag' または 'last_zn_values') が見つかりません。", level="ERROR")
             h = height_param if height_param is not None else 100
             w = width_param if width_param is not None else 100
             img = np.zeros((h, w, 4), dtype=np.uint8)
@@ -231,9 +255,9 @@ class ComplexPotentialColoringPlugin(ColoringAlgorithmPlugin):
 
         height, width = iterations.shape
         if (height_param is not None and width_param is not None and \
-            ((height_param, width_param) != (height, width) or last_zn_values.shape != (height, width))):
-            logger.log(f"apply_coloring: 形状の不一致またはlast_zn_valuesの形状エラー。反復回数配列: {iterations.shape}, 最終Z値配列: {last_zn_values.shape}, パラメータ指定サイズ: ({height_param},{width_param})。反復回数配列の形状を使用します。", level="WARNING")
-            if last_zn_values.shape != (height,width): # 形状が一致しない場合はエラー処理を試みる
+            ((height_param, width_param) != (height, width) or last_z_real.shape != (height, width))):
+            logger.log(f"apply_coloring: 形状の不一致またはlast_zn_valuesの形状エラー。反復回数配列: {iterations.shape}, 最終Z値配列: {last_z_real.shape}, パラメータ指定サイズ: ({height_param},{width_param})。反復回数配列の形状を使用します。", level="WARNING")
+            if last_z_real.shape != (height,width): # 形状が一致しない場合はエラー処理を試みる
                  logger.log("apply_coloring: last_zn_values の形状が iterations の形状と一致しません。エラー画像 (赤) を返します。", level="ERROR")
                  err_img = np.zeros((height, width, 4), dtype=np.uint8); err_img[:,:,0]=255; err_img[:,:,3]=255; return err_img # 赤いエラー画像
 
@@ -244,7 +268,7 @@ class ComplexPotentialColoringPlugin(ColoringAlgorithmPlugin):
         img_array_rgb = img_array[:,:,:3]
 
         potentials, min_p_raw, max_p_raw, has_valid = _calculate_potentials_jit(
-            iterations, last_zn_values, max_iterations
+            iterations, last_z_real, last_z_imag, max_iterations
         )
 
         if not has_valid:
@@ -255,11 +279,7 @@ class ComplexPotentialColoringPlugin(ColoringAlgorithmPlugin):
 #            except Exception as e:
 #                logger.log(f"[DEBUG] デバッグ出力中に例外: {e}", level="DEBUG")
             logger.log("apply_coloring: 有効なポテンシャル値が見つかりませんでした。集合外のデフォルト色で出力します。", level="WARNING")
-            for r_idx in range(height):
-                for c_idx in range(width):
-                    img_array_rgb[r_idx, c_idx, 0] = self.DEFAULT_OUTSIDE_COLOR[0]
-                    img_array_rgb[r_idx, c_idx, 1] = self.DEFAULT_OUTSIDE_COLOR[1]
-                    img_array_rgb[r_idx, c_idx, 2] = self.DEFAULT_OUTSIDE_COLOR[2]
+            img_array_rgb[:, :] = self.DEFAULT_OUTSIDE_COLOR # 画素ごとのPythonループではなく一括代入
             return img_array
 
         min_potential_for_norm = min_p_raw
@@ -288,9 +308,9 @@ class ComplexPotentialColoringPlugin(ColoringAlgorithmPlugin):
         # カラーマップの準備
         use_color_map = False
         color_map_np = None
-        if color_map_data and len(color_map_data) > 0:
+        if color_map_data is not None and len(color_map_data) > 0:
             try:
-                color_map_np = np.array(color_map_data, dtype=np.uint8)
+                color_map_np = np.asarray(color_map_data, dtype=np.uint8) # エンジンのLUT (ndarray) はコピーせずに使う
                 # RGBA(4要素)にも対応: shape[1]が3または4ならOK
                 if color_map_np.ndim == 2 and (color_map_np.shape[1] == 3 or color_map_np.shape[1] == 4):
                     use_color_map = True
@@ -1,68 +1,10 @@
 import numpy as np
-from numba import jit, prange
 from plugins.base_fractal_plugin import FractalPlugin
+from plugins._fractal_kernels import compute_mandelbrot_grid, compute_mandelbrot_smooth_grid, escape_time_result
 from logger.custom_logger import CustomLogger # logger がプロジェクトルート/loggerにあると仮定
 
 logger = CustomLogger()
 
-@jit(nopython=True)
-def _calculate_mandelbrot_point_jit(c_real, c_imag, max_iters, escape_radius_sq, power):
-    """
-    マンデルブロ集合（マルチブロ）の単一の点に対する計算をJITコンパイルで実行します。
-    power: zの次数
-    """
-    z_real = 0.0
-    z_imag = 0.0
-    for i in range(max_iters):
-        # 複素数z = z_real + i*z_imag のpower乗を計算
-        r = (z_real**2 + z_imag**2) ** (power / 2)
-        theta = np.arctan2(z_imag, z_real) * power
-        z_real_pow = r * np.cos(theta)
-        z_imag_pow = r * np.sin(theta)
-        z_real_new = z_real_pow + c_real
-        z_imag_new = z_imag_pow + c_imag
-        mod_sq = z_real_new * z_real_new + z_imag_new * z_imag_new
-        if mod_sq > escape_radius_sq:
-            return i, z_real_new, z_imag_new
-        z_real = z_real_new
-        z_imag = z_imag_new
-    return max_iters, z_real, z_imag
-
-@jit(nopython=True, parallel=True)
-def _compute_mandelbrot_grid_jit(width_px, height_px, min_x, max_x, min_y, max_y, max_iters, escape_radius_sq, power):
-    """
-    指定されたグリッドのマンデルブロ集合をJITコンパイルで並列計算します。
-
-    Args:
-        width_px (int): 画像の幅（ピクセル）。
-        height_px (int): 画像の高さ（ピクセル）。
-        min_x (float): 複素平面のx軸の最小値。
-        max_x (float): 複素平面のx軸の最大値。
-        min_y (float): 複素平面のy軸の最小値。
-        max_y (float): 複素平面のy軸の最大値。
-        max_iters (int): 最大反復回数。
-        escape_radius_sq (float): 発散とみなすための半径の2乗。
-
-    Returns:
-        tuple[np.ndarray, np.ndarray, np.ndarray]: (反復回数の配列, 最後のzの実数部の配列, 最後のzの虚数部の配列)。
-    """
-    iter_result = np.empty((height_px, width_px), dtype=np.int32)
-    last_z_real_result = np.empty((height_px, width_px), dtype=np.float64)
-    last_z_imag_result = np.empty((height_px, width_px), dtype=np.float64)
-
-    pixel_width_complex = (max_x - min_x) / width_px
-    pixel_height_complex = (max_y - min_y) / height_px
-
-    for y_idx in prange(height_px): # prangeを使用して並列化を明示
-        c_imag = min_y + y_idx * pixel_height_complex
-        for x_idx in range(width_px):
-            c_real = min_x + x_idx * pixel_width_complex
-            iter_val, last_zr, last_zi = _calculate_mandelbrot_point_jit(c_real, c_imag, max_iters, escape_radius_sq, power)
-            iter_result[y_idx, x_idx] = iter_val
-            last_z_real_result[y_idx, x_idx] = last_zr
-            last_z_imag_result[y_idx, x_idx] = last_zi
-    return iter_result, last_z_real_result, last_z_imag_result
-
 
 class MandelbrotPlugin(FractalPlugin):
     """マンデルブロ集合を計算するためのフラクタルプラグイン。"""
@@ -92,6 +34,21 @@ class MandelbrotPlugin(FractalPlugin):
             'width': 3.0,
         }
 
+    def warmup(self) -> None:
+        """
+        4x4 のダミー格子で共有カーネルを一度呼び出し、JITコンパイル (またはキャッシュ読込) を済ませます。
+        プレビューが使う行並列版に加え、高解像度出力が使う組み合わせ (タイルごとの逐次版、浅いズームでの単精度版) と、
+        スムーズカラーとの融合カーネル (プレビュー専用のため行並列版のみ) を用意します。
+        """
+        # 融合カーネルに実際に渡されるのは読み取り専用の LUT (Numba は別の特殊化としてコンパイルする) なので、同じ型で用意する
+        color_map = np.zeros((2, 4), dtype=np.uint8)
+        color_map.setflags(write=False)
+        for precision in ('f64', 'f32'):
+            for parallel in (True, False):
+                compute_mandelbrot_grid(-2.0, 1.0, -1.0, 1.0, 4, 4, 2, 4.0, 2, precision=precision, parallel=parallel)
+            compute_mandelbrot_smooth_grid(-2.0, 1.0, -1.0, 1.0, 4, 4, 2, 4.0, 2, 1.0, color_map,
+                                           precision=precision, parallel=True)
+
     def compute_fractal(self, common_params: dict, plugin_params: dict, image_width_px: int, image_height_px: int) -> dict:
         """
         指定されたパラメータに基づいてマンデルブロ集合を計算します。
@@ -103,7 +60,8 @@ class MandelbrotPlugin(FractalPlugin):
             image_height_px (int): 生成する画像の高さ（ピクセル）。
 
         Returns:
-            dict: 計算結果。'iterations', 'last_zn_values', 'last_z_modulus_sq', 'is_diverged' を含みます。
+            dict: 計算結果。'iterations', 'last_z_real', 'last_z_imag', 'last_z_modulus_sq', 'is_diverged' を含みます。
+                  共通パラメータ 'fused_coloring' で融合カラーリングが指定された場合は 'fused_rgba' も含みます。
         """
         center_real = common_params['center_real']
         center_imag = common_params['center_imag']
@@ -123,24 +81,46 @@ class MandelbrotPlugin(FractalPlugin):
               f"複素領域: 実数部 ({min_x:.4f} から {max_x:.4f}), 虚数部 ({min_y:.4f} から {max_y:.4f}), "
               f"最大反復回数: {max_iterations}, 次数: {power}", level="INFO")
 
-        iter_array, last_z_real_array, last_z_imag_array = _compute_mandelbrot_grid_jit(
-            image_width_px, image_height_px,
-            min_x, max_x, min_y, max_y,
-            max_iterations, escape_radius_sq, power
-        )
-
-        last_zn_values_complex = last_z_real_array + 1j * last_z_imag_array
-        last_z_modulus_sq = np.abs(last_zn_values_complex)**2 # |Z|^2 を計算
-
-        is_diverged = iter_array < max_iterations
-
-        logger.log(f"計算完了。反復回数配列形状: {iter_array.shape}, last_zn_values形状: {last_zn_values_complex.shape}", level="DEBUG")
-        return {
-            'iterations': iter_array,
-            'last_zn_values': last_zn_values_complex, # 他の用途や互換性のために保持
-            'last_z_modulus_sq': last_z_modulus_sq,    # スムーズな色付けのために追加
-            'is_diverged': is_diverged
-        }
+        # エンジンがフレーム間で再利用するバッファプールを渡した場合は、出力をその作業領域に書き込む (確保とページフォルトを省く)
+        buffer_pool = common_params.get('buffer_pool')
+
+        # 発散部のカラーリングプラグインが融合カラーリング ('smooth') を指定した場合は、CPUで計算と同時に色付けする
+        fused_coloring = common_params.get('fused_coloring')
+        fused_rgba = None
+        if fused_coloring is not None and fused_coloring[0] == 'smooth' and not common_params.get('use_gpu', False):
+            _, color_scale, color_map = fused_coloring
+            iter_array, last_z_real_array, last_z_imag_array, fused_rgba = compute_mandelbrot_smooth_grid(
+                min_x, max_x, min_y, max_y,
+                image_width_px, image_height_px,
+                max_iterations, escape_radius_sq, power,
+                color_scale, color_map,
+                precision=common_params.get('precision', 'f64'),
+                parallel=common_params.get('parallel_kernels', True),
+                reuse_buffers=common_params.get('reuse_buffers', False),
+                skip_interior=common_params.get('skip_interior', False),
+                buffer_pool=buffer_pool
+            )
+        else:
+            # 行単位で並列化された共有カーネル (plugins/_fractal_kernels.py) で計算
+            iter_array, last_z_real_array, last_z_imag_array = compute_mandelbrot_grid(
+                min_x, max_x, min_y, max_y,
+                image_width_px, image_height_px,
+                max_iterations, escape_radius_sq, power,
+                use_gpu=common_params.get('use_gpu', False),
+                precision=common_params.get('precision', 'f64'),
+                parallel=common_params.get('parallel_kernels', True),
+                reuse_buffers=common_params.get('reuse_buffers', False),
+                use_gufunc=common_params.get('use_gufunc', False),
+                skip_interior=common_params.get('skip_interior', False),
+                buffer_pool=buffer_pool
+            )
+
+        # 最後のZは実部・虚部のプレーン (SoA) のまま返し、|Z|^2 と発散マスクは1パスで求める
+        result = escape_time_result(iter_array, last_z_real_array, last_z_imag_array, max_iterations, buffer_pool)
+        logger.log(f"計算完了。反復回数配列形状: {iter_array.shape}", level="DEBUG")
+        if fused_rgba is not None:
+            result['fused_rgba'] = fused_rgba # 発散部のカラーリング結果 (エンジンが apply_coloring の結果として使う)
+        return result
 
 if __name__ == '__main__':
     plugin = MandelbrotPlugin()
@@ -164,7 +144,7 @@ if __name__ == '__main__':
     fractal_result_data = plugin.compute_fractal(test_common_params, test_plugin_params, img_width_test, img_height_test)
 
     iter_result_array = fractal_result_data['iterations']
-    last_zn_values_array = fractal_result_data['last_zn_values']
+    last_zn_values_array = fractal_result_data['last_z_real'] + 1j * fractal_result_data['last_z_imag']
 
     logger.log(f"  反復回数配列形状: {iter_result_array.shape}, dtype: {iter_result_array.dtype}", level="DEBUG")
     logger.log(f"  last_zn_values 配列形状: {last_zn_values_array.shape}, dtype: {last_zn_values_array.dtype}", level="DEBUG")
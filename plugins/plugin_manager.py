@@ -33,6 +33,7 @@ class PluginManager:
         self.divergent_coloring_plugin_folder = (self.project_root / divergent_coloring_plugin_folder_path).resolve()
         self.non_divergent_coloring_plugin_folder = (self.project_root / non_divergent_coloring_plugin_folder_path).resolve()
         self.coloring_plugins: dict[str, ColoringAlgorithmPlugin] = {} # 単一の辞書で管理
+        self._available_plugins_cache: dict[str, list] = {} # get_available_* の結果キャッシュ (読込時に無効化)
         self.load_all_plugins()
 
     def load_all_plugins(self) -> None:
@@ -40,6 +41,7 @@ class PluginManager:
         logger.log("全プラグイン読込中...", level="INFO")
         self.fractal_plugins.clear()
         self.coloring_plugins.clear()
+        self._available_plugins_cache.clear()
 
         self._load_plugins_from_folder(
             self.fractal_plugin_folder,
@@ -86,7 +88,14 @@ class PluginManager:
                         continue
 
                     module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(module)
+                    # sys.modules に登録してから実行する。Numba の cache=True の関数はキャッシュの読込時に
+                    # モジュール名でモジュールを import し直すため、未登録だと ModuleNotFoundError になる
+                    sys.modules[module_name] = module
+                    try:
+                        spec.loader.exec_module(module)
+                    except Exception:
+                        sys.modules.pop(module_name, None)
+                        raise
 
                     for member_name, cls in inspect.getmembers(module, inspect.isclass):
                         # ---- デバッグ用コード開始 ----
@@ -120,7 +129,15 @@ class PluginManager:
 
     # フラクタルプラグイン固有のメソッド
     def get_available_fractal_plugins(self) -> list[FractalPlugin]:
-        return list(self.fractal_plugins.values())
+        """
+        利用可能なフラクタルプラグインのリストを返します。
+        結果はプラグイン読込時まで使い回されるため、呼び出し側でリストを変更しないでください。
+        """
+        cached = self._available_plugins_cache.get('fractal')
+        if cached is None:
+            cached = list(self.fractal_plugins.values())
+            self._available_plugins_cache['fractal'] = cached
+        return cached
 
     def get_fractal_plugin(self, name: str) -> FractalPlugin | None:
         return self.fractal_plugins.get(name)
@@ -130,11 +147,16 @@ class PluginManager:
         """
         利用可能なカラーリングプラグインのリストを返します。
         target_type が指定された場合、そのタイプに一致するプラグインのみを返します。
+        結果はプラグイン読込時まで使い回されるため、呼び出し側でリストを変更しないでください。
         """
-        plugins = list(self.coloring_plugins.values())
-        if target_type:
-            return [p for p in plugins if p.target_type == target_type]
-        return plugins
+        cache_key = f"coloring:{target_type or ''}"
+        cached = self._available_plugins_cache.get(cache_key)
+        if cached is None:
+            cached = list(self.coloring_plugins.values())
+            if target_type:
+                cached = [p for p in cached if p.target_type == target_type]
+            self._available_plugins_cache[cache_key] = cached
+        return cached
 
     def get_coloring_plugin(self, name: str, target_type: str | None = None) -> ColoringAlgorithmPlugin | None:
         """